@@ -0,0 +1,313 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import hashlib
+import json
+from collections.abc import Callable, Hashable
+from contextlib import asynccontextmanager
+from datetime import date
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
+from pydantic import BaseModel, Field
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from src.api.cache import TTLCache
+from src.db.engine import dispose_engines, get_engine, pool_stats
+
+
+#--------------------------
+# Settings
+#--------------------------
+
+# etl_build_state is re-read at most this often; a new build is visible after at most this delay
+VERSION_TTL_S = 2.0
+
+RESPONSE_CACHE_ENTRIES = 4096
+RESPONSE_TTL_S = 300.0
+
+# Series per POST /forecasts/batch request
+BATCH_MAX_SERIES = 500
+
+# Response bodies (bytes) and per-series forecast payloads, keyed by query + data version
+_responses = TTLCache(RESPONSE_CACHE_ENTRIES, RESPONSE_TTL_S)
+_versions = TTLCache(1, VERSION_TTL_S)
+
+# Loads in progress, so concurrent misses on one key share a single DB query
+_inflight: dict[Hashable, asyncio.Task] = {}
+
+
+#--------------------------
+# Helpers
+#--------------------------
+
+def _query(sql: str, params: dict | None = None) -> list[dict]:
+    """
+    Run a query on a pooled connection (called from the thread pool, never on the event loop).
+    """
+    with get_engine().connect() as conn:
+        return [dict(row._mapping) for row in conn.execute(text(sql), params or {})]
+
+
+def _dumps(payload: object) -> bytes:
+    return json.dumps(payload, default=str, separators=(",", ":")).encode("utf-8")
+
+
+async def _single_flight(cache: TTLCache, key: Hashable, load: Callable[[], object]) -> object:
+    """
+    Cached value of key, else load() in the thread pool. Concurrent callers missing the
+    same key wait for the first caller's load instead of each querying the database.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    task = _inflight.get(key)
+    if task is None:
+        async def run() -> object:
+            loaded = await run_in_threadpool(load)
+            cache.set(key, loaded)
+            return loaded
+
+        task = asyncio.ensure_future(run())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shield: a client disconnecting does not cancel the load other callers wait for
+    return await asyncio.shield(task)
+
+
+def _load_versions() -> dict[str, int]:
+    rows = _query("SELECT model_name, build_version FROM etl_build_state")
+    return {row["model_name"]: row["build_version"] for row in rows}
+
+
+async def _data_version(model_name: str) -> int | None:
+    versions = await _single_flight(_versions, ("versions",), _load_versions)
+    return versions.get(model_name)
+
+
+def _etag(key: Hashable) -> str:
+    return f'W/"{hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20]}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    candidates = {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}
+    return etag in candidates or "*" in candidates
+
+
+async def _respond(request: Request, key: Hashable, load: Callable[[], object]) -> Response:
+    """
+    JSON response of load() cached under key (which includes the data version).
+
+    The ETag only depends on key, so a client holding the current version gets a 304
+    before anything is loaded or serialized.
+    """
+    etag = _etag(key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    body = await _single_flight(_responses, key, lambda: _dumps(load()))
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _date_range(column: str, start: date | None, end: date | None) -> tuple[str, dict]:
+    """
+    AND-ed date predicates (start inclusive, end exclusive).
+    """
+    predicates, params = [], {}
+    if start is not None:
+        predicates.append(f"{column} >= :start")
+        params["start"] = start
+    if end is not None:
+        predicates.append(f"{column} < :end")
+        params["end"] = end
+    return "".join(f" AND {predicate}" for predicate in predicates), params
+
+
+def _load_forecasts(series: list[tuple[str, str]]) -> dict[tuple[str, str], dict]:
+    """
+    Forecast payloads of many series in one query (unnest of the requested keys).
+    """
+    rows = _query(
+        """
+        SELECT f.product_category_name, f.customer_state, f.forecast_date, f.forecast,
+               f.model_name, f.origin_date
+        FROM forecasts AS f
+        JOIN unnest(CAST(:categories AS TEXT[]), CAST(:states AS TEXT[]))
+          AS s (product_category_name, customer_state)
+          USING (product_category_name, customer_state)
+        ORDER BY f.product_category_name, f.customer_state, f.forecast_date
+        """,
+        {"categories": [key[0] for key in series], "states": [key[1] for key in series]},
+    )
+    payloads: dict[tuple[str, str], dict] = {}
+    for row in rows:
+        key = (row["product_category_name"], row["customer_state"])
+        if key not in payloads:
+            payloads[key] = {
+                "product_category_name": key[0],
+                "customer_state": key[1],
+                "model_name": row["model_name"],
+                "origin_date": row["origin_date"],
+                "forecasts": [],
+            }
+        payloads[key]["forecasts"].append({"date": row["forecast_date"], "forecast": row["forecast"]})
+    return payloads
+
+
+def _empty_forecast(key: tuple[str, str]) -> dict:
+    return {"product_category_name": key[0], "customer_state": key[1], "forecasts": []}
+
+
+#--------------------------
+# App
+#--------------------------
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the pool up front instead of on the first request
+    get_engine()
+    yield
+    dispose_engines()
+
+
+app = FastAPI(title="Olist retail ML platform", lifespan=lifespan)
+
+
+class SeriesKey(BaseModel):
+    product_category_name: str
+    customer_state: str
+
+
+class ForecastBatchRequest(BaseModel):
+    series: list[SeriesKey] = Field(min_length=1, max_length=BATCH_MAX_SERIES)
+
+
+@app.get("/health")
+async def health() -> dict:
+    versions = await _single_flight(_versions, ("versions",), _load_versions)
+    return {"status": "ok", "data_versions": versions, "cache": _responses.stats(), "pool": pool_stats()}
+
+
+@app.get("/daily-orders")
+async def daily_orders(request: Request, start: date | None = None, end: date | None = None) -> Response:
+    """
+    fact_daily_orders rows (orders, revenue, review score), optionally within [start, end).
+    """
+    version = await _data_version("fact_daily_orders")
+
+    def load() -> dict:
+        where, params = _date_range("order_date", start, end)
+        rows = _query(
+            f"""
+            SELECT order_date, n_orders, gross_revenue, items_revenue, freight_revenue,
+                   avg_order_value, avg_review_score, n_reviewed_orders
+            FROM fact_daily_orders
+            WHERE TRUE{where}
+            ORDER BY order_date
+            """,
+            params,
+        )
+        return {"data_version": version, "rows": rows}
+
+    return await _respond(request, ("daily_orders", start, end, version), load)
+
+
+@app.get("/demand/{category}/{state}")
+async def demand(request: Request, category: str, state: str,
+                 start: date | None = None, end: date | None = None) -> Response:
+    """
+    One series of the fact_daily_demand cube ('__all__' selects a rollup), optionally within [start, end).
+    """
+    version = await _data_version("fact_daily_demand")
+
+    def load() -> dict:
+        where, params = _date_range("order_date", start, end)
+        rows = _query(
+            f"""
+            SELECT order_date, n_orders, n_items, items_revenue, freight_revenue, gross_revenue
+            FROM fact_daily_demand
+            WHERE product_category_name = :category AND customer_state = :state{where}
+            ORDER BY order_date
+            """,
+            {"category": category, "state": state, **params},
+        )
+        if not rows:
+            raise HTTPException(status_code=404, detail=f"No demand for series ({category}, {state})")
+        return {"data_version": version, "product_category_name": category, "customer_state": state, "rows": rows}
+
+    return await _respond(request, ("demand", category, state, start, end, version), load)
+
+
+@app.get("/forecasts/{category}/{state}")
+async def forecast(request: Request, category: str, state: str) -> Response:
+    """
+    Published forecast of one series.
+    """
+    version = await _data_version("forecasts")
+
+    def load() -> dict:
+        payload = _load_forecasts([(category, state)]).get((category, state))
+        if payload is None:
+            raise HTTPException(status_code=404, detail=f"No forecast for series ({category}, {state})")
+        return {"data_version": version, **payload}
+
+    return await _respond(request, ("forecast", category, state, version), load)
+
+
+@app.post("/forecasts/batch")
+async def forecast_batch(request: Request, body: ForecastBatchRequest) -> Response:
+    """
+    Forecasts of many series in one round trip.
+
+    Each series is cached on its own: cached series are answered from memory and all the
+    others are read with a single query. Unknown series come back with an empty list.
+    """
+    version = await _data_version("forecasts")
+    series = list(dict.fromkeys((key.product_category_name, key.customer_state) for key in body.series))
+
+    etag = _etag(("forecast_batch", tuple(series), version))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    payloads = {key: _responses.get(("forecast_series", *key, version)) for key in series}
+    missing = [key for key, payload in payloads.items() if payload is None]
+    if missing:
+        loaded = await run_in_threadpool(_load_forecasts, missing)
+        for key in missing:
+            payloads[key] = loaded.get(key) or _empty_forecast(key)
+            _responses.set(("forecast_series", *key, version), payloads[key])
+
+    body_bytes = _dumps({"data_version": version, "series": [payloads[key] for key in series]})
+    return Response(body_bytes, media_type="application/json", headers=headers)
+
+
+#--------------------------
+# Main
+#--------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve forecasts and mart aggregates over HTTP.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes (each has its own connection pool and response cache)",
+    )
+    args = parser.parse_args()
+
+    uvicorn.run(
+        "src.api.app:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="uvloop",
+        http="httptools",
+        access_log=False,
+    )
+
+if __name__ == "__main__":
+    main()
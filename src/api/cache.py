@@ -0,0 +1,63 @@
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+
+#--------------------------
+# Settings
+#--------------------------
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_S = 300.0
+
+
+#--------------------------
+# LRU / TTL cache
+#--------------------------
+
+class TTLCache:
+    """
+    In-process LRU cache whose entries also expire ttl_s seconds after being stored (thread safe).
+
+    Keys carry the data version they were computed from, so a new build never serves stale
+    entries; the TTL only bounds how long unused versions linger.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_s: float = DEFAULT_TTL_S,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> object | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: object) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,122 @@
+from __future__ import annotations
+import asyncio
+import time
+from datetime import date
+import httpx
+from fastapi.testclient import TestClient
+from src.api import app as api
+from src.api.cache import TTLCache
+
+
+class FakeDB:
+    """
+    Stands in for api._query: answers the version, daily orders and forecast queries from
+    memory and records every call.
+    """
+    def __init__(self, delay_s: float = 0.0) -> None:
+        self.versions = {"fact_daily_orders": 1, "forecasts": 1}
+        self.forecasts = {
+            ("beleza_saude", "SP"): [(date(2018, 9, 1), 10.0), (date(2018, 9, 2), 12.5)],
+            ("esporte_lazer", "RJ"): [(date(2018, 9, 1), 3.0)],
+        }
+        self.delay_s = delay_s
+        self.calls: list[str] = []
+        self.series_requested: list[list[tuple[str, str]]] = []
+
+    def __call__(self, sql: str, params: dict | None = None) -> list[dict]:
+        if "etl_build_state" in sql:
+            return [{"model_name": name, "build_version": version} for name, version in self.versions.items()]
+        time.sleep(self.delay_s)
+        if "fact_daily_orders" in sql:
+            self.calls.append("daily_orders")
+            return [{"order_date": date(2018, 9, 1), "n_orders": 5 * self.versions["fact_daily_orders"]}]
+        self.calls.append("forecasts")
+        requested = list(zip(params["categories"], params["states"]))
+        self.series_requested.append(requested)
+        return [
+            {"product_category_name": key[0], "customer_state": key[1], "forecast_date": day, "forecast": value,
+             "model_name": "ridge", "origin_date": date(2018, 8, 31)}
+            for key, points in self.forecasts.items() if key in requested
+            for day, value in points
+        ]
+
+
+def _fake_db(monkeypatch, delay_s: float = 0.0) -> FakeDB:
+    """
+    Patch the app onto a FakeDB with empty caches. Versions are never cached (TTL 0), so a
+    version bump is visible on the next request.
+    """
+    db = FakeDB(delay_s)
+    monkeypatch.setattr(api, "_query", db)
+    monkeypatch.setattr(api, "_responses", TTLCache(api.RESPONSE_CACHE_ENTRIES, api.RESPONSE_TTL_S))
+    monkeypatch.setattr(api, "_versions", TTLCache(1, 0))
+    monkeypatch.setattr(api, "_inflight", {})
+    return db
+
+
+def test_matching_etag_returns_304_without_a_query(monkeypatch) -> None:
+    db = _fake_db(monkeypatch)
+    client = TestClient(api.app)
+
+    first = client.get("/daily-orders")
+    second = client.get("/daily-orders", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert db.calls == ["daily_orders"]
+
+
+def test_concurrent_misses_share_one_query(monkeypatch) -> None:
+    db = _fake_db(monkeypatch, delay_s=0.1)
+
+    async def fetch_all(n_requests: int) -> list[httpx.Response]:
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.get("/daily-orders") for _ in range(n_requests)))
+
+    responses = asyncio.run(fetch_all(20))
+
+    assert all(response.status_code == 200 for response in responses)
+    assert len({response.content for response in responses}) == 1
+    assert db.calls == ["daily_orders"]
+
+
+def test_version_bump_creates_a_new_cache_entry(monkeypatch) -> None:
+    db = _fake_db(monkeypatch)
+    client = TestClient(api.app)
+
+    first = client.get("/daily-orders")
+    db.versions["fact_daily_orders"] = 2
+    second = client.get("/daily-orders", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert second.json()["data_version"] == 2
+    assert second.json()["rows"][0]["n_orders"] == 10
+    assert db.calls == ["daily_orders", "daily_orders"]
+    assert api._responses.stats()["entries"] == 2
+
+
+def test_batch_dedups_series_and_queries_only_uncached_ones(monkeypatch) -> None:
+    db = _fake_db(monkeypatch)
+    client = TestClient(api.app)
+    client.post("/forecasts/batch", json={"series": [{"product_category_name": "beleza_saude", "customer_state": "SP"}]})
+
+    response = client.post(
+        "/forecasts/batch",
+        json={"series": [
+            {"product_category_name": "beleza_saude", "customer_state": "SP"},
+            {"product_category_name": "esporte_lazer", "customer_state": "RJ"},
+            {"product_category_name": "esporte_lazer", "customer_state": "RJ"},
+            {"product_category_name": "unknown", "customer_state": "AC"},
+        ]},
+    )
+
+    series = response.json()["series"]
+    assert response.status_code == 200
+    assert [(s["product_category_name"], s["customer_state"]) for s in series] == [
+        ("beleza_saude", "SP"), ("esporte_lazer", "RJ"), ("unknown", "AC"),
+    ]
+    assert [len(s["forecasts"]) for s in series] == [2, 1, 0]
+    assert db.series_requested == [[("beleza_saude", "SP")], [("esporte_lazer", "RJ"), ("unknown", "AC")]]
@@ -0,0 +1,34 @@
+from __future__ import annotations
+from src.api.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2, ttl_s=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(max_entries=10, ttl_s=5, clock=clock)
+    cache.set(("daily_orders", 3), b"[]")
+
+    clock.now = 4.9
+    assert cache.get(("daily_orders", 3)) == b"[]"
+    clock.now = 5.0
+    assert cache.get(("daily_orders", 3)) is None
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 1}
@@ -1,24 +1,220 @@
-import os 
+from __future__ import annotations
+import os
+import threading
+import time
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
 
 
-# Load variables from .env into environment
-load_dotenv()
+#--------------------------
+# Pool settings
+#--------------------------
 
-# Read the DB URL env variable
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Defaults, each overridable through the environment (.env)
+DEFAULT_POOL_SIZE = 5          # DB_POOL_SIZE
+DEFAULT_MAX_OVERFLOW = 10      # DB_MAX_OVERFLOW
+DEFAULT_POOL_TIMEOUT = 30      # DB_POOL_TIMEOUT, seconds to wait for a free connection
+DEFAULT_POOL_RECYCLE = 1800    # DB_POOL_RECYCLE, seconds; -1 disables recycling
+DEFAULT_POOL_PRE_PING = True   # DB_POOL_PRE_PING
 
-if DATABASE_URL is None:
-    raise RuntimeError("DATABASE_URL is not set.")
+# Rows per INSERT statement when the bulk engine batches executemany() calls
+BULK_PAGE_SIZE = 10_000
 
-def get_engine():
+_engines: dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+
+#--------------------------
+# Pool metrics
+#--------------------------
+
+class PoolMetrics:
+    """
+    Counters for connection checkouts of one engine's pool (thread safe).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.checkins = 0
+            self.connects = 0
+            self.wait_total_s = 0.0
+            self.wait_max_s = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_s += seconds
+            self.wait_max_s = max(self.wait_max_s, seconds)
+
+    def record_checkin(self) -> None:
+        with self._lock:
+            self.checkins += 1
+
+    def record_connect(self) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "wait_total_s": self.wait_total_s,
+                "wait_avg_s": self.wait_total_s / self.checkouts if self.checkouts else 0.0,
+                "wait_max_s": self.wait_max_s,
+            }
+
+
+class _MeteredQueuePool(QueuePool):
+    """
+    QueuePool that times how long each checkout waits for a connection.
     """
-    Return a SQLAlchemy engine connected to the Postgres DB.
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.metrics.record_wait(time.perf_counter() - start)
+
+    def _do_return_conn(self, record) -> None:
+        self.metrics.record_checkin()
+        super()._do_return_conn(record)
+
+    def recreate(self) -> "_MeteredQueuePool":
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+#--------------------------
+# Helpers
+#--------------------------
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return default if value in (None, "") else int(value)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _database_url() -> str:
     """
-    engine = create_engine(DATABASE_URL, echo=False, future=True)
-    return engine 
+    Resolve DATABASE_URL on first use instead of at import time.
+    """
+    # Load variables from .env into environment
+    load_dotenv()
+
+    database_url = os.getenv("DATABASE_URL")
+    if database_url is None:
+        raise RuntimeError("DATABASE_URL is not set.")
+    return database_url
+
+
+def _create_engine(bulk: bool) -> Engine:
+    options = {}
+    if bulk:
+        # psycopg2 fast executemany: batched multi-VALUES inserts, statements never echoed
+        options = {
+            "executemany_mode": "values_plus_batch",
+            "insertmanyvalues_page_size": BULK_PAGE_SIZE,
+            "executemany_batch_page_size": BULK_PAGE_SIZE,
+        }
+
+    engine = create_engine(
+        _database_url(),
+        echo=False,
+        future=True,
+        poolclass=_MeteredQueuePool,
+        pool_size=_env_int("DB_POOL_SIZE", DEFAULT_POOL_SIZE),
+        max_overflow=_env_int("DB_MAX_OVERFLOW", DEFAULT_MAX_OVERFLOW),
+        pool_timeout=_env_int("DB_POOL_TIMEOUT", DEFAULT_POOL_TIMEOUT),
+        pool_recycle=_env_int("DB_POOL_RECYCLE", DEFAULT_POOL_RECYCLE),
+        pool_pre_ping=_env_bool("DB_POOL_PRE_PING", DEFAULT_POOL_PRE_PING),
+        **options,
+    )
+
+    metrics = engine.pool.metrics
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record) -> None:
+        metrics.record_connect()
+
+    return engine
+
+
+def _cached_engine(kind: str) -> Engine:
+    engine = _engines.get(kind)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(kind)
+            if engine is None:
+                engine = _create_engine(bulk=kind == "bulk")
+                _engines[kind] = engine
+    return engine
+
+
+#--------------------------
+# Public API
+#--------------------------
+
+def get_engine() -> Engine:
+    """
+    Return the process-wide SQLAlchemy engine connected to the Postgres DB.
+
+    The engine (and its connection pool) is created on first call and reused afterwards.
+    Pool size/overflow/timeout/recycle/pre-ping come from DB_POOL_* env variables.
+    """
+    return _cached_engine("default")
+
+
+def get_bulk_engine() -> Engine:
+    """
+    Return the process-wide engine tuned for bulk loads.
+
+    Same pool settings as get_engine(), plus psycopg2 batched executemany
+    (any executemany caller, e.g. DataFrame.to_sql with method=None) and no statement echo.
+    """
+    return _cached_engine("bulk")
+
+
+def pool_stats() -> dict[str, dict]:
+    """
+    Pool metrics of every engine created so far: checkouts, checkins, new DB connections,
+    total/avg/max seconds spent waiting for a connection, plus the pool's own status line.
+    """
+    return {
+        kind: {**engine.pool.metrics.snapshot(), "status": engine.pool.status()}
+        for kind, engine in list(_engines.items())
+    }
+
+
+def dispose_engines() -> None:
+    """
+    Close every pooled connection and forget the cached engines (e.g. after a fork or in tests).
+    """
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
 
 def test_connection():
     """
@@ -28,4 +224,4 @@ def test_connection():
     with engine.connect() as conn:
         result = conn.execute(text("SELECT 1"))
         value = result.scalar_one()
-        print(f"DB connection OK. SELECT 1 -> {value}")
\ No newline at end of file
+        print(f"DB connection OK. SELECT 1 -> {value}")
@@ -0,0 +1,218 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+
+#--------------------------
+# Settings
+#--------------------------
+
+# Rows fetched per round trip from the server-side cursor (and rows per yielded chunk)
+DEFAULT_CHUNK_ROWS = 50_000
+
+# TEXT columns with at most this many distinct values (pg_stats) are read as category
+CATEGORY_MAX_DISTINCT = 64
+
+# SQL type prefix (format_type) -> (dtype when never NULL, dtype when nullable, numpy dtype when nullable)
+_SQL_DTYPES = (
+    ("smallint", ("int16", "Int16", "float32")),
+    ("integer", ("int32", "Int32", "float64")),
+    ("bigint", ("int64", "Int64", "float64")),
+    ("real", ("float32", "float32", "float32")),
+    ("double precision", ("float64", "float64", "float64")),
+    ("numeric", ("float64", "float64", "float64")),
+    ("boolean", ("bool", "boolean", "object")),
+    ("date", ("datetime64[ns]", "datetime64[ns]", "datetime64[ns]")),
+    ("timestamp", ("datetime64[ns]", "datetime64[ns]", "datetime64[ns]")),
+)
+
+# NOT NULL dtype -> nullable dtype, for chunks holding NULLs the statistics did not report
+_NULLABLE_FALLBACK = {"int16": "Int16", "int32": "Int32", "int64": "Int64", "bool": "boolean"}
+
+
+#--------------------------
+# Column metadata
+#--------------------------
+
+@dataclass(frozen=True)
+class ColumnInfo:
+    """
+    One column as seen by the catalog.
+
+    - nullable: False when declared NOT NULL or when fresh statistics saw no NULL
+    - n_distinct: pg_stats.n_distinct (negative = fraction of the row count), None without stats
+    """
+    name: str
+    sql_type: str
+    nullable: bool
+    n_distinct: float | None = None
+
+
+def column_dtype(column: ColumnInfo, numpy_only: bool = False) -> str:
+    """
+    Compact dtype for a column.
+
+    - integers keep their width (int16/int32/int64); nullable ones use pandas' Int16/Int32/Int64,
+      or float with NaN when numpy_only
+    - TEXT with few distinct values -> category (object when numpy_only)
+    - anything unknown -> object
+    """
+    for prefix, (not_null, nullable, numpy_nullable) in _SQL_DTYPES:
+        if column.sql_type.startswith(prefix):
+            if not column.nullable:
+                return not_null
+            return numpy_nullable if numpy_only else nullable
+    if (
+        not numpy_only
+        and column.sql_type.startswith(("text", "character"))
+        and column.n_distinct is not None
+        and 0 < column.n_distinct <= CATEGORY_MAX_DISTINCT
+    ):
+        return "category"
+    return "object"
+
+
+def table_columns(conn: Connection, table_name: str) -> list[ColumnInfo]:
+    """
+    Columns of a table, view or materialized view in attribute order, with their statistics.
+    """
+    rows = conn.execute(
+        text(
+            """
+            SELECT
+                a.attname,
+                format_type(a.atttypid, a.atttypmod) AS sql_type,
+                a.attnotnull,
+                s.null_frac,
+                s.n_distinct
+            FROM pg_attribute AS a
+            LEFT JOIN pg_stats AS s
+              ON s.schemaname = current_schema()
+             AND s.tablename = :table_name
+             AND s.attname = a.attname
+            WHERE a.attrelid = to_regclass(:table_name)
+              AND a.attnum > 0
+              AND NOT a.attisdropped
+            ORDER BY a.attnum
+            """
+        ),
+        {"table_name": table_name},
+    ).all()
+    if not rows:
+        raise ValueError(f"Unknown relation {table_name!r}")
+    return [
+        ColumnInfo(
+            name=row.attname,
+            sql_type=row.sql_type,
+            nullable=not row.attnotnull and (row.null_frac is None or row.null_frac > 0),
+            n_distinct=row.n_distinct,
+        )
+        for row in rows
+    ]
+
+
+#--------------------------
+# Helpers
+#--------------------------
+
+def _select_sql(table_name: str, columns: list[str], date_column: str | None,
+                start, end) -> tuple[str, dict]:
+    """
+    SELECT with the projection and the date range pushed down (start inclusive, end exclusive).
+    """
+    predicates, params = [], {}
+    if date_column is not None and start is not None:
+        predicates.append(f"{date_column} >= :start")
+        params["start"] = start
+    if date_column is not None and end is not None:
+        predicates.append(f"{date_column} < :end")
+        params["end"] = end
+    where = f" WHERE {' AND '.join(predicates)}" if predicates else ""
+    return f"SELECT {', '.join(columns)} FROM {table_name}{where}", params
+
+
+def _dtypes(conn: Connection, table_name: str, columns: list[ColumnInfo], numpy_only: bool) -> dict:
+    """
+    Resolve every column's dtype once, so all chunks of a stream share the same dtypes
+    (categories are listed up front instead of being inferred per chunk).
+    """
+    dtypes = {}
+    for column in columns:
+        dtype = column_dtype(column, numpy_only)
+        if dtype == "category":
+            categories = conn.execute(text(
+                f"SELECT DISTINCT {column.name} FROM {table_name} WHERE {column.name} IS NOT NULL ORDER BY 1"
+            )).scalars().all()
+            dtype = pd.CategoricalDtype(categories)
+        dtypes[column.name] = dtype
+    return dtypes
+
+
+def _frame(rows, names: list[str], dtypes: dict) -> pd.DataFrame:
+    # coerce_float turns NUMERIC's Decimal values into floats
+    df = pd.DataFrame.from_records(rows, columns=names, coerce_float=True)
+    for name in names:
+        dtype = dtypes[name]
+        if str(dtype) in _NULLABLE_FALLBACK and df[name].isna().any():
+            # Statistics said "no NULLs" but this chunk has some (stale stats): stay nullable
+            dtype = _NULLABLE_FALLBACK[str(dtype)]
+        df[name] = df[name].astype(dtype)
+    return df
+
+
+#--------------------------
+# Public API
+#--------------------------
+
+def stream_table(
+    engine: Engine,
+    table_name: str,
+    columns: Iterable[str] | None = None,
+    date_column: str | None = None,
+    start=None,
+    end=None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    as_records: bool = False,
+) -> Iterator[pd.DataFrame | np.ndarray]:
+    """
+    Stream a staging or mart relation in chunks of chunk_rows rows.
+
+    - Rows come from a server-side (named) cursor, so at most one chunk is held client side
+    - columns projects the SELECT; date_column with start (inclusive) / end (exclusive)
+      filters in SQL
+    - Chunks are DataFrames with catalog-derived compact dtypes (see column_dtype), or NumPy
+      structured arrays with as_records=True (numpy dtypes only, e.g. nullable ints as float)
+    """
+    with engine.connect() as conn:
+        catalog = {column.name: column for column in table_columns(conn, table_name)}
+        names = list(columns) if columns is not None else list(catalog)
+        unknown = [name for name in [*names, date_column] if name is not None and name not in catalog]
+        if unknown:
+            raise ValueError(f"Unknown columns for {table_name}: {unknown}")
+
+        dtypes = _dtypes(conn, table_name, [catalog[name] for name in names], numpy_only=as_records)
+        sql, params = _select_sql(table_name, names, date_column, start, end)
+
+        result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(text(sql), params)
+        # partitions() without a size returns the whole result at once, yield_per does not reach text() results
+        for rows in result.partitions(chunk_rows):
+            df = _frame(rows, names, dtypes)
+            yield df.to_records(index=False) if as_records else df
+
+
+def read_table(engine: Engine, table_name: str, columns: Iterable[str] | None = None,
+               date_column: str | None = None, start=None, end=None,
+               chunk_rows: int = DEFAULT_CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Read a whole relation (or its projection / date range) into one compact DataFrame.
+    """
+    chunks = list(stream_table(engine, table_name, columns, date_column, start, end, chunk_rows))
+    if not chunks:
+        with engine.connect() as conn:
+            names = list(columns) if columns is not None else [c.name for c in table_columns(conn, table_name)]
+        return pd.DataFrame(columns=names)
+    return pd.concat(chunks, ignore_index=True)
@@ -0,0 +1,206 @@
+from __future__ import annotations
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+
+#--------------------------
+# Paths
+#--------------------------
+
+SCHEMA_PATH = Path(__file__).resolve().parent / "schema.sql"
+
+
+#--------------------------
+# Table definitions
+#--------------------------
+
+@dataclass(frozen=True)
+class ForeignKey:
+    columns: tuple[str, ...]
+    ref_table: str
+    ref_columns: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class TableDef:
+    name: str
+    columns: dict[str, str]          # column name -> SQL type as written in schema.sql (upper case)
+    not_null: frozenset[str]
+    primary_key: tuple[str, ...]
+    foreign_keys: tuple[ForeignKey, ...]
+
+
+# Words that end the type part of a column definition
+_COLUMN_KEYWORDS = {"NOT", "NULL", "PRIMARY", "REFERENCES", "DEFAULT", "UNIQUE", "CHECK", "GENERATED", "CONSTRAINT"}
+
+_CREATE_TABLE_RE = re.compile(r"CREATE TABLE IF NOT EXISTS\s+(\w+)\s*\((.*?)\n\);", re.IGNORECASE | re.DOTALL)
+_PK_RE = re.compile(r"PRIMARY KEY\s*\(([^)]*)\)", re.IGNORECASE)
+_FK_RE = re.compile(r"FOREIGN KEY\s*\(([^)]*)\)\s*REFERENCES\s+(\w+)\s*\(([^)]*)\)", re.IGNORECASE)
+_INLINE_REF_RE = re.compile(r"REFERENCES\s+(\w+)\s*\(([^)]*)\)", re.IGNORECASE)
+
+
+#--------------------------
+# Helpers
+#--------------------------
+
+def _strip_comments(sql: str) -> str:
+    return re.sub(r"--[^\n]*", "", sql)
+
+
+def _split_top_level(body: str) -> list[str]:
+    """
+    Split a CREATE TABLE body on commas that are not inside parentheses.
+    """
+    items, depth, current = [], 0, []
+    for char in body:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            items.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    if "".join(current).strip():
+        items.append("".join(current).strip())
+    return items
+
+
+def _names(column_list: str) -> tuple[str, ...]:
+    return tuple(name.strip() for name in column_list.split(","))
+
+
+def _parse_table(name: str, body: str) -> TableDef:
+    columns: dict[str, str] = {}
+    not_null: set[str] = set()
+    primary_key: tuple[str, ...] = ()
+    foreign_keys: list[ForeignKey] = []
+
+    for item in _split_top_level(body):
+        upper = item.upper()
+
+        # Table level constraints
+        if upper.startswith(("CONSTRAINT", "PRIMARY KEY", "FOREIGN KEY")):
+            pk = _PK_RE.search(item)
+            if pk:
+                primary_key = _names(pk.group(1))
+            fk = _FK_RE.search(item)
+            if fk:
+                foreign_keys.append(ForeignKey(_names(fk.group(1)), fk.group(2), _names(fk.group(3))))
+            continue
+
+        # Column definition: <name> <type tokens...> [constraints]
+        tokens = item.split()
+        column = tokens[0]
+        type_tokens = []
+        for token in tokens[1:]:
+            if token.upper() in _COLUMN_KEYWORDS:
+                break
+            type_tokens.append(token)
+        columns[column] = " ".join(type_tokens).upper()
+
+        if "NOT NULL" in upper:
+            not_null.add(column)
+        if "PRIMARY KEY" in upper:
+            primary_key = (column,)
+            not_null.add(column)
+        ref = _INLINE_REF_RE.search(item)
+        if ref:
+            foreign_keys.append(ForeignKey((column,), ref.group(1), _names(ref.group(2))))
+
+    # PK columns are implicitly NOT NULL
+    not_null.update(primary_key)
+
+    return TableDef(name, columns, frozenset(not_null), primary_key, tuple(foreign_keys))
+
+
+#--------------------------
+# Public API
+#--------------------------
+
+@lru_cache(maxsize=None)
+def load_schema(path: Path = SCHEMA_PATH) -> dict[str, TableDef]:
+    """
+    Parse the CREATE TABLE statements of schema.sql into TableDef objects keyed by table name.
+    """
+    sql = _strip_comments(Path(path).read_text(encoding="utf-8"))
+    return {
+        match.group(1): _parse_table(match.group(1), match.group(2))
+        for match in _CREATE_TABLE_RE.finditer(sql)
+    }
+
+
+def table_dependencies(tables: Iterable[str], path: Path = SCHEMA_PATH) -> dict[str, set[str]]:
+    """
+    Return {table: parent tables it references via FK}, restricted to the given tables.
+
+    Self references and references to tables outside the given set are ignored.
+    """
+    schema = load_schema(path)
+    tables = list(dict.fromkeys(tables))
+    dependencies = {}
+    for table in tables:
+        if table not in schema:
+            raise KeyError(f"Table {table!r} is not declared in {path}")
+        dependencies[table] = {
+            fk.ref_table for fk in schema[table].foreign_keys
+            if fk.ref_table in tables and fk.ref_table != table
+        }
+    return dependencies
+
+
+#--------------------------
+# pandas dtypes
+#--------------------------
+
+# SQL type prefix -> (dtype for NOT NULL columns, dtype for nullable columns)
+_PANDAS_DTYPES = {
+    "SMALLINT": ("int16", "Int16"),
+    "INTEGER": ("int32", "Int32"),
+    "BIGINT": ("int64", "Int64"),
+    "DOUBLE PRECISION": ("float64", "float64"),
+    "NUMERIC": ("float64", "float64"),
+    "CHAR": ("category", "category"),
+    "TEXT": ("object", "object"),
+    "BOOLEAN": ("bool", "boolean"),
+}
+
+# Serial keys are generated by the DB and never read from files
+_GENERATED_TYPES = ("SERIAL", "BIGSERIAL")
+_DATE_TYPES = ("DATE", "TIMESTAMP")
+
+
+def pandas_read_options(table: str, categorical: Iterable[str] = (),
+                        path: Path = SCHEMA_PATH) -> tuple[dict[str, str], list[str]]:
+    """
+    Return (dtype, parse_dates) for pd.read_csv derived from the table's SQL types.
+
+    - SMALLINT/INTEGER -> int16/int32 (nullable Int16/Int32 when the column allows NULL)
+    - CHAR(n) (state codes) -> category
+    - DATE/TIMESTAMP -> parse_dates
+    - columns listed in categorical (low cardinality TEXT like order_status) -> category
+    """
+    table_def = load_schema(path)[table]
+    categorical = set(categorical)
+    dtype: dict[str, str] = {}
+    parse_dates: list[str] = []
+
+    for column, sql_type in table_def.columns.items():
+        if sql_type in _GENERATED_TYPES:
+            continue
+        if sql_type.startswith(_DATE_TYPES):
+            parse_dates.append(column)
+            continue
+        if column in categorical:
+            dtype[column] = "category"
+            continue
+        for prefix, (required, nullable) in _PANDAS_DTYPES.items():
+            if sql_type.startswith(prefix):
+                dtype[column] = required if column in table_def.not_null else nullable
+                break
+
+    return dtype, parse_dates
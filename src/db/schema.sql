@@ -21,6 +21,18 @@ CREATE TABLE IF NOT EXISTS geolocation (
     geolocation_state CHAR(2) NOT NULL
 );
 
+-- geolocation aggregated while loading (aggregate ingestion mode, replaces the raw rows):
+-- one row per zip prefix / state / normalized city, coordinates kept as sums so loads can be merged
+CREATE TABLE IF NOT EXISTS geolocation_agg (
+    zip_prefix INTEGER NOT NULL,
+    geolocation_state CHAR(2) NOT NULL,
+    geolocation_city_norm TEXT NOT NULL,
+    lat_sum DOUBLE PRECISION NOT NULL,
+    lng_sum DOUBLE PRECISION NOT NULL,
+    n_points BIGINT NOT NULL,
+    PRIMARY KEY (zip_prefix, geolocation_state, geolocation_city_norm)
+);
+
 -- categories
 CREATE TABLE IF NOT EXISTS categories (
     product_category_name TEXT PRIMARY KEY,
@@ -116,6 +128,69 @@ CREATE TABLE IF NOT EXISTS reviews (
 CREATE EXTENSION IF NOT EXISTS unaccent;
 
 
+-- -----------------------
+-- Text Normalization
+-- -----------------------
+
+-- City normalization shared by every staging model:
+-- lowercase, remove accents, keep only letters/digits, single spaces.
+-- IMMUTABLE needs the two-argument unaccent with an explicit dictionary.
+CREATE OR REPLACE FUNCTION normalize_city(city TEXT) RETURNS TEXT
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT trim(
+        regexp_replace(
+            regexp_replace(
+                public.unaccent('public.unaccent'::regdictionary, LOWER(city)),
+                '[^a-z0-9]+',
+                ' ',
+                'g'
+            ),
+            '\s+',
+            ' ',
+            'g'
+        )
+    )
+$$;
+
+-- Raw city string -> normalize_city(raw), filled from the distinct raw values
+CREATE TABLE IF NOT EXISTS city_norm_dict (
+    city_raw TEXT PRIMARY KEY,
+    city_norm TEXT NOT NULL
+);
+
+
+-- -----------------------
+-- Surrogate Keys
+-- -----------------------
+
+-- 32-char hex ids -> compact INTEGER keys, assigned once per id (refresh_key_maps) and never reused.
+-- Staging and marts carry the *_sk columns and join on them.
+CREATE TABLE IF NOT EXISTS key_orders (
+    order_sk INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    order_id TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS key_customers (
+    customer_sk INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    customer_id TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS key_products (
+    product_sk INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    product_id TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS key_sellers (
+    seller_sk INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    seller_id TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS key_reviews (
+    review_sk INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    review_id TEXT NOT NULL UNIQUE
+);
+
+
 -- -----------------------
 -- Model Tracking Tables
 -- -----------------------
@@ -128,6 +203,156 @@ CREATE TABLE IF NOT EXISTS model_runs (
     metrics JSONB
 );
 
+-- Latest published forecast of each demand series (replaced as a whole on publish)
+CREATE TABLE IF NOT EXISTS forecasts (
+    product_category_name TEXT NOT NULL,
+    customer_state TEXT NOT NULL,
+    forecast_date DATE NOT NULL,
+    forecast DOUBLE PRECISION NOT NULL,
+    model_name TEXT NOT NULL,
+    origin_date DATE NOT NULL,     -- last date of the history the forecast starts from
+    data_version BIGINT,           -- build_version of fact_daily_demand it was trained on
+    PRIMARY KEY (product_category_name, customer_state, forecast_date)
+);
+
+
+-- -----------------------
+-- Review Intelligence
+-- -----------------------
+
+-- One row per processed review text (src/reviews/text_pipeline.py); its hashed features
+-- are row feature_row of the sparse matrix in data/review_features/<feature_part>
+CREATE TABLE IF NOT EXISTS review_text_scores (
+    review_sk INTEGER PRIMARY KEY REFERENCES key_reviews (review_sk),
+    n_tokens INTEGER NOT NULL,
+    polarity REAL NOT NULL,        -- lexicon score in [-1, 1]
+    feature_part TEXT NOT NULL,
+    feature_row INTEGER NOT NULL,
+    processed_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+
+-- -----------------------
+-- ETL Metadata Tables
+-- -----------------------
+
+-- Last applied version of each raw source file (incremental loads)
+CREATE TABLE IF NOT EXISTS etl_file_state (
+    table_name TEXT PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    content_hash TEXT NOT NULL,  -- sha256 of the file as last applied
+    byte_size BIGINT NOT NULL,   -- watermark: bytes of the file already applied
+    row_count BIGINT NOT NULL,   -- watermark: data rows of the file already applied
+    loaded_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Orders touched in raw tables and not yet folded into fact_orders (filled by triggers below)
+CREATE TABLE IF NOT EXISTS etl_order_changes (
+    change_id BIGSERIAL PRIMARY KEY,
+    order_id TEXT NOT NULL,
+    changed_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- order_dates whose daily aggregates are stale, per consuming model (filled by fact_orders builds)
+CREATE TABLE IF NOT EXISTS etl_dirty_dates (
+    model_name TEXT NOT NULL,
+    order_date DATE NOT NULL,
+    PRIMARY KEY (model_name, order_date)
+);
+
+-- Highest etl_order_changes.change_id read by the last build of each staging model reading
+-- raw orders/items/payments/reviews; fact_orders only consumes changes up to the lowest of them
+CREATE TABLE IF NOT EXISTS etl_change_watermarks (
+    model_name TEXT PRIMARY KEY,
+    last_change_id BIGINT NOT NULL,
+    recorded_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Secondary indexes / FKs dropped by a fast initial load, with the DDL to restore them
+CREATE TABLE IF NOT EXISTS etl_deferred_ddl (
+    object_name TEXT PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    object_kind TEXT NOT NULL,    -- 'index' or 'fk'
+    ddl TEXT NOT NULL,            -- pg_get_indexdef / ALTER TABLE ... ADD CONSTRAINT
+    dropped_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- One row per staging/mart model: bumped on every full or incremental build
+CREATE TABLE IF NOT EXISTS etl_build_state (
+    model_name TEXT PRIMARY KEY,
+    build_version BIGINT NOT NULL DEFAULT 1,
+    build_mode TEXT NOT NULL,    -- 'full' or 'incremental'
+    built_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Last run of each stage of the checkpointed pipeline (src/etl/pipeline.py)
+CREATE TABLE IF NOT EXISTS etl_stage_checkpoints (
+    stage_name TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,   -- sha256 of the stage's source files, SQL, options and upstream fingerprints
+    status TEXT NOT NULL,        -- 'running', 'done' or 'failed'
+    run_id TEXT NOT NULL,
+    started_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMP,
+    duration_s DOUBLE PRECISION,
+    error TEXT
+);
+
+-- Plans of build statements captured with ETL_CAPTURE_PLANS=1 (src/etl/plans.py)
+CREATE TABLE IF NOT EXISTS etl_plan_history (
+    plan_id BIGSERIAL PRIMARY KEY,
+    model_name TEXT NOT NULL,
+    statement TEXT NOT NULL,     -- 'build' (CREATE ... AS), 'upsert', 'refresh_delete' / 'refresh_insert' (incremental refreshes)
+    sql_hash TEXT NOT NULL,      -- sha256 of the whitespace-normalized statement
+    captured_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    execution_ms DOUBLE PRECISION NOT NULL,
+    rows BIGINT NOT NULL,
+    max_q_error DOUBLE PRECISION NOT NULL,
+    summary JSONB NOT NULL,      -- PlanSummary compared with the next run
+    plan JSONB NOT NULL,         -- EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) output
+    warnings TEXT[] NOT NULL DEFAULT '{}'
+);
+
+
+-- -----------------------
+-- Change Tracking
+-- -----------------------
+
+-- Statement level trigger: logs the distinct order_ids of every inserted/updated/deleted row.
+-- Full raw loads set etl.skip_change_log = 'on' (SET LOCAL) and are not logged: a full
+-- fact_orders build follows them
+CREATE OR REPLACE FUNCTION log_order_changes() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF current_setting('etl.skip_change_log', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO etl_order_changes (order_id) SELECT DISTINCT order_id FROM old_rows;
+    ELSE
+        INSERT INTO etl_order_changes (order_id) SELECT DISTINCT order_id FROM new_rows;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Transition tables allow a single event per trigger, hence three triggers per table
+DO $$
+DECLARE
+    tbl TEXT;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['orders', 'items', 'payments', 'reviews'] LOOP
+        EXECUTE format(
+            'CREATE OR REPLACE TRIGGER trg_%1$s_log_insert AFTER INSERT ON %1$I
+             REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION log_order_changes()', tbl);
+        EXECUTE format(
+            'CREATE OR REPLACE TRIGGER trg_%1$s_log_update AFTER UPDATE ON %1$I
+             REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION log_order_changes()', tbl);
+        EXECUTE format(
+            'CREATE OR REPLACE TRIGGER trg_%1$s_log_delete AFTER DELETE ON %1$I
+             REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION log_order_changes()', tbl);
+    END LOOP;
+END;
+$$;
 
 
 -- ----------------
@@ -158,3 +383,7 @@ CREATE INDEX IF NOT EXISTS idx_sellers_zip_prefix
 
 CREATE INDEX IF NOT EXISTS idx_geolocation_zip_prefix
     ON geolocation (geolocation_zip_code_prefix);
+
+-- Previous plan of a build statement
+CREATE INDEX IF NOT EXISTS idx_etl_plan_history_model
+    ON etl_plan_history (model_name, statement, plan_id);
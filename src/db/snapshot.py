@@ -0,0 +1,225 @@
+from __future__ import annotations
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from src.db.reader import DEFAULT_CHUNK_ROWS, column_dtype, read_table, stream_table, table_columns
+
+
+#--------------------------
+# Settings
+#--------------------------
+
+# parents[0]=db, [1]=src, [2]=project root
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+SNAPSHOT_DIRECTORY = PROJECT_ROOT / "data" / "snapshots"
+
+# Marts exported after every build_marts run
+SNAPSHOT_TABLES = ("fact_orders", "fact_daily_orders", "fact_daily_demand")
+
+MANIFEST_NAME = "manifest.json"
+
+
+#--------------------------
+# Helpers
+#--------------------------
+
+def _log_snapshot(message: str) -> None:
+    print(f"[SNAPSHOT] {message}")
+
+
+def build_version(engine: Engine, table_name: str) -> int | None:
+    """
+    Current build_version of a model in etl_build_state (None if it was never built).
+    """
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT build_version FROM etl_build_state WHERE model_name = :name"),
+            {"name": table_name},
+        ).scalar_one_or_none()
+
+
+def _snapshot_path(directory: Path, table_name: str, version: int) -> Path:
+    return directory / table_name / f"v{version}"
+
+
+class _ColumnWriter:
+    """
+    Appends one column's chunks to a spill file and turns it into a .npy file at the end,
+    so exporting never holds more than one chunk.
+
+    Object columns (text ids, nullable booleans) are dictionary encoded: int32 codes
+    (-1 = NULL) plus a <name>.values.npy array of the distinct values.
+    """
+
+    def __init__(self, directory: Path, name: str, dtype: np.dtype) -> None:
+        self.directory = directory
+        self.name = name
+        self.encoded = dtype == np.dtype(object)
+        self.dtype = np.dtype(np.int32) if self.encoded else dtype
+        self.values: dict[object, int] = {}
+        self.n_rows = 0
+        self._spill = open(directory / f"{name}.spill", "wb")
+
+    def append(self, array: np.ndarray) -> None:
+        if self.encoded:
+            codes, uniques = pd.factorize(array, use_na_sentinel=True)
+            mapping = np.array([self.values.setdefault(value, len(self.values)) for value in uniques] + [-1], dtype=np.int32)
+            array = mapping[codes]
+        elif array.dtype != self.dtype:
+            raise ValueError(f"Column {self.name} changed dtype mid-stream ({self.dtype} -> {array.dtype}); run ANALYZE and retry")
+        self._spill.write(np.ascontiguousarray(array, dtype=self.dtype).tobytes())
+        self.n_rows += len(array)
+
+    def close(self) -> dict:
+        self._spill.close()
+        spill_path = self.directory / f"{self.name}.spill"
+        header = {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False, "shape": (self.n_rows,)}
+        with open(self.directory / f"{self.name}.npy", "wb") as target, open(spill_path, "rb") as source:
+            np.lib.format.write_array_header_2_0(target, header)
+            shutil.copyfileobj(source, target)
+        spill_path.unlink()
+
+        if self.encoded:
+            np.save(self.directory / f"{self.name}.values.npy", np.array(list(self.values), dtype=object), allow_pickle=True)
+        return {"name": self.name, "dtype": str(self.dtype), "encoded": self.encoded}
+
+
+#--------------------------
+# Export
+#--------------------------
+
+def export_snapshot(engine: Engine, table_name: str, directory: Path = SNAPSHOT_DIRECTORY,
+                    chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Path | None:
+    """
+    Write a table as one .npy file per column, tagged with its build_version.
+
+    - Rows are streamed (bounded memory) into <directory>/<table>/v<version>/
+    - The version directory is written under a temporary name and renamed into place,
+      older versions are removed afterwards
+    - Nothing is written when the snapshot of the current version already exists
+    Returns the snapshot directory, or None if the table was never built.
+    """
+    version = build_version(engine, table_name)
+    if version is None:
+        _log_snapshot(f"{table_name} has no build version, not exported")
+        return None
+    target = _snapshot_path(directory, table_name, version)
+    if (target / MANIFEST_NAME).exists():
+        return target
+
+    with engine.connect() as conn:
+        catalog = table_columns(conn, table_name)
+    (directory / table_name).mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".v{version}-", dir=directory / table_name))
+    try:
+        # Writers come from the catalog, so an empty table still lists its columns
+        writers = {
+            column.name: _ColumnWriter(staging, column.name, np.dtype(column_dtype(column, numpy_only=True)))
+            for column in catalog
+        }
+        for records in stream_table(engine, table_name, chunk_rows=chunk_rows, as_records=True):
+            for name in records.dtype.names:
+                writers[name].append(records[name])
+
+        # pandas_dtype: what the DB path (reader.column_dtype) returns, restored by load_snapshot
+        columns = [{**writers[column.name].close(), "pandas_dtype": column_dtype(column)} for column in catalog]
+        n_rows = next(iter(writers.values())).n_rows if writers else 0
+        manifest = {"table": table_name, "build_version": version, "n_rows": n_rows, "columns": columns}
+        (staging / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.replace(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    for old in (directory / table_name).glob("v*"):
+        if old != target:
+            shutil.rmtree(old, ignore_errors=True)
+    _log_snapshot(f"{table_name} v{version}: {n_rows:,} rows, {len(columns)} columns -> {target}")
+    return target
+
+
+def export_snapshots(engine: Engine, tables: tuple[str, ...] = SNAPSHOT_TABLES,
+                     directory: Path = SNAPSHOT_DIRECTORY) -> None:
+    for table_name in tables:
+        export_snapshot(engine, table_name, directory)
+
+
+#--------------------------
+# Load
+#--------------------------
+
+def load_snapshot_arrays(path: Path, columns: list[str] | None = None) -> dict[str, np.ndarray | pd.Categorical]:
+    """
+    Memory-map a snapshot's columns: numeric/date columns are read-only np.memmap views
+    (no copy), encoded columns come back as Categoricals over their memory-mapped codes.
+    """
+    manifest = json.loads((path / MANIFEST_NAME).read_text(encoding="utf-8"))
+    arrays = {}
+    for column in manifest["columns"]:
+        name = column["name"]
+        if columns is not None and name not in columns:
+            continue
+        data = np.load(path / f"{name}.npy", mmap_mode="r")
+        if column["encoded"]:
+            values = np.load(path / f"{name}.values.npy", allow_pickle=True)
+            data = pd.Categorical.from_codes(data, categories=pd.Index(values, dtype=object))
+        arrays[name] = data
+    return arrays
+
+
+def _as_reader_dtype(data: np.ndarray | pd.Categorical, dtype: str) -> pd.Series:
+    """
+    A snapshot column in the dtype the DB path gives it (column_dtype), e.g. nullable ints
+    stored as float back to Int32, text ids back to object.
+    """
+    if dtype == "category":
+        return pd.Series(data.reorder_categories(sorted(data.categories)))
+    if isinstance(data, pd.Categorical):
+        values = pd.Series(np.asarray(data, dtype=object), dtype=object)
+        data = values.where(values.notna(), None)
+    series = pd.Series(data, copy=False)
+    return series if str(series.dtype) == dtype else series.astype(dtype)
+
+
+def load_snapshot(path: Path, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    DataFrame of a snapshot's columns, with the DB reader's dtypes when the manifest has them
+    (numeric columns without a dtype change stay memory-mapped).
+    """
+    arrays = load_snapshot_arrays(path, columns)
+    manifest = json.loads((path / MANIFEST_NAME).read_text(encoding="utf-8"))
+    dtypes = {column["name"]: column.get("pandas_dtype") for column in manifest["columns"]}
+    data = {
+        name: arrays[name] if dtypes.get(name) is None else _as_reader_dtype(arrays[name], dtypes[name])
+        for name in (columns or arrays)
+    }
+    return pd.DataFrame(data, copy=False)
+
+
+def read_mart(engine: Engine, table_name: str, columns: list[str] | None = None,
+              date_column: str | None = None, start=None, end=None,
+              directory: Path = SNAPSHOT_DIRECTORY) -> pd.DataFrame:
+    """
+    Read a mart from its local snapshot when the snapshot's version matches the DB build,
+    otherwise from the database (src/db/reader.py).
+
+    date_column/start/end filter the same way in both paths (start inclusive, end exclusive).
+    """
+    version = build_version(engine, table_name)
+    path = _snapshot_path(directory, table_name, version) if version is not None else None
+    if path is None or not (path / MANIFEST_NAME).exists():
+        return read_table(engine, table_name, columns, date_column, start, end)
+
+    needed = None if columns is None else list(dict.fromkeys([*columns, *([date_column] if date_column else [])]))
+    df = load_snapshot(path, needed)
+    if date_column is not None and start is not None:
+        df = df[df[date_column] >= pd.Timestamp(start)]
+    if date_column is not None and end is not None:
+        df = df[df[date_column] < pd.Timestamp(end)]
+    return df[columns].reset_index(drop=True) if columns is not None else df.reset_index(drop=True)
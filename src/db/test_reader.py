@@ -0,0 +1,37 @@
+from sqlalchemy import text
+from src.db.engine import get_engine
+from src.db.reader import ColumnInfo, _select_sql, column_dtype, stream_table
+from src.etl.test_raw_to_db import _skip_without_db
+
+
+def test_column_dtype_is_compact_and_null_aware():
+    assert column_dtype(ColumnInfo("n_items", "bigint", nullable=False)) == "int64"
+    assert column_dtype(ColumnInfo("zip", "integer", nullable=True)) == "Int32"
+    assert column_dtype(ColumnInfo("zip", "integer", nullable=True), numpy_only=True) == "float64"
+    assert column_dtype(ColumnInfo("score", "numeric(5,2)", nullable=True)) == "float64"
+    assert column_dtype(ColumnInfo("order_date", "date", nullable=False)) == "datetime64[ns]"
+    assert column_dtype(ColumnInfo("status", "text", nullable=False, n_distinct=8)) == "category"
+    assert column_dtype(ColumnInfo("order_id", "text", nullable=False, n_distinct=-1)) == "object"
+
+
+def test_select_sql_pushes_projection_and_date_range():
+    sql, params = _select_sql("fact_orders", ["order_sk", "order_date"], "order_date", "2018-01-01", None)
+    assert sql == "SELECT order_sk, order_date FROM fact_orders WHERE order_date >= :start"
+    assert params == {"start": "2018-01-01"}
+
+
+def test_stream_table_yields_chunks_of_chunk_rows():
+    engine = get_engine()
+    _skip_without_db()
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS test_reader_stream"))
+        conn.execute(text("CREATE TABLE test_reader_stream AS SELECT n FROM generate_series(1, 2500) AS n"))
+    try:
+        chunks = list(stream_table(engine, "test_reader_stream", ["n"], chunk_rows=1000))
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE test_reader_stream"))
+
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 500]
+    assert chunks[-1]["n"].iloc[-1] == 2500
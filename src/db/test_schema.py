@@ -0,0 +1,58 @@
+from __future__ import annotations
+from src.db.schema import load_schema, pandas_read_options, table_dependencies
+
+
+RAW_TABLES = (
+    "customers", "geolocation", "categories", "sellers", "products",
+    "orders", "items", "payments", "reviews",
+)
+
+
+def test_schema_parses_keys_and_types() -> None:
+    """
+    Composite PKs, column types and NOT NULL flags come straight from schema.sql.
+    """
+    schema = load_schema()
+
+    assert schema["items"].primary_key == ("order_id", "order_item_id")
+    assert schema["reviews"].primary_key == ("order_id", "review_id")
+    assert schema["payments"].columns["payment_installments"] == "SMALLINT"
+    assert schema["items"].columns["price"] == "NUMERIC(10,2)"
+    assert "customer_state" in schema["customers"].not_null
+    assert "order_approved_at" not in schema["orders"].not_null
+
+
+def test_raw_table_dependencies_follow_foreign_keys() -> None:
+    """
+    Each raw table depends exactly on the tables its FKs reference.
+    """
+    dependencies = table_dependencies(RAW_TABLES)
+
+    for table in ("customers", "geolocation", "categories", "sellers"):
+        assert dependencies[table] == set()
+    assert dependencies["products"] == {"categories"}
+    assert dependencies["orders"] == {"customers"}
+    assert dependencies["items"] == {"orders", "products", "sellers"}
+    assert dependencies["payments"] == {"orders"}
+    assert dependencies["reviews"] == {"orders"}
+
+
+def test_pandas_read_options_use_compact_dtypes() -> None:
+    """
+    Small integers map to int16/int32 (nullable when the column allows NULL), states and
+    listed low cardinality columns to category, and DATE/TIMESTAMP columns are parsed.
+    """
+    dtype, parse_dates = pandas_read_options("payments", categorical=["payment_type"])
+    assert dtype["payment_installments"] == "int16"
+    assert dtype["payment_type"] == "category"
+    assert parse_dates == []
+
+    dtype, _ = pandas_read_options("products")
+    assert dtype["product_photos_qty"] == "Int32"
+
+    dtype, parse_dates = pandas_read_options("geolocation")
+    assert "geolocation_id" not in dtype
+    assert dtype["geolocation_state"] == "category"
+
+    _, parse_dates = pandas_read_options("orders")
+    assert "order_estimated_delivery_date" in parse_dates
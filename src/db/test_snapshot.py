@@ -0,0 +1,74 @@
+from __future__ import annotations
+import json
+import numpy as np
+import pandas as pd
+from src.db import snapshot
+from src.db.snapshot import MANIFEST_NAME, _ColumnWriter, load_snapshot, read_mart
+
+
+def test_column_writer_round_trips_through_memory_mapped_files(tmp_path):
+    """
+    Numeric columns are written raw and memory-mapped back, text columns are
+    dictionary encoded with NULLs preserved, across several chunks.
+    """
+    amounts = _ColumnWriter(tmp_path, "amount", np.dtype("float64"))
+    ids = _ColumnWriter(tmp_path, "order_id", np.dtype(object))
+    for chunk_amounts, chunk_ids in (([1.5, 2.0], ["a", "b"]), ([3.25], [None]), ([4.0, 5.0], ["b", "c"])):
+        amounts.append(np.array(chunk_amounts))
+        ids.append(np.array(chunk_ids, dtype=object))
+    columns = [amounts.close(), ids.close()]
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps({"columns": columns}))
+
+    df = load_snapshot(tmp_path)
+
+    assert isinstance(np.load(tmp_path / "amount.npy", mmap_mode="r"), np.memmap)
+    assert df["amount"].tolist() == [1.5, 2.0, 3.25, 4.0, 5.0]
+    assert df["order_id"].astype(object).where(df["order_id"].notna(), None).tolist() == ["a", "b", None, "b", "c"]
+
+
+def _write_snapshot(path, columns: dict[str, tuple[str, list, str]]) -> None:
+    """
+    Snapshot of {name: (numpy dtype, values, pandas_dtype)} as export_snapshot writes it.
+    """
+    path.mkdir(parents=True)
+    manifest = []
+    for name, (dtype, values, pandas_dtype) in columns.items():
+        writer = _ColumnWriter(path, name, np.dtype(dtype))
+        if values:
+            writer.append(np.array(values, dtype=dtype))
+        manifest.append({**writer.close(), "pandas_dtype": pandas_dtype})
+    (path / MANIFEST_NAME).write_text(json.dumps({"columns": manifest}))
+
+
+def test_read_mart_uses_the_snapshot_of_the_current_version_with_db_dtypes(tmp_path, monkeypatch):
+    _write_snapshot(tmp_path / "fact_orders" / "v3", {
+        "order_id": ("object", ["a", "b", None], "object"),
+        "n_items": ("float64", [1.0, np.nan, 3.0], "Int32"),
+        "order_status": ("object", ["shipped", "delivered", "shipped"], "category"),
+    })
+    db_frame = pd.DataFrame({"order_id": ["z"]})
+    monkeypatch.setattr(snapshot, "read_table", lambda engine, table_name, *args: db_frame)
+
+    monkeypatch.setattr(snapshot, "build_version", lambda engine, table_name: 3)
+    df = read_mart(None, "fact_orders", directory=tmp_path)
+
+    assert df.dtypes.astype(str).to_dict() == {"order_id": "object", "n_items": "Int32", "order_status": "category"}
+    assert df["order_id"].tolist() == ["a", "b", None]
+    assert df["n_items"].isna().tolist() == [False, True, False]
+    assert list(df["order_status"].cat.categories) == ["delivered", "shipped"]
+
+    monkeypatch.setattr(snapshot, "build_version", lambda engine, table_name: 4)
+    assert read_mart(None, "fact_orders", directory=tmp_path) is db_frame
+
+
+def test_read_mart_of_an_empty_snapshot_keeps_its_columns(tmp_path, monkeypatch):
+    _write_snapshot(tmp_path / "fact_orders" / "v1", {
+        "order_id": ("object", [], "object"),
+        "order_date": ("datetime64[ns]", [], "datetime64[ns]"),
+    })
+    monkeypatch.setattr(snapshot, "build_version", lambda engine, table_name: 1)
+
+    df = read_mart(None, "fact_orders", columns=["order_id"], date_column="order_date", start="2018-01-01",
+                   directory=tmp_path)
+
+    assert list(df.columns) == ["order_id"] and len(df) == 0
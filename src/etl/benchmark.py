@@ -0,0 +1,362 @@
+from __future__ import annotations
+import argparse
+import json
+import sys
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+import psutil
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from src.db.engine import get_bulk_engine, get_engine
+from src.db.schema import table_dependencies
+from src.etl.build_marts import build_dim_date, build_fact_daily_demand, build_fact_daily_orders, build_fact_orders
+from src.etl.build_staging import STAGING_BUILDERS
+from src.etl.keys import KEY_MAPS, refresh_key_maps
+from src.etl.raw_to_db import RAW_CSV_FILES, RAW_LOADERS
+from src.etl.scheduler import topological_order
+from src.etl.synthetic import SYNTHETIC_DATA_DIRECTORY, generate
+from src.etl.text_norm import refresh_city_dictionary
+
+
+#--------------------------
+# Settings
+#--------------------------
+
+# parents[0]=etl, [1]=src, [2]=project root
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+BENCHMARK_DIRECTORY = PROJECT_ROOT / "data" / "benchmarks"
+BASELINE_PATH = BENCHMARK_DIRECTORY / "baseline.json"
+
+DEFAULT_SCALES = (1.0,)
+
+# A stage regresses when it is this much slower (or bigger) than the baseline...
+DEFAULT_THRESHOLD = 0.15
+# ...and the absolute change is above the noise floor
+MIN_REGRESSION_S = 0.5
+MIN_REGRESSION_RSS_MB = 50.0
+
+RSS_SAMPLE_INTERVAL_S = 0.05
+
+# The benchmark truncates the raw tables: only run it against a local, disposable database
+LOCAL_HOSTS = (None, "", "localhost", "127.0.0.1", "::1")
+
+# Raw tables and the ETL state derived from them, emptied before each scale. Truncated
+# without CASCADE: every table referencing one of them must be listed, so a new dependent
+# table makes the reset fail instead of being emptied unnoticed.
+# review_text_scores references key_reviews: the review text scores are lost as well (the
+# next process_reviews run removes their parts and scores every review again).
+RESET_TABLES = (
+    *RAW_LOADERS, "geolocation_agg", "etl_file_state", "etl_order_changes", "etl_dirty_dates",
+    "etl_change_watermarks",
+    *(key_map.table for key_map in KEY_MAPS.values()),
+    "review_text_scores",
+)
+
+
+#--------------------------
+# Results
+#--------------------------
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    group: str                  # load | staging | mart
+    run: Callable[[], None]
+    table: str | None           # relation counted for rows/s (None: not counted)
+
+
+@dataclass(frozen=True)
+class StageResult:
+    scale: float
+    stage: str
+    group: str
+    wall_s: float
+    rows: int | None
+    rows_per_s: float | None
+    peak_rss_mb: float
+    rss_delta_mb: float
+    blks_read: int
+    blks_hit: int
+    buffer_hit_ratio: float | None
+    temp_bytes: int
+    tup_inserted: int
+    wal_bytes: int
+
+
+#--------------------------
+# Helpers
+#--------------------------
+
+def _log_bench(message: str) -> None:
+    print(f"[BENCH] {message}")
+
+
+class _RssSampler:
+    """
+    Peak resident set size of this process (and its children) while a stage runs,
+    sampled from a background thread.
+    """
+
+    def __init__(self, interval_s: float = RSS_SAMPLE_INTERVAL_S) -> None:
+        self._process = psutil.Process()
+        self._interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self.start_bytes = self.peak_bytes = self._rss()
+
+    def _rss(self) -> int:
+        total = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return total
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self._interval_s):
+            self.peak_bytes = max(self.peak_bytes, self._rss())
+
+    def __enter__(self) -> _RssSampler:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self._rss())
+
+
+def _db_counters(engine: Engine) -> dict[str, int]:
+    """
+    Cumulative pg_stat_database counters of the current database and the WAL position.
+    """
+    with engine.connect() as conn:
+        # Drop the stats snapshot cached by this backend, so the counters are current
+        conn.execute(text("SELECT pg_stat_clear_snapshot()"))
+        row = conn.execute(text(
+            """
+            SELECT d.blks_read, d.blks_hit, d.temp_bytes, d.tup_inserted,
+                   pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0')::BIGINT AS wal_position
+            FROM pg_stat_database AS d
+            WHERE d.datname = current_database()
+            """
+        )).one()
+    return dict(row._mapping)
+
+
+def _flush_backend_stats(*engines: Engine) -> None:
+    """
+    Close the pooled connections: backends report their pending statistics when they
+    exit, instead of up to 10s later when idle.
+    """
+    for engine in engines:
+        engine.dispose()
+    time.sleep(0.2)
+
+
+def _count_rows(engine: Engine, table: str | None) -> int | None:
+    if table is None:
+        return None
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar_one()
+
+
+def _check_local(engine: Engine) -> None:
+    if engine.url.host not in LOCAL_HOSTS:
+        raise RuntimeError(
+            f"Refusing to benchmark against {engine.url.host}: the run truncates the raw tables "
+            "(use a local database or pass --allow-remote)"
+        )
+
+
+def _reset_database(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE TABLE {', '.join(RESET_TABLES)} RESTART IDENTITY"))
+
+
+def _dataset(scale: float) -> Path:
+    """
+    Synthetic CSVs of a scale factor, generated on first use and reused afterwards.
+    """
+    directory = SYNTHETIC_DATA_DIRECTORY / f"sf{scale:g}"
+    if not all((directory / name).exists() for name in RAW_CSV_FILES.values()):
+        generate(directory, scale=scale)
+    return directory
+
+
+def _stages(bulk_engine: Engine, engine: Engine, data_dir: Path) -> list[Stage]:
+    """
+    Every pipeline step in a valid order, one at a time so each stage is measured alone.
+    """
+    loads = [
+        Stage(f"load_{table}", "load", partial(RAW_LOADERS[table], bulk_engine, data_dir), table)
+        for table in topological_order(table_dependencies(RAW_LOADERS))
+    ]
+    staging = [
+        Stage("refresh_city_dictionary", "staging", partial(refresh_city_dictionary, engine), "city_norm_dict"),
+        Stage("refresh_key_maps", "staging", partial(refresh_key_maps, engine), None),
+        *(
+            Stage(f"build_{name}", "staging", partial(builder, engine), name)
+            for name, builder in STAGING_BUILDERS.items()
+        ),
+    ]
+    marts = [
+        Stage("build_fact_orders", "mart", partial(build_fact_orders, engine), "fact_orders"),
+        Stage("build_fact_daily_orders", "mart", partial(build_fact_daily_orders, engine), "fact_daily_orders"),
+        Stage("build_fact_daily_demand", "mart", partial(build_fact_daily_demand, engine), "fact_daily_demand"),
+        Stage("build_dim_date", "mart", partial(build_dim_date, engine), "dim_date"),
+    ]
+    return loads + staging + marts
+
+
+def _measure(stage: Stage, scale: float, engine: Engine, bulk_engine: Engine) -> StageResult:
+    before = _db_counters(engine)
+    with _RssSampler() as rss:
+        start = time.perf_counter()
+        stage.run()
+        wall_s = time.perf_counter() - start
+    _flush_backend_stats(bulk_engine, engine)
+    after = _db_counters(engine)
+
+    delta = {name: after[name] - before[name] for name in before}
+    rows = _count_rows(engine, stage.table)
+    accesses = delta["blks_read"] + delta["blks_hit"]
+    return StageResult(
+        scale=scale,
+        stage=stage.name,
+        group=stage.group,
+        wall_s=round(wall_s, 4),
+        rows=rows,
+        rows_per_s=round(rows / wall_s, 1) if rows is not None and wall_s > 0 else None,
+        peak_rss_mb=round(rss.peak_bytes / 2**20, 1),
+        rss_delta_mb=round((rss.peak_bytes - rss.start_bytes) / 2**20, 1),
+        blks_read=delta["blks_read"],
+        blks_hit=delta["blks_hit"],
+        buffer_hit_ratio=round(delta["blks_hit"] / accesses, 4) if accesses else None,
+        temp_bytes=delta["temp_bytes"],
+        tup_inserted=delta["tup_inserted"],
+        wal_bytes=delta["wal_position"],
+    )
+
+
+#--------------------------
+# Public API
+#--------------------------
+
+def run_benchmark(engine: Engine, scales: tuple[float, ...] = DEFAULT_SCALES,
+                  bulk_engine: Engine | None = None, allow_remote: bool = False) -> dict:
+    """
+    Time every raw loader, staging build and mart build at each scale factor.
+
+    - Data comes from the synthetic generator (data/synthetic/sf<scale>, reused across runs)
+    - Before each scale the raw tables, key maps, incremental state and review text scores
+      (RESET_TABLES) are truncated, then stages run one by one (no DAG concurrency) in
+      dependency order
+    - Per stage: wall time, rows and rows/s of its output relation, peak and delta RSS of
+      this process, and pg_stat_database block / temp / insert counters and WAL bytes over
+      the stage (the whole database: keep other workloads off it while benchmarking)
+    Returns the JSON-ready report.
+    """
+    bulk_engine = bulk_engine or engine
+    if not allow_remote:
+        _check_local(engine)
+    with engine.connect() as conn:
+        server_version = conn.execute(text("SHOW server_version")).scalar_one()
+
+    results: list[StageResult] = []
+    for scale in scales:
+        data_dir = _dataset(scale)
+        _reset_database(engine)
+        for stage in _stages(bulk_engine, engine, data_dir):
+            result = _measure(stage, scale, engine, bulk_engine)
+            results.append(result)
+            rate = f", {result.rows_per_s:,.0f} rows/s" if result.rows_per_s is not None else ""
+            _log_bench(
+                f"sf{scale:g} {stage.name}: {result.wall_s:.2f}s{rate}, peak RSS {result.peak_rss_mb:,.0f} MB, "
+                f"WAL {result.wal_bytes / 2**20:,.1f} MB"
+            )
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "server_version": server_version,
+        "scales": list(scales),
+        "results": [asdict(result) for result in results],
+    }
+
+
+def compare_results(report: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list[dict]:
+    """
+    Stages slower (wall_s) or heavier (peak_rss_mb) than the baseline by more than
+    threshold, ignoring changes under MIN_REGRESSION_S / MIN_REGRESSION_RSS_MB.
+    Only (scale, stage) pairs present in both reports are compared.
+    """
+    floors = {"wall_s": MIN_REGRESSION_S, "peak_rss_mb": MIN_REGRESSION_RSS_MB}
+    reference = {(row["scale"], row["stage"]): row for row in baseline["results"]}
+    regressions = []
+    for row in report["results"]:
+        base = reference.get((row["scale"], row["stage"]))
+        if base is None:
+            continue
+        for metric, floor in floors.items():
+            change = row[metric] - base[metric]
+            if change > floor and change > threshold * base[metric]:
+                regressions.append({
+                    "scale": row["scale"],
+                    "stage": row["stage"],
+                    "metric": metric,
+                    "baseline": base[metric],
+                    "current": row[metric],
+                    "change": round(change / base[metric], 4) if base[metric] else None,
+                })
+    return regressions
+
+
+def save_report(report: dict, path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return path
+
+
+#--------------------------
+# Main
+#--------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ETL stages on synthetic data.")
+    parser.add_argument("--scales", type=float, nargs="+", default=list(DEFAULT_SCALES), help="e.g. 1 10 100")
+    parser.add_argument("--output", type=Path, default=None, help="Default: data/benchmarks/bench-<timestamp>.json")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Relative slowdown flagged")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--allow-remote", action="store_true", help="Run against a non-local database")
+    args = parser.parse_args()
+
+    report = run_benchmark(get_engine(), tuple(args.scales), get_bulk_engine(), args.allow_remote)
+    output = args.output or BENCHMARK_DIRECTORY / f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    _log_bench(f"results -> {save_report(report, output)}")
+
+    if args.save_baseline:
+        _log_bench(f"baseline -> {save_report(report, args.baseline)}")
+        return
+    if not args.baseline.exists():
+        _log_bench(f"no baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+
+    regressions = compare_results(report, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold)
+    for regression in regressions:
+        _log_bench(
+            f"[REGRESSION] sf{regression['scale']:g} {regression['stage']} {regression['metric']}: "
+            f"{regression['baseline']} -> {regression['current']}"
+        )
+    if regressions:
+        sys.exit(1)
+    _log_bench("no regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
 from __future__ import annotations
+import argparse
 from sqlalchemy import text
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Connection, Engine
 from src.db.engine import get_engine
+from src.db.snapshot import export_snapshots
+from src.etl.build_staging import staging_change_cutoff
+from src.etl.instrument import instrumented, record_rows
+from src.etl.materialize import Model, materialize, record_build, relation_exists, upsert
+from src.etl.plans import execute_build_statement
 
 
 #--------------------------
@@ -16,7 +22,211 @@ def _log_build(table_name: str) -> None:
 # Fact tables
 # --------------------------
 
-def build_fact_orders(engine: Engine) -> None:
+# {order_filter} / {outer_filter} restrict the aggregates to _changed_orders in incremental
+# builds and are left empty for the full build
+FACT_ORDERS_SQL = """
+        SELECT
+            o.order_sk,
+            o.customer_sk,
+            o.order_id,
+            o.customer_id,
+            o.order_date,
+            o.order_status,
+            o.is_delivered,
+            o.is_canceled,
+            o.order_purchase_timestamp,
+            o.order_delivered_customer_date,
+            o.order_estimated_delivery_date,
+
+            CASE 
+                WHEN o.order_delivered_customer_date IS NOT NULL
+                THEN (o.order_delivered_customer_date::date - o.order_purchase_timestamp::date)
+                ELSE NULL
+            END AS delivery_time_days,
+
+            CASE 
+                WHEN o.order_delivered_customer_date IS NOT NULL
+                THEN (o.order_delivered_customer_date::date - o.order_estimated_delivery_date::date)
+                ELSE NULL
+            END AS delay_vs_estimated_days,
+
+            -- items aggregation
+            COALESCE(i.n_items, 0) AS n_items,
+            COALESCE(i.items_price_sum, 0) AS items_price_sum,
+            COALESCE(i.freight_sum, 0) AS freight_sum,
+            COALESCE(i.order_gross_value, 0) AS order_gross_value,
+
+            -- payments aggregation
+            p.payment_value_total,
+            p.payment_installments_max,
+            p.first_payment_type,
+
+            -- review aggregation
+            r.review_score_avg,
+            r.has_comment
+
+        FROM stg_orders AS o
+
+        LEFT JOIN (
+            SELECT
+                order_sk,
+                COUNT(*) AS n_items,
+                SUM(price) AS items_price_sum,
+                SUM(freight_value) AS freight_sum,
+                SUM(item_total) AS order_gross_value
+            FROM stg_items
+            {order_filter}
+            GROUP BY order_sk
+        ) AS i
+          ON i.order_sk = o.order_sk
+
+        LEFT JOIN (
+            SELECT
+                order_sk,
+                SUM(payment_value) AS payment_value_total,
+                MAX(payment_installments) AS payment_installments_max,
+                MAX(
+                    CASE
+                        WHEN is_first_payment THEN payment_type
+                        ELSE NULL
+                    END
+                ) AS first_payment_type
+            FROM stg_payments
+            {order_filter}
+            GROUP BY order_sk
+        ) AS p
+          ON p.order_sk = o.order_sk
+
+        LEFT JOIN (
+            SELECT
+                order_sk,
+                AVG(review_score)::NUMERIC(5,2) AS review_score_avg,
+                BOOL_OR(has_comment) AS has_comment
+            FROM stg_reviews
+            {order_filter}
+            GROUP BY order_sk
+        ) AS r
+          ON r.order_sk = o.order_sk
+
+        {outer_filter}
+"""
+
+FACT_ORDERS = Model(
+    name="fact_orders",
+    materialization="table",
+    # primary key on the integer surrogate key for faster joins
+    unique_key=("order_sk",),
+    indexes=(("order_id",), ("order_date",), ("customer_sk",)),
+    sql=FACT_ORDERS_SQL.format(order_filter="", outer_filter=""),
+)
+
+_CHANGED_ORDERS_FILTER = "WHERE order_id IN (SELECT order_id FROM _changed_orders)"
+
+# Models aggregating by order_date; fact_orders builds mark their stale dates
+DATE_CONSUMERS = ("fact_daily_orders", "fact_daily_demand")
+
+
+def _mark_dirty_dates(conn: Connection, date_sql: str) -> None:
+    """
+    Queue the order_dates returned by date_sql for every model in DATE_CONSUMERS.
+    """
+    for model_name in DATE_CONSUMERS:
+        conn.execute(
+            text(
+                f"""
+                INSERT INTO etl_dirty_dates (model_name, order_date)
+                SELECT DISTINCT CAST(:model_name AS TEXT), order_date FROM ({date_sql}) AS d
+                WHERE order_date IS NOT NULL
+                ON CONFLICT DO NOTHING
+                """
+            ),
+            {"model_name": model_name},
+        )
+
+
+def _consume_dirty_dates(conn: Connection, model_name: str) -> int:
+    """
+    Move the model's queued dates into the temp table _dirty_dates (dropped on commit).
+    Returns the number of dates.
+    """
+    conn.execute(text("CREATE TEMP TABLE _dirty_dates (order_date DATE PRIMARY KEY) ON COMMIT DROP"))
+    return conn.execute(
+        text(
+            """
+            WITH consumed AS (
+                DELETE FROM etl_dirty_dates WHERE model_name = :model_name RETURNING order_date
+            )
+            INSERT INTO _dirty_dates
+            SELECT DISTINCT order_date FROM consumed
+            """
+        ),
+        {"model_name": model_name},
+    ).rowcount
+
+
+def _refresh_fact_orders(engine: Engine) -> int:
+    """
+    Fold the orders logged in etl_order_changes into fact_orders, in one transaction:
+
+    1. Consume the change log into a temp table, only up to staging_change_cutoff: changes
+       logged after staging was built are not in the stg_* tables yet and stay queued
+    2. Delete fact rows whose order no longer exists in stg_orders
+    3. Recompute the aggregates of the changed orders only and upsert them on order_sk
+
+    Returns the number of changed orders.
+    """
+    with engine.begin() as conn:
+        cutoff = staging_change_cutoff(conn)
+        if cutoff is None:
+            raise RuntimeError("Staging has no change watermark yet; rebuild staging before refreshing fact_orders")
+        conn.execute(text("CREATE TEMP TABLE _changed_orders (order_id TEXT PRIMARY KEY) ON COMMIT DROP"))
+        n_changed = conn.execute(
+            text(
+                """
+                WITH consumed AS (
+                    DELETE FROM etl_order_changes WHERE change_id <= :cutoff RETURNING order_id
+                )
+                INSERT INTO _changed_orders
+                SELECT DISTINCT order_id FROM consumed
+                """
+            ),
+            {"cutoff": cutoff},
+        ).rowcount
+        if n_changed == 0:
+            return 0
+        conn.execute(text("ANALYZE _changed_orders"))
+
+        # Dates before the change (orders may move or disappear) and after it
+        changed_dates = f"SELECT order_date FROM fact_orders {_CHANGED_ORDERS_FILTER}"
+        _mark_dirty_dates(conn, changed_dates)
+
+        execute_build_statement(
+            conn,
+            "fact_orders",
+            "refresh_delete",
+            """
+            DELETE FROM fact_orders AS f
+            USING _changed_orders AS c
+            WHERE f.order_id = c.order_id
+              AND NOT EXISTS (SELECT 1 FROM stg_orders AS o WHERE o.order_id = c.order_id)
+            """,
+        )
+        upsert(
+            conn,
+            "fact_orders",
+            FACT_ORDERS_SQL.format(
+                order_filter=_CHANGED_ORDERS_FILTER,
+                outer_filter=_CHANGED_ORDERS_FILTER.replace("order_id", "o.order_id", 1),
+            ),
+            key=FACT_ORDERS.unique_key,
+        )
+        _mark_dirty_dates(conn, changed_dates)
+        record_build(conn, "fact_orders", "incremental")
+    return n_changed
+
+
+@instrumented("mart")
+def build_fact_orders(engine: Engine, incremental: bool = False) -> None:
     """
     Build fact_orders from staging tables.
 
@@ -27,104 +237,97 @@ def build_fact_orders(engine: Engine) -> None:
     - stg_items -> aggregates: n_items, revenue, freight, gross order value
     - stg_payments -> aggregates: total paid, max installments, first payment type
     - stg_reviews -> aggregates: avg review_score and has_comment flag
+    All joins are on the INTEGER order_sk; the hex ids are kept for lookups and decoding.
 
     Also computes a couple of time deltas in days.
+    Regular table (PK order_sk), rebuilt in a shadow table and swapped in when run.
+
+    incremental=True only recomputes the orders touched in raw orders/items/payments/reviews
+    since the last build (logged by triggers into etl_order_changes) and upserts them;
+    falls back to a full build if fact_orders does not exist yet.
+    Staging must be rebuilt first, the aggregates are read from the stg_* tables.
     """
+    if incremental and relation_exists(engine, FACT_ORDERS.name):
+        n_changed = _refresh_fact_orders(engine)
+        print(f"[MART] refreshed fact_orders incrementally ({n_changed} changed orders)")
+        return
+
+    # A full build covers every change logged before it started that staging also covers;
+    # later ones stay queued
+    with engine.connect() as conn:
+        last_change = conn.execute(text("SELECT MAX(change_id) FROM etl_order_changes")).scalar_one()
+        cutoff = staging_change_cutoff(conn)
+    materialize(engine, FACT_ORDERS)
     with engine.begin() as conn:
-        # 1. Drop if exists so the build is idempotent
-        conn.execute(text("DROP TABLE IF EXISTS fact_orders"))
+        if last_change is not None and cutoff is not None:
+            conn.execute(
+                text("DELETE FROM etl_order_changes WHERE change_id <= :last"), {"last": min(last_change, cutoff)},
+            )
+        # Every date may have changed; the daily models re-aggregate all of them
+        _mark_dirty_dates(conn, "SELECT order_date FROM fact_orders")
 
-        # 2. Build fact table from staging tables
-        conn.execute(text(
-            """
-            CREATE TABLE fact_orders AS
-            SELECT
-                o.order_id,
-                o.customer_id,
-                o.order_date,
-                o.order_status,
-                o.is_delivered,
-                o.is_canceled,
-                o.order_purchase_timestamp,
-                o.order_delivered_customer_date,
-                o.order_estimated_delivery_date,
-
-                CASE 
-                    WHEN o.order_delivered_customer_date IS NOT NULL
-                    THEN (o.order_delivered_customer_date::date - o.order_purchase_timestamp::date)
-                    ELSE NULL
-                END AS delivery_time_days,
-
-                CASE 
-                    WHEN o.order_delivered_customer_date IS NOT NULL
-                    THEN (o.order_delivered_customer_date::date - o.order_estimated_delivery_date::date)
-                    ELSE NULL
-                END AS delay_vs_estimated_days,
-
-                -- items aggregation
-                COALESCE(i.n_items, 0) AS n_items,
-                COALESCE(i.items_price_sum, 0) AS items_price_sum,
-                COALESCE(i.freight_sum, 0) AS freight_sum,
-                COALESCE(i.order_gross_value, 0) AS order_gross_value,
-
-                -- payments aggregation
-                p.payment_value_total,
-                p.payment_installments_max,
-                p.first_payment_type,
-
-                -- review aggregation
-                r.review_score_avg,
-                r.has_comment
-
-            FROM stg_orders AS o
-
-            LEFT JOIN (
-                SELECT
-                    order_id,
-                    COUNT(*) AS n_items,
-                    SUM(price) AS items_price_sum,
-                    SUM(freight_value) AS freight_sum,
-                    SUM(item_total) AS order_gross_value
-                FROM stg_items
-                GROUP BY order_id
-            ) AS i
-              ON i.order_id = o.order_id
-
-            LEFT JOIN (
-                SELECT
-                    order_id,
-                    SUM(payment_value) AS payment_value_total,
-                    MAX(payment_installments) AS payment_installments_max,
-                    MAX(
-                        CASE
-                            WHEN is_first_payment THEN payment_type
-                            ELSE NULL
-                        END
-                    ) AS first_payment_type
-                FROM stg_payments
-                GROUP BY order_id
-            ) AS p
-              ON p.order_id = o.order_id
-
-            LEFT JOIN (
-                SELECT
-                    order_id,
-                    AVG(review_score)::NUMERIC(5,2) AS review_score_avg,
-                    BOOL_OR(has_comment) AS has_comment
-                FROM stg_reviews
-                GROUP BY order_id
-            ) AS r
-              ON r.order_id = o.order_id;
-            """
-        ))
+    _log_build("fact_orders")
 
-        # 3. Add primary key on order_id for faster joins
-        conn.execute(text("ALTER TABLE fact_orders ADD PRIMARY KEY (order_id);"))
 
-    _log_build("fact_orders")
+# {date_filter} restricts the aggregation to _dirty_dates in incremental builds
+FACT_DAILY_ORDERS_SQL = """
+        SELECT
+            order_date,
+
+            -- Only include non-canceled orders in main sales metrics
+            COUNT(*) FILTER (WHERE NOT is_canceled) AS n_orders,
+            SUM(order_gross_value) FILTER (WHERE NOT is_canceled) AS gross_revenue,
+            SUM(items_price_sum) FILTER (WHERE NOT is_canceled) AS items_revenue,
+            SUM(freight_sum) FILTER (WHERE NOT is_canceled) AS freight_revenue,
+            AVG(order_gross_value) FILTER (WHERE NOT is_canceled) AS avg_order_value,
+            SUM(n_items) FILTER (WHERE NOT is_canceled) AS n_items,
+
+            -- Reviews: include any order that has a review_score_avg
+            AVG(review_score_avg) AS avg_review_score,
+            COUNT(review_score_avg) AS n_reviewed_orders,
+            SUM(
+                CASE WHEN has_comment THEN 1 ELSE 0 END
+            ) AS n_commented_reviews
+
+        FROM fact_orders
+        {date_filter}
+        GROUP BY order_date
+"""
+
+FACT_DAILY_ORDERS = Model(
+    name="fact_daily_orders",
+    materialization="table",
+    unique_key=("order_date",),
+    sql=FACT_DAILY_ORDERS_SQL.format(date_filter=""),
+)
+
+
+def _refresh_fact_daily_orders(engine: Engine) -> int:
+    """
+    Re-aggregate the dirty order_dates only: delete their rows, insert the fresh groups
+    (a date whose orders all disappeared simply gets no row). One transaction.
+
+    Returns the number of dates refreshed.
+    """
+    with engine.begin() as conn:
+        n_dates = _consume_dirty_dates(conn, FACT_DAILY_ORDERS.name)
+        if n_dates == 0:
+            return 0
+        execute_build_statement(
+            conn, FACT_DAILY_ORDERS.name, "refresh_delete",
+            "DELETE FROM fact_daily_orders WHERE order_date IN (SELECT order_date FROM _dirty_dates)",
+        )
+        record_rows(execute_build_statement(
+            conn, FACT_DAILY_ORDERS.name, "refresh_insert",
+            "INSERT INTO fact_daily_orders "
+            + FACT_DAILY_ORDERS_SQL.format(date_filter="WHERE order_date IN (SELECT order_date FROM _dirty_dates)"),
+        ))
+        record_build(conn, FACT_DAILY_ORDERS.name, "incremental")
+    return n_dates
 
 
-def build_fact_daily_orders(engine: Engine) -> None:
+@instrumented("mart")
+def build_fact_daily_orders(engine: Engine, incremental: bool = False) -> None:
     """
     Build fact_daily_orders from fact_orders.
 
@@ -132,43 +335,198 @@ def build_fact_daily_orders(engine: Engine) -> None:
 
     Only non-canceled orders contribute to the main sales metrics
     (n_orders, revenue, etc.).
+
+    incremental=True only re-aggregates the order_dates queued in etl_dirty_dates by
+    fact_orders builds; falls back to a full build if the table does not exist yet.
     """
+    if incremental and relation_exists(engine, FACT_DAILY_ORDERS.name):
+        n_dates = _refresh_fact_daily_orders(engine)
+        print(f"[MART] refreshed fact_daily_orders incrementally ({n_dates} dates)")
+        return
+
+    materialize(engine, FACT_DAILY_ORDERS)
+    # The full build covers every queued date
     with engine.begin() as conn:
-        # Rebuild idempotently
-        conn.execute(text("DROP TABLE IF EXISTS fact_daily_orders"))
+        conn.execute(text("DELETE FROM etl_dirty_dates WHERE model_name = :model_name"), {"model_name": FACT_DAILY_ORDERS.name})
 
-        conn.execute(text(
-            """
-            CREATE TABLE fact_daily_orders AS
+    _log_build("fact_daily_orders")
+
+
+# Rollup label of the category / state columns in fact_daily_demand
+ALL_LABEL = "__all__"
+
+# {date_filter} restricts the scan to _dirty_dates in incremental builds;
+# {all_label} is ALL_LABEL
+FACT_DAILY_DEMAND_SQL = """
+        SELECT
+            order_date,
+            CASE WHEN GROUPING(product_category_name) = 1 THEN '{all_label}' ELSE product_category_name END
+                AS product_category_name,
+            CASE WHEN GROUPING(customer_state) = 1 THEN '{all_label}' ELSE customer_state END
+                AS customer_state,
+            COUNT(DISTINCT order_sk) AS n_orders,
+            COUNT(*) AS n_items,
+            SUM(price) AS items_revenue,
+            SUM(freight_value) AS freight_revenue,
+            SUM(item_total) AS gross_revenue
+        FROM (
             SELECT
-                order_date,
-
-                -- Only include non-canceled orders in main sales metrics
-                COUNT(*) FILTER (WHERE NOT is_canceled) AS n_orders,
-                SUM(order_gross_value) FILTER (WHERE NOT is_canceled) AS gross_revenue,
-                SUM(items_price_sum) FILTER (WHERE NOT is_canceled) AS items_revenue,
-                SUM(freight_sum) FILTER (WHERE NOT is_canceled) AS freight_revenue,
-                AVG(order_gross_value) FILTER (WHERE NOT is_canceled) AS avg_order_value,
-                SUM(n_items) FILTER (WHERE NOT is_canceled) AS n_items,
-
-                -- Reviews: include any order that has a review_score_avg
-                AVG(review_score_avg) AS avg_review_score,
-                COUNT(review_score_avg) AS n_reviewed_orders,
-                SUM(
-                    CASE WHEN has_comment THEN 1 ELSE 0 END
-                ) AS n_commented_reviews
-
-            FROM fact_orders
-            GROUP BY order_date;
-            """
+                o.order_date,
+                COALESCE(p.product_category_name, 'unknown') AS product_category_name,
+                COALESCE(c.customer_state::TEXT, 'unknown') AS customer_state,
+                i.order_sk,
+                i.price,
+                i.freight_value,
+                i.item_total
+            FROM stg_items AS i
+            JOIN stg_orders AS o
+              ON o.order_sk = i.order_sk
+            LEFT JOIN stg_products AS p
+              ON p.product_sk = i.product_sk
+            LEFT JOIN stg_customers AS c
+              ON c.customer_sk = o.customer_sk
+            WHERE NOT o.is_canceled
+              AND o.order_date IS NOT NULL
+              {date_filter}
+        ) AS d
+        -- Every granularity in one scan of the join
+        GROUP BY GROUPING SETS (
+            (order_date, product_category_name, customer_state),
+            (order_date, product_category_name),
+            (order_date, customer_state),
+            (order_date)
+        )
+"""
+
+FACT_DAILY_DEMAND = Model(
+    name="fact_daily_demand",
+    materialization="table",
+    # series columns first: one series is a contiguous range of the primary key index
+    unique_key=("product_category_name", "customer_state", "order_date"),
+    indexes=(("order_date",),),
+    sql=FACT_DAILY_DEMAND_SQL.format(all_label=ALL_LABEL, date_filter=""),
+)
+
+
+def _refresh_fact_daily_demand(engine: Engine) -> int:
+    """
+    Re-aggregate the dirty order_dates of the demand cube (all rollup levels of a date are
+    recomputed together). One transaction.
+
+    Returns the number of dates refreshed.
+    """
+    with engine.begin() as conn:
+        n_dates = _consume_dirty_dates(conn, FACT_DAILY_DEMAND.name)
+        if n_dates == 0:
+            return 0
+        execute_build_statement(
+            conn, FACT_DAILY_DEMAND.name, "refresh_delete",
+            "DELETE FROM fact_daily_demand WHERE order_date IN (SELECT order_date FROM _dirty_dates)",
+        )
+        record_rows(execute_build_statement(
+            conn, FACT_DAILY_DEMAND.name, "refresh_insert",
+            "INSERT INTO fact_daily_demand "
+            + FACT_DAILY_DEMAND_SQL.format(
+                all_label=ALL_LABEL, date_filter="AND o.order_date IN (SELECT order_date FROM _dirty_dates)",
+            ),
         ))
+        record_build(conn, FACT_DAILY_DEMAND.name, "incremental")
+    return n_dates
 
-        conn.execute(text("ALTER TABLE fact_daily_orders ADD PRIMARY KEY (order_date);"))
 
-    _log_build("fact_daily_orders")
+@instrumented("mart")
+def build_fact_daily_demand(engine: Engine, incremental: bool = False) -> None:
+    """
+    Build fact_daily_demand (daily demand cube) from stg_items, stg_orders, stg_products
+    and stg_customers.
+
+    Grain: one row per order_date x product_category_name x customer_state, plus the rollups
+    - (date, category) with customer_state = '__all__'
+    - (date, state) with product_category_name = '__all__'
+    - (date) with both set to '__all__'
+    All levels come from a single GROUPING SETS scan. Missing categories / states are
+    labelled 'unknown'; canceled orders are excluded (as in fact_daily_orders).
 
+    Measures: n_orders (distinct orders), n_items, items/freight/gross revenue.
 
-def build_dim_date(engine: Engine) -> None:
+    incremental=True only re-aggregates the order_dates queued in etl_dirty_dates by
+    fact_orders builds; falls back to a full build if the table does not exist yet.
+    A product re-categorized without any order change needs a full build.
+    """
+    if incremental and relation_exists(engine, FACT_DAILY_DEMAND.name):
+        n_dates = _refresh_fact_daily_demand(engine)
+        print(f"[MART] refreshed fact_daily_demand incrementally ({n_dates} dates)")
+        return
+
+    materialize(engine, FACT_DAILY_DEMAND)
+    # The full build covers every queued date
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM etl_dirty_dates WHERE model_name = :model_name"), {"model_name": FACT_DAILY_DEMAND.name})
+
+    _log_build("fact_daily_demand")
+
+
+DIM_DATE = Model(
+    name="dim_date",
+    materialization="table",
+    unique_key=("date",),
+    sql="""
+        WITH bounds AS (
+        SELECT
+            MIN(order_date) AS min_date,
+            MAX(order_date) AS max_date
+        FROM fact_daily_orders
+        ),
+
+        calendar AS (
+            SELECT
+                generate_series(min_date, max_date, interval '1 day')::date AS date
+            FROM bounds
+        )
+
+        SELECT
+            date,
+            EXTRACT(year FROM date)::int AS year,
+            EXTRACT(month FROM date)::int AS month,
+            EXTRACT(day FROM date)::int AS day,
+            EXTRACT(isodow FROM date)::int AS day_of_week_iso,
+            TO_CHAR(date, 'Dy') AS day_name_short,
+            TO_CHAR(date, 'Month') AS month_name,
+            EXTRACT(week FROM date)::int AS week_of_year,
+            (EXTRACT(isodow FROM date) IN (6,7)) AS is_weekend
+        FROM calendar
+    """,
+)
+
+
+def _extend_dim_date(engine: Engine) -> int:
+    """
+    Insert the calendar dates missing when fact_daily_orders' order_date range grew past
+    dim_date's (existing rows are kept, a shrinking range leaves a wider calendar).
+
+    Returns the number of dates added; nothing is written when the range did not move.
+    """
+    with engine.begin() as conn:
+        order_min, order_max, date_min, date_max = conn.execute(text(
+            """
+            SELECT
+                (SELECT MIN(order_date) FROM fact_daily_orders),
+                (SELECT MAX(order_date) FROM fact_daily_orders),
+                (SELECT MIN(date) FROM dim_date),
+                (SELECT MAX(date) FROM dim_date)
+            """
+        )).one()
+        if order_max is None or (date_min is not None and date_min <= order_min and order_max <= date_max):
+            return 0
+        n_added = conn.execute(text(
+            f"INSERT INTO dim_date {DIM_DATE.sql} ON CONFLICT (date) DO NOTHING"
+        )).rowcount
+        record_build(conn, DIM_DATE.name, "incremental")
+    return n_added
+
+
+@instrumented("mart")
+def build_dim_date(engine: Engine, incremental: bool = False) -> None:
     """
     Build dim_date (date/calendar dimension).
 
@@ -181,42 +539,17 @@ def build_dim_date(engine: Engine) -> None:
     - week of year
     - month name, short day name
     - is_weekend flag
-    """
-    with engine.begin() as conn:
-        # Rebuild idempotently
-        conn.execute(text("DROP TABLE IF EXISTS dim_date"))
-
-        conn.execute(text(
-            """
-            CREATE TABLE dim_date AS
-                WITH bounds AS (
-                SELECT
-                    MIN(order_date) AS min_date,
-                    MAX(order_date) AS max_date
-                FROM fact_daily_orders
-                ),
-
-                calendar AS (
-                    SELECT
-                        generate_series(min_date, max_date, interval '1 day')::date AS date
-                    FROM bounds
-                )
 
-                SELECT
-                    date,
-                    EXTRACT(year FROM date)::int AS year,
-                    EXTRACT(month FROM date)::int AS month,
-                    EXTRACT(day FROM date)::int AS day,
-                    EXTRACT(isodow FROM date)::int AS day_of_week_iso,
-                    TO_CHAR(date, 'Dy') AS day_name_short,
-                    TO_CHAR(date, 'Month') AS month_name,
-                    EXTRACT(week FROM date)::int AS week_of_year,
-                    (EXTRACT(isodow FROM date) IN (6,7)) AS is_weekend
-                FROM calendar;
-            """
-        ))
+    incremental=True only appends the dates missing when MIN/MAX(order_date) moved past
+    the current calendar; falls back to a full build if dim_date does not exist yet.
+    """
+    if incremental and relation_exists(engine, DIM_DATE.name):
+        n_added = _extend_dim_date(engine)
+        record_rows(n_added)
+        print(f"[MART] extended dim_date incrementally ({n_added} dates added)")
+        return
 
-        conn.execute(text("ALTER TABLE dim_date ADD PRIMARY KEY (date);"))
+    materialize(engine, DIM_DATE)
 
     _log_build("dim_date")
 
@@ -225,10 +558,28 @@ def build_dim_date(engine: Engine) -> None:
 #--------------------------
 
 def main():
+    parser = argparse.ArgumentParser(description="Build the mart tables from staging.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only refresh the orders and order dates changed since the last build",
+    )
+    parser.add_argument(
+        "--no-snapshots",
+        action="store_true",
+        help="Do not export the mart snapshots (data/snapshots) after the build",
+    )
+    args = parser.parse_args()
+
     engine = get_engine()
-    build_fact_orders(engine)
-    build_fact_daily_orders(engine)
-    build_dim_date(engine)
+    build_fact_orders(engine, incremental=args.incremental)
+    build_fact_daily_orders(engine, incremental=args.incremental)
+    build_fact_daily_demand(engine, incremental=args.incremental)
+    build_dim_date(engine, incremental=args.incremental)
+
+    # Local columnar copies for training / notebooks, tagged with the build versions above
+    if not args.no_snapshots:
+        export_snapshots(engine)
 
 if __name__ == "__main__":
     main()
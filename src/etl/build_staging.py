@@ -1,8 +1,13 @@
 from __future__ import annotations
-from pathlib import Path
-from sqlalchemy.engine import Engine
+from functools import partial
 from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
 from src.db.engine import get_engine
+from src.etl.instrument import instrumented
+from src.etl.keys import refresh_key_maps
+from src.etl.materialize import Model, materialize
+from src.etl.scheduler import run_dag
+from src.etl.text_norm import refresh_city_dictionary
 
 
 #--------------------------
@@ -12,347 +17,477 @@ from src.db.engine import get_engine
 def _log_build(table_name: str) -> None:
     print(f"[STAGING] built {table_name}")
 
-#--------------------------
-# Create staging tables
-#--------------------------
 
-def build_stg_customers(engine: Engine) -> None:
-    """
-    Builds the stg_customers table from raw customers.
+# Models read by fact_orders; they record how far etl_order_changes they cover
+ORDER_CHANGE_MODELS = ("stg_orders", "stg_items", "stg_payments", "stg_reviews")
 
-    - Keeps the same grain: one row per customer_id
-    - Adds a normalized city column (lowercase, no accents, cleaned chars)
-    - Idempotent: DROP + CREATE when run
+
+def _materialize_with_watermark(engine: Engine, model: Model) -> None:
+    """
+    materialize() the model and record the highest change_id logged before the build
+    started in etl_change_watermarks: every change up to it is in the new table.
     """
+    with engine.connect() as conn:
+        last_change = conn.execute(text("SELECT COALESCE(MAX(change_id), 0) FROM etl_order_changes")).scalar_one()
+    materialize(engine, model)
     with engine.begin() as conn:
-        # 1. Drop staging table if already exists
-        conn.execute(text("DROP TABLE IF EXISTS stg_customers"))
-
-        # 2. Create staging table from raw customers
         conn.execute(
             text(
                 """
-                CREATE TABLE stg_customers AS
-                SELECT 
-                    customer_id,
-                    customer_unique_id,
-                    customer_zip_code_prefix,
-                    -- lowercase, remove accents, keep only letters/digits/spaces
-                    trim(
-                        regexp_replace(
-                            regexp_replace(
-                                unaccent(LOWER(customer_city)),
-                                '[^a-z0-9]+',
-                                ' ',
-                                'g'
-                            ),
-                            '\\s+',
-                            ' ',
-                            'g'
-                        )
-                    ) AS customer_city_norm,
-                    customer_state
-                FROM customers;
+                INSERT INTO etl_change_watermarks (model_name, last_change_id, recorded_at)
+                VALUES (:model_name, :last_change, NOW())
+                ON CONFLICT (model_name) DO UPDATE SET
+                    last_change_id = EXCLUDED.last_change_id,
+                    recorded_at = EXCLUDED.recorded_at
                 """
-            )
+            ),
+            {"model_name": model.name, "last_change": last_change},
         )
 
-        _log_build("stg_customers")
-
 
-def build_stg_geolocation(engine: Engine) -> None:
+def staging_change_cutoff(conn: Connection) -> int | None:
     """
-    Builds the stg_geolocation table from raw geolocation.
+    Highest change_id covered by every model in ORDER_CHANGE_MODELS, None until all of
+    them were built with a watermark.
+    """
+    row = conn.execute(
+        text(
+            """
+            SELECT COUNT(*) AS n_models, MIN(last_change_id) AS cutoff
+            FROM etl_change_watermarks
+            WHERE model_name = ANY(:models)
+            """
+        ),
+        {"models": list(ORDER_CHANGE_MODELS)},
+    ).one()
+    return row.cutoff if row.n_models == len(ORDER_CHANGE_MODELS) else None
 
-    - Aggregate by (geolocation_zip_code_prefix, geolocation_city, geolocation_state)
-    - Adds a normalized city column (lowercase, no accents, cleaned chars)
-    - Idempotent: DROP + CREATE when run
+#--------------------------
+# Create staging tables
+#--------------------------
+
+STG_CUSTOMERS = Model(
+    name="stg_customers",
+    materialization="unlogged",
+    unique_key=("customer_id",),
+    indexes=(("customer_zip_code_prefix",),),
+    sql="""
+        SELECT
+            k.customer_sk,
+            c.customer_id,
+            c.customer_unique_id,
+            c.customer_zip_code_prefix,
+            -- normalize_city(customer_city), looked up once per distinct city
+            cn.city_norm AS customer_city_norm,
+            c.customer_state
+        FROM customers AS c
+        LEFT JOIN key_customers AS k
+          ON k.customer_id = c.customer_id
+        LEFT JOIN city_norm_dict AS cn
+          ON cn.city_raw = c.customer_city
+    """,
+)
+
+
+@instrumented("staging")
+def build_stg_customers(engine: Engine) -> None:
     """
-    with engine.begin() as conn:
-        # 1. Drop staging table if already exists 
-        conn.execute(text("DROP TABLE IF EXISTS stg_geolocation"))
+    Builds the stg_customers table from raw customers.
 
-        # 2. Create staging table from raw geolocation
-        conn.execute(text(
-            """
-            CREATE TABLE stg_geolocation AS
+    - Keeps the same grain: one row per customer_id
+    - Carries the surrogate keys (*_sk) of its ids, see src/etl/keys.py
+    - Adds a normalized city column, looked up in city_norm_dict (see normalize_city)
+    - Unlogged table, rebuilt in a shadow table and swapped in when run
+    """
+    materialize(engine, STG_CUSTOMERS)
+
+    _log_build("stg_customers")
+
+
+STG_GEOLOCATION = Model(
+    name="stg_geolocation",
+    materialization="unlogged",
+    indexes=(("zip_prefix",),),
+    sql="""
+        SELECT
+            zip_prefix,
+            geolocation_state,
+            geolocation_city_norm,
+            SUM(lat_sum) / SUM(n_points) AS lat_mean,
+            SUM(lng_sum) / SUM(n_points) AS lng_mean,
+            SUM(n_points)::BIGINT AS n_points
+        FROM (
+            -- raw rows (raw load mode)
             SELECT
                 geolocation_zip_code_prefix AS zip_prefix,
                 geolocation_state,
-                trim(
-                    regexp_replace(
-                        regexp_replace(
-                            unaccent(LOWER(geolocation_city)),
-                            '[^a-z0-9]+',
-                            ' ',
-                            'g'
-                        ),
-                        '\\s+',
-                        ' ',
-                        'g'
-                    )
-                ) AS geolocation_city_norm,
-                AVG(geolocation_lat) AS lat_mean,
-                AVG(geolocation_lng) AS lng_mean,
+                cn.city_norm AS geolocation_city_norm,
+                SUM(geolocation_lat) AS lat_sum,
+                SUM(geolocation_lng) AS lng_sum,
                 COUNT(*) AS n_points
             FROM geolocation
-            GROUP BY
-                zip_prefix,
-                geolocation_state,
-                geolocation_city_norm;
-            """
-        ))
+            LEFT JOIN city_norm_dict AS cn
+              ON cn.city_raw = geolocation_city
+            GROUP BY 1, 2, 3
 
-        _log_build("stg_geolocation")
+            UNION ALL
 
+            -- rows aggregated at load time (aggregate load mode)
+            SELECT
+                zip_prefix,
+                geolocation_state,
+                geolocation_city_norm,
+                lat_sum,
+                lng_sum,
+                n_points
+            FROM geolocation_agg
+        ) AS g
+        GROUP BY
+            zip_prefix,
+            geolocation_state,
+            geolocation_city_norm
+    """,
+)
+
+
+@instrumented("staging")
+def build_stg_geolocation(engine: Engine) -> None:
+    """
+    Builds the stg_geolocation table from raw geolocation.
 
+    - Aggregate by (geolocation_zip_code_prefix, geolocation_city, geolocation_state)
+    - Reads raw geolocation rows and/or the load-time aggregates in geolocation_agg
+      (only one of them is filled, depending on the load mode); means are weighted by n_points
+    - Adds a normalized city column, looked up in city_norm_dict (see normalize_city)
+    - Unlogged table, rebuilt in a shadow table and swapped in when run
+    """
+    materialize(engine, STG_GEOLOCATION)
+
+    _log_build("stg_geolocation")
+
+
+STG_SELLERS = Model(
+    name="stg_sellers",
+    materialization="unlogged",
+    unique_key=("seller_id",),
+    indexes=(("seller_zip_code_prefix",),),
+    sql="""
+        SELECT
+            k.seller_sk,
+            s.seller_id,
+            s.seller_zip_code_prefix,
+            cn.city_norm AS seller_city_norm,
+            s.seller_state
+        FROM sellers AS s
+        LEFT JOIN key_sellers AS k
+          ON k.seller_id = s.seller_id
+        LEFT JOIN city_norm_dict AS cn
+          ON cn.city_raw = s.seller_city
+    """,
+)
+
+
+@instrumented("staging")
 def build_stg_sellers(engine: Engine) -> None:
     """
     Builds the stg_sellers table from raw sellers.
 
     - Keeps the same grain: one row per seller_id
-    - Adds a normalized city column (lowercase, no accents, cleaned chars)
-    - Idempotent: DROP + CREATE when run 
+    - Carries the surrogate keys (*_sk) of its ids, see src/etl/keys.py
+    - Adds a normalized city column, looked up in city_norm_dict (see normalize_city)
+    - Unlogged table, rebuilt in a shadow table and swapped in when run
     """
-    with engine.begin() as conn:
-        # 1. Drop staging table if already exists
-        conn.execute(text("DROP TABLE IF EXISTS stg_sellers"))
-
-        # 2. Create staging table from raw sellers
-        conn.execute(text(
-            """
-            CREATE TABLE stg_sellers AS
-            SELECT 
-                seller_id,
-                seller_zip_code_prefix,
-                trim(
-                    regexp_replace(
-                        regexp_replace(
-                            unaccent(LOWER(seller_city)),
-                            '[^a-z0-9]+',
-                            ' ',
-                            'g'
-                        ),
-                        '\\s+',
-                        ' ',
-                        'g'
-                    )
-                ) AS seller_city_norm,
-                seller_state
-            FROM sellers;
-            """
-        ))
-
-        _log_build("stg_sellers")
-
-
+    materialize(engine, STG_SELLERS)
+
+    _log_build("stg_sellers")
+
+
+STG_ORDERS = Model(
+    name="stg_orders",
+    materialization="unlogged",
+    unique_key=("order_id",),
+    indexes=(("order_sk",), ("customer_sk",), ("order_date",),),
+    sql="""
+        SELECT
+            ko.order_sk,
+            kc.customer_sk,
+            o.order_id,
+            o.customer_id,
+            o.order_status,
+            o.order_purchase_timestamp,
+            o.order_approved_at,
+            o.order_delivered_carrier_date,
+            o.order_delivered_customer_date,
+            o.order_estimated_delivery_date,
+            o.order_purchase_timestamp::date AS order_date,
+            CASE
+                WHEN o.order_status = 'delivered'
+                THEN TRUE
+                ELSE FALSE
+            END AS is_delivered,
+            CASE
+                WHEN o.order_status IN ('canceled', 'unavailable')
+                THEN TRUE
+                ELSE FALSE
+            END AS is_canceled
+        FROM orders AS o
+        LEFT JOIN key_orders AS ko
+          ON ko.order_id = o.order_id
+        LEFT JOIN key_customers AS kc
+          ON kc.customer_id = o.customer_id
+    """,
+)
+
+
+@instrumented("staging")
 def build_stg_orders(engine: Engine) -> None:
     """
     Builds the stg_orders table from raw orders.
 
     - Keeps the same grain: one row per order_id
+    - Carries the surrogate keys (*_sk) of its ids, see src/etl/keys.py
     - Creates flags 'delivered', 'canceled'
     - Adds order_date (DATE) for daily aggregations
-    - Idempotent: DROP + CREATE when run 
+    - Unlogged table, rebuilt in a shadow table and swapped in when run
     """
-    with engine.begin() as conn:
-        # 1. Drop staging table if already exists
-        conn.execute(text("DROP TABLE IF EXISTS stg_orders"))
-
-        # 2. Create staging table from raw orders
-        conn.execute(text(
-            """
-            CREATE TABLE stg_orders AS
-            SELECT 
-                order_id,
-                customer_id,
-                order_status,
-                order_purchase_timestamp,
-                order_approved_at,
-                order_delivered_carrier_date,
-                order_delivered_customer_date,
-                order_estimated_delivery_date,
-                order_purchase_timestamp::date AS order_date,
-                CASE 
-                    WHEN order_status = 'delivered'
-                    THEN TRUE
-                    ELSE FALSE
-                END AS is_delivered,
-                CASE
-                    WHEN order_status IN ('canceled', 'unavailable')
-                    THEN TRUE
-                    ELSE FALSE
-                END AS is_canceled
-            FROM orders;
-            """
-        ))
-
-        _log_build("stg_orders")
-
-
+    _materialize_with_watermark(engine, STG_ORDERS)
+
+    _log_build("stg_orders")
+
+
+STG_ITEMS = Model(
+    name="stg_items",
+    materialization="unlogged",
+    unique_key=("order_id", "order_item_id"),
+    indexes=(("order_sk",), ("product_sk",), ("seller_sk",),),
+    sql="""
+        SELECT
+            ko.order_sk,
+            kp.product_sk,
+            ks.seller_sk,
+            i.order_id,
+            i.order_item_id,
+            i.product_id,
+            i.seller_id,
+            i.shipping_limit_date,
+            i.price,
+            i.freight_value,
+            (i.price + i.freight_value) AS item_total
+        FROM items AS i
+        LEFT JOIN key_orders AS ko
+          ON ko.order_id = i.order_id
+        LEFT JOIN key_products AS kp
+          ON kp.product_id = i.product_id
+        LEFT JOIN key_sellers AS ks
+          ON ks.seller_id = i.seller_id
+    """,
+)
+
+
+@instrumented("staging")
 def build_stg_items(engine: Engine) -> None:
     """
     Builds the stg_items table from raw items.
 
     - Grain: one row per (order_id, order_item_id)
+    - Carries the surrogate keys (*_sk) of its ids, see src/etl/keys.py
     - Adds item_total = price + freight_value
+    - Unlogged table, rebuilt in a shadow table and swapped in when run
     """
-    with engine.begin() as conn:
-        # 1. Drop staging table if already exists
-        conn.execute(text("DROP TABLE IF EXISTS stg_items"))
-
-        # 2. Create staging table from raw items
-        conn.execute(text(
-            """
-            CREATE TABLE stg_items AS
-            SELECT
-                order_id,
-                order_item_id,
-                product_id,
-                seller_id,
-                shipping_limit_date,
-                price,
-                freight_value,
-                (price + freight_value) AS item_total
-            FROM items;
-            """
-        ))
-
-        _log_build("stg_items")
-
-
+    _materialize_with_watermark(engine, STG_ITEMS)
+
+    _log_build("stg_items")
+
+
+STG_PRODUCTS = Model(
+    name="stg_products",
+    materialization="view",
+    sql="""
+        SELECT
+            k.product_sk,
+            p.product_id,
+            p.product_category_name,
+            product_name_lenght,
+            product_description_lenght,
+            product_photos_qty,
+            product_weight_g,
+            product_length_cm,
+            product_height_cm,
+            product_width_cm
+        FROM products AS p
+        LEFT JOIN key_products AS k
+          ON k.product_id = p.product_id
+    """,
+)
+
+
+@instrumented("staging")
 def build_stg_products(engine: Engine) -> None:
     """
     Builds stg_products from raw products.
 
     - Grain: one row per product_id
+    - Carries the surrogate keys (*_sk) of its ids, see src/etl/keys.py
     - Mostly a cleaned 1:1 mirror; category FK was already cleaned in raw load
+    - Materialized as a view: the mirror costs no storage or WAL
     """
-    with engine.begin() as conn:
-        # 1. Drop staging table if already exists
-        conn.execute(text("DROP TABLE IF EXISTS stg_products"))
-
-        # 2. Create staging table from raw products
-        conn.execute(text(
-            """
-            CREATE TABLE stg_products AS
-            SELECT
-                product_id,
-                product_category_name,
-                product_name_lenght,
-                product_description_lenght,
-                product_photos_qty,
-                product_weight_g,
-                product_length_cm,
-                product_height_cm,
-                product_width_cm
-            FROM products;
-            """
-        ))
-
-        _log_build("stg_products")
-
-
+    materialize(engine, STG_PRODUCTS)
+
+    _log_build("stg_products")
+
+
+STG_PAYMENTS = Model(
+    name="stg_payments",
+    materialization="unlogged",
+    unique_key=("order_id", "payment_sequential"),
+    indexes=(("order_sk",),),
+    sql="""
+        SELECT
+            k.order_sk,
+            p.order_id,
+            p.payment_sequential,
+            p.payment_type,
+            p.payment_installments,
+            p.payment_value,
+            CASE
+                WHEN p.payment_sequential = 1
+                THEN TRUE
+                ELSE FALSE
+            END AS is_first_payment
+        FROM payments AS p
+        LEFT JOIN key_orders AS k
+          ON k.order_id = p.order_id
+    """,
+)
+
+
+@instrumented("staging")
 def build_stg_payments(engine: Engine) -> None:
     """
     Builds stg_payments from raw payments.
 
     - Grain: one row per (order_id, payment_sequential)
+    - Carries the surrogate keys (*_sk) of its ids, see src/etl/keys.py
     - Adds is_first_payment flag
+    - Unlogged table, rebuilt in a shadow table and swapped in when run
     """
-    with engine.begin() as conn:
-        # 1. Drop staging table if already exists
-        conn.execute(text("DROP TABLE IF EXISTS stg_payments"))
-
-        # 2. Create staging table from raw payments
-        conn.execute(text(
-            """
-            CREATE TABLE stg_payments AS
-            SELECT
-                order_id,
-                payment_sequential,
-                payment_type,
-                payment_installments,
-                payment_value,
-                CASE
-                    WHEN payment_sequential = 1
-                    THEN TRUE
-                    ELSE FALSE
-                END AS is_first_payment
-            FROM payments;
-            """
-        ))
-
-        _log_build("stg_payments")
-
-
+    _materialize_with_watermark(engine, STG_PAYMENTS)
+
+    _log_build("stg_payments")
+
+
+STG_REVIEWS = Model(
+    name="stg_reviews",
+    materialization="unlogged",
+    unique_key=("order_id", "review_id"),
+    indexes=(("order_sk",),),
+    sql="""
+        SELECT
+            kr.review_sk,
+            ko.order_sk,
+            r.review_id,
+            r.order_id,
+            r.review_score,
+            r.review_comment_title,
+            r.review_comment_message,
+            r.review_creation_date,
+            r.review_answer_timestamp,
+            (r.review_comment_message IS NOT NULL) AS has_comment
+        FROM reviews AS r
+        LEFT JOIN key_reviews AS kr
+          ON kr.review_id = r.review_id
+        LEFT JOIN key_orders AS ko
+          ON ko.order_id = r.order_id
+    """,
+)
+
+
+@instrumented("staging")
 def build_stg_reviews(engine: Engine) -> None:
     """
     Builds stg_reviews from raw reviews.
 
     - Grain: one row per (order_id, review_id)
+    - Carries the surrogate keys (*_sk) of its ids, see src/etl/keys.py
     - Adds has_comment flag for convenience
+    - Unlogged table, rebuilt in a shadow table and swapped in when run
     """
-    with engine.begin() as conn:
-        # 1. Drop staging table if already exists
-        conn.execute(text("DROP TABLE IF EXISTS stg_reviews"))
+    _materialize_with_watermark(engine, STG_REVIEWS)
 
-        # 2. Create staging table from raw reviews
-        conn.execute(text(
-            """
-            CREATE TABLE stg_reviews AS
-            SELECT
-                review_id,
-                order_id,
-                review_score,
-                review_comment_title,
-                review_comment_message,
-                review_creation_date,
-                review_answer_timestamp,
-                (review_comment_message IS NOT NULL) AS has_comment
-            FROM reviews;
-            """
-        ))
+    _log_build("stg_reviews")
 
-        _log_build("stg_reviews")
 
+STG_CATEGORIES = Model(
+    name="stg_categories",
+    materialization="view",
+    sql="""
+        SELECT
+            product_category_name,
+            product_category_name_english
+        FROM categories
+    """,
+)
 
+
+@instrumented("staging")
 def build_stg_categories(engine: Engine) -> None:
     """
     Simple mirror of categories as a small reference dimension.
+    Materialized as a view.
     """
-    with engine.begin() as conn:
-        # 1. Drop staging table if already exists
-        conn.execute(text("DROP TABLE IF EXISTS stg_categories"))
-
-        # 2. Create staging table from raw categories
-        conn.execute(text(
-            """
-            CREATE TABLE stg_categories AS
-            SELECT
-                product_category_name,
-                product_category_name_english
-            FROM categories;
-            """
-        ))
+    materialize(engine, STG_CATEGORIES)
 
-        _log_build("stg_categories")
+    _log_build("stg_categories")
 
 #--------------------------
-# Main  
+# Main
 #--------------------------
 
+# Staging builders; they only read raw tables (and city_norm_dict), so all of them can run at once.
+# Each model declares its materialization (view / unlogged / table / matview), PK and
+# indexes; see src/etl/materialize.py and MATERIALIZATION_OVERRIDES there.
+STAGING_BUILDERS = {
+    "stg_customers": build_stg_customers,
+    "stg_geolocation": build_stg_geolocation,
+    "stg_sellers": build_stg_sellers,
+    "stg_orders": build_stg_orders,
+    "stg_items": build_stg_items,
+    "stg_products": build_stg_products,
+    "stg_payments": build_stg_payments,
+    "stg_reviews": build_stg_reviews,
+    "stg_categories": build_stg_categories,
+}
+
+# Builders joining city_norm_dict; they wait for its refresh
+CITY_MODELS = ("stg_customers", "stg_geolocation", "stg_sellers")
+
+# Builders carrying surrogate keys (key_* tables); they wait for the key map refresh
+KEYED_MODELS = ("stg_customers", "stg_sellers", "stg_orders", "stg_items", "stg_products", "stg_payments", "stg_reviews")
+
+
+@instrumented("pipeline")
+def build_all_staging(engine: Engine, max_workers: int = len(STAGING_BUILDERS)) -> None:
+    """
+    Build every staging table concurrently, each on its own pooled connection.
+
+    Wall time is bounded by the slowest build (stg_geolocation) when max_workers
+    covers all builders; max_workers=1 builds them one after another.
+    city_norm_dict and the surrogate key maps are refreshed first; only the models in
+    CITY_MODELS / KEYED_MODELS wait for them.
+    """
+    tasks = {name: partial(builder, engine) for name, builder in STAGING_BUILDERS.items()}
+    tasks["city_norm_dict"] = partial(refresh_city_dictionary, engine)
+    tasks["key_maps"] = partial(refresh_key_maps, engine)
+    dependencies = {
+        name: ({"city_norm_dict"} if name in CITY_MODELS else set()) | ({"key_maps"} if name in KEYED_MODELS else set())
+        for name in tasks
+    }
+    run_dag(tasks, dependencies, max_workers=max_workers, label="STAGING")
+
+
 def main():
     engine = get_engine()
-    build_stg_customers(engine)
-    build_stg_geolocation(engine)
-    build_stg_sellers(engine)
-    build_stg_orders(engine)
-    build_stg_items(engine)
-    build_stg_products(engine)
-    build_stg_payments(engine)
-    build_stg_reviews(engine)
-    build_stg_categories(engine)
+    build_all_staging(engine)
 
 if __name__ == "__main__":
     main()
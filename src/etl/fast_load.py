@@ -0,0 +1,235 @@
+from __future__ import annotations
+import time
+from functools import partial
+from pathlib import Path
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from src.db.engine import get_bulk_engine
+from src.etl.raw_to_db import DEFAULT_MAX_WORKERS, RAW_DATA_DIRECTORY, RAW_LOADERS, load_all_raw
+from src.etl.scheduler import run_dag
+
+
+#--------------------------
+# Settings
+#--------------------------
+
+# Connections rebuilding indexes / validating FKs at the same time
+DEFAULT_INDEX_WORKERS = 4
+
+# Per-session memory for index builds and FK validation (SET LOCAL maintenance_work_mem)
+INDEX_MAINTENANCE_WORK_MEM = "256MB"
+
+
+#--------------------------
+# Helpers
+#--------------------------
+
+def _log_phase(message: str) -> None:
+    print(f"[FAST LOAD] {message}")
+
+
+def _capture_deferred_ddl(conn: Connection, tables: list[str]) -> int:
+    """
+    Store the DDL of the secondary indexes and FKs of the given tables in etl_deferred_ddl.
+
+    PK / unique constraint indexes are kept (upserts and FK targets need them). Entries left
+    by an interrupted fast load are kept as they are: their objects no longer exist.
+    """
+    params = {"tables": tables}
+    n_indexes = conn.execute(
+        text(
+            """
+            INSERT INTO etl_deferred_ddl (object_name, table_name, object_kind, ddl)
+            SELECT i.relname, t.relname, 'index', pg_get_indexdef(x.indexrelid)
+            FROM pg_index AS x
+            JOIN pg_class AS i ON i.oid = x.indexrelid
+            JOIN pg_class AS t ON t.oid = x.indrelid
+            WHERE x.indrelid IN (SELECT to_regclass(name) FROM unnest(CAST(:tables AS TEXT[])) AS name)
+              AND NOT EXISTS (
+                  SELECT 1 FROM pg_constraint AS c
+                  WHERE c.conindid = x.indexrelid AND c.conrelid = x.indrelid AND c.contype IN ('p', 'u', 'x')
+              )
+            ON CONFLICT (object_name) DO NOTHING
+            """
+        ),
+        params,
+    ).rowcount
+    n_fks = conn.execute(
+        text(
+            """
+            INSERT INTO etl_deferred_ddl (object_name, table_name, object_kind, ddl)
+            SELECT
+                c.conname,
+                t.relname,
+                'fk',
+                format('ALTER TABLE %I ADD CONSTRAINT %I %s', t.relname, c.conname, pg_get_constraintdef(c.oid))
+            FROM pg_constraint AS c
+            JOIN pg_class AS t ON t.oid = c.conrelid
+            WHERE c.contype = 'f'
+              AND c.conrelid IN (SELECT to_regclass(name) FROM unnest(CAST(:tables AS TEXT[])) AS name)
+            ON CONFLICT (object_name) DO NOTHING
+            """
+        ),
+        params,
+    ).rowcount
+    return n_indexes + n_fks
+
+
+def _drop_deferred(conn: Connection) -> None:
+    """
+    Drop every captured FK, then every captured index.
+    """
+    rows = conn.execute(text(
+        "SELECT object_name, table_name, object_kind FROM etl_deferred_ddl ORDER BY object_kind, object_name"
+    )).all()
+    for row in rows:
+        if row.object_kind == "fk":
+            conn.execute(text(f'ALTER TABLE {row.table_name} DROP CONSTRAINT IF EXISTS "{row.object_name}"'))
+        else:
+            conn.execute(text(f'DROP INDEX IF EXISTS "{row.object_name}"'))
+
+
+def _create_index(engine: Engine, name: str, ddl: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(f"SET LOCAL maintenance_work_mem = '{INDEX_MAINTENANCE_WORK_MEM}'"))
+        if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar_one() is None:
+            conn.execute(text(ddl))
+        conn.execute(text("DELETE FROM etl_deferred_ddl WHERE object_name = :name"), {"name": name})
+
+
+def _add_fk_not_valid(engine: Engine, name: str, table_name: str, ddl: str) -> None:
+    """
+    Re-add a FK without checking existing rows (only a brief catalog change).
+    FKs that were NOT VALID originally stay so.
+    """
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM pg_constraint WHERE conname = :name AND conrelid = to_regclass(:table)"),
+            {"name": name, "table": table_name},
+        ).scalar_one_or_none()
+        if exists is None:
+            conn.execute(text(ddl if ddl.endswith(" NOT VALID") else f"{ddl} NOT VALID"))
+
+
+def _validate_fks(engine: Engine, table_name: str, fks: list[tuple[str, str]]) -> None:
+    """
+    VALIDATE the FKs of one table one after another (validations of the same table would
+    wait for each other's lock anyway); each entry is cleared once validated.
+    """
+    for name, ddl in fks:
+        with engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL maintenance_work_mem = '{INDEX_MAINTENANCE_WORK_MEM}'"))
+            if not ddl.endswith(" NOT VALID"):
+                conn.execute(text(f'ALTER TABLE {table_name} VALIDATE CONSTRAINT "{name}"'))
+            conn.execute(text("DELETE FROM etl_deferred_ddl WHERE object_name = :name"), {"name": name})
+
+
+#--------------------------
+# Public API
+#--------------------------
+
+def defer_constraints(engine: Engine, tables: list[str] | None = None) -> int:
+    """
+    Capture, then drop, the secondary indexes and FKs of the raw tables (one transaction).
+    Returns the number of objects newly captured.
+    """
+    tables = list(tables or RAW_LOADERS)
+    with engine.begin() as conn:
+        n_captured = _capture_deferred_ddl(conn, tables)
+        _drop_deferred(conn)
+    return n_captured
+
+
+def restore_deferred_ddl(engine: Engine, max_workers: int = DEFAULT_INDEX_WORKERS) -> dict[str, float]:
+    """
+    Recreate everything recorded in etl_deferred_ddl.
+
+    1. Indexes are rebuilt concurrently, one connection each
+    2. FKs are re-added NOT VALID, then validated concurrently (one task per table), so the
+       tables are only briefly locked against writes
+
+    Safe to rerun after a failure (e.g. to recover from a crashed fast load): finished objects
+    are removed from etl_deferred_ddl, existing ones are not recreated.
+    Returns {phase: elapsed seconds}.
+    """
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT object_name, table_name, object_kind, ddl FROM etl_deferred_ddl ORDER BY object_name"
+        )).all()
+    indexes = [row for row in rows if row.object_kind == "index"]
+    fks = [row for row in rows if row.object_kind == "fk"]
+    phases: dict[str, float] = {}
+
+    start = time.perf_counter()
+    if indexes:
+        tasks = {row.object_name: partial(_create_index, engine, row.object_name, row.ddl) for row in indexes}
+        run_dag(tasks, {}, max_workers=max_workers, label="INDEX")
+    phases["indexes"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fks_by_table: dict[str, list[tuple[str, str]]] = {}
+    for row in fks:
+        _add_fk_not_valid(engine, row.object_name, row.table_name, row.ddl)
+        fks_by_table.setdefault(row.table_name, []).append((row.object_name, row.ddl))
+    if fks_by_table:
+        tasks = {table: partial(_validate_fks, engine, table, table_fks) for table, table_fks in fks_by_table.items()}
+        run_dag(tasks, {}, max_workers=max_workers, label="VALIDATE")
+    phases["foreign_keys"] = time.perf_counter() - start
+
+    _log_phase(f"restored {len(indexes)} index(es) in {phases['indexes']:.2f}s, "
+               f"{len(fks)} FK(s) in {phases['foreign_keys']:.2f}s")
+    return phases
+
+
+def fast_load_all_raw(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY,
+                      max_workers: int = DEFAULT_MAX_WORKERS, index_workers: int = DEFAULT_INDEX_WORKERS,
+                      **load_options) -> dict[str, float]:
+    """
+    Initial bulk load without per-row index maintenance and FK checks.
+
+    1. drop: secondary indexes and FKs of the raw tables are recorded in etl_deferred_ddl and dropped
+    2. load: load_all_raw (load_options are passed through, e.g. backend, chunksize)
+    3. indexes / foreign_keys: see restore_deferred_ddl
+
+    The schema is also restored when the load fails, so it still gets its indexes and FKs
+    back; the load error is re-raised even if that restore fails too (it is logged). If the
+    restore is interrupted, rerun restore_deferred_ddl.
+    PKs are kept. Returns {phase: elapsed seconds}.
+    """
+    phases: dict[str, float] = {}
+
+    start = time.perf_counter()
+    n_deferred = defer_constraints(engine)
+    phases["drop"] = time.perf_counter() - start
+    _log_phase(f"dropped {n_deferred} index(es)/FK(s) in {phases['drop']:.2f}s")
+
+    try:
+        start = time.perf_counter()
+        load_all_raw(engine, data_dir, max_workers=max_workers, **load_options)
+        phases["load"] = time.perf_counter() - start
+        _log_phase(f"loaded raw tables in {phases['load']:.2f}s")
+    except BaseException:
+        # Restore anyway, but a restore failing on the partly loaded data (e.g. FK validation)
+        # must not hide the load error
+        try:
+            restore_deferred_ddl(engine, max_workers=index_workers)
+        except Exception as restore_error:
+            _log_phase(f"[ERROR] restoring indexes/FKs after the failed load failed too "
+                       f"({type(restore_error).__name__}: {restore_error}); rerun restore_deferred_ddl")
+        raise
+    phases.update(restore_deferred_ddl(engine, max_workers=index_workers))
+
+    _log_phase(", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in phases.items()))
+    return phases
+
+
+#--------------------------
+# Main
+#--------------------------
+
+def main():
+    engine = get_bulk_engine()
+    fast_load_all_raw(engine)
+
+if __name__ == "__main__":
+    main()
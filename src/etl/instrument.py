@@ -0,0 +1,236 @@
+from __future__ import annotations
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+import psutil
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server, write_to_textfile
+from pythonjsonlogger.json import JsonFormatter
+
+
+#--------------------------
+# Settings
+#--------------------------
+
+# Export targets, both optional:
+# - ETL_METRICS_TEXTFILE: rewritten after every stage (node_exporter textfile collector)
+# - ETL_METRICS_PORT: local /metrics endpoint, started by the first stage of the process
+METRICS_TEXTFILE_ENV = "ETL_METRICS_TEXTFILE"
+METRICS_PORT_ENV = "ETL_METRICS_PORT"
+
+# Structured stage logs go to this file when set, to stderr otherwise
+LOG_FILE_ENV = "ETL_LOG_FILE"
+LOGGER_NAME = "src.etl.stages"
+
+# Stage durations range from a view swap (ms) to a 100x geolocation load (minutes)
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+#--------------------------
+# Metrics
+#--------------------------
+
+# Own registry: only ETL metrics are exported, not the process/platform defaults
+REGISTRY = CollectorRegistry()
+
+STAGE_RUNS = Counter(
+    "etl_stage_runs", "Stage runs by outcome", ("group", "stage", "status"), registry=REGISTRY,
+)
+STAGE_DURATION = Histogram(
+    "etl_stage_duration_seconds", "Stage wall time", ("group", "stage"), buckets=DURATION_BUCKETS, registry=REGISTRY,
+)
+STAGE_ROWS = Counter(
+    "etl_stage_rows", "Rows written by a stage", ("group", "stage"), registry=REGISTRY,
+)
+STAGE_BYTES_READ = Counter(
+    "etl_stage_read_bytes", "Input bytes read by a stage", ("group", "stage"), registry=REGISTRY,
+)
+STAGE_MEMORY_DELTA = Gauge(
+    "etl_stage_memory_delta_bytes", "Process RSS change over the last run of a stage", ("group", "stage"),
+    registry=REGISTRY,
+)
+STAGE_LAST_SUCCESS = Gauge(
+    "etl_stage_last_success_timestamp_seconds", "End of the last successful run of a stage", ("group", "stage"),
+    registry=REGISTRY,
+)
+
+
+#--------------------------
+# Stage records
+#--------------------------
+
+@dataclass
+class StageRecord:
+    """
+    What one stage run reports; rows and bytes_read are filled in while the stage runs
+    (record_rows / record_bytes_read), the rest when it ends.
+    """
+    group: str
+    stage: str
+    rows: int = 0
+    bytes_read: int = 0
+    duration_s: float = 0.0
+    rss_delta_bytes: int = 0
+    status: str = "running"
+
+
+# Innermost running stage of the current thread (each run_dag worker has its own)
+_current: ContextVar[StageRecord | None] = ContextVar("etl_stage", default=None)
+
+_logger_lock = threading.Lock()
+_exporter_lock = threading.Lock()
+_http_port: int | None = None
+
+# Set on the JSON handler installed by _stage_logger, to tell it from handlers added by others
+_HANDLER_MARK = "_etl_stage_json"
+
+
+def _stage_logger() -> logging.Logger:
+    """
+    The stage logger, with its JSON handler installed once even when other handlers (e.g. a
+    test capturing records) were added first.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    with _logger_lock:
+        if not any(getattr(handler, _HANDLER_MARK, False) for handler in logger.handlers):
+            log_file = os.getenv(LOG_FILE_ENV)
+            handler = logging.FileHandler(log_file, encoding="utf-8") if log_file else logging.StreamHandler(sys.stderr)
+            handler.setFormatter(JsonFormatter("%(asctime)s %(levelname)s %(message)s", rename_fields={"asctime": "ts"}))
+            setattr(handler, _HANDLER_MARK, True)
+            logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def _start_http_exporter() -> None:
+    port = os.getenv(METRICS_PORT_ENV)
+    if port and _http_port is None:
+        serve_metrics(int(port))
+
+
+def _rss() -> int:
+    return psutil.Process().memory_info().rss
+
+
+def _publish(record: StageRecord, error: BaseException | None) -> None:
+    labels = {"group": record.group, "stage": record.stage}
+    STAGE_RUNS.labels(status=record.status, **labels).inc()
+    STAGE_DURATION.labels(**labels).observe(record.duration_s)
+    STAGE_ROWS.labels(**labels).inc(record.rows)
+    STAGE_BYTES_READ.labels(**labels).inc(record.bytes_read)
+    STAGE_MEMORY_DELTA.labels(**labels).set(record.rss_delta_bytes)
+    if error is None:
+        STAGE_LAST_SUCCESS.labels(**labels).set_to_current_time()
+
+    fields = {
+        "event": "etl_stage",
+        "group": record.group,
+        "stage": record.stage,
+        "status": record.status,
+        "duration_s": round(record.duration_s, 4),
+        "rows": record.rows,
+        "bytes_read": record.bytes_read,
+        "rss_delta_bytes": record.rss_delta_bytes,
+    }
+    if error is not None:
+        fields["error"] = f"{type(error).__name__}: {error}"
+    _stage_logger().log(logging.ERROR if error else logging.INFO, f"{record.group}/{record.stage} {record.status}",
+                        extra=fields)
+
+    textfile = os.getenv(METRICS_TEXTFILE_ENV)
+    if textfile:
+        write_metrics(Path(textfile))
+
+
+#--------------------------
+# Public API
+#--------------------------
+
+@contextmanager
+def stage(group: str, name: str) -> Iterator[StageRecord]:
+    """
+    Measure one pipeline stage (a raw load, a staging or mart build).
+
+    - Duration and RSS change are measured around the block; rows and input bytes are
+      added by the code inside it through record_rows / record_bytes_read
+    - On exit one JSON log line is written and the Prometheus metrics are updated, also
+      when the block raises (status "error"; the exception propagates)
+    - Stages nest: reported rows go to the innermost one
+    RSS is process-wide, so stages running concurrently see each other's allocations.
+    """
+    _start_http_exporter()
+    record = StageRecord(group, name)
+    token = _current.set(record)
+    rss_before = _rss()
+    start = time.perf_counter()
+    error: BaseException | None = None
+    try:
+        yield record
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        record.duration_s = time.perf_counter() - start
+        record.rss_delta_bytes = _rss() - rss_before
+        record.status = "ok" if error is None else "error"
+        _current.reset(token)
+        _publish(record, error)
+
+
+def instrumented(group: str, name: str | None = None) -> Callable:
+    """
+    Decorator running the function inside stage(group, name or the function's name).
+    """
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(group, name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_rows(n_rows: int) -> None:
+    """
+    Add rows written to the running stage (no-op outside a stage).
+    """
+    record = _current.get()
+    if record is not None and n_rows > 0:
+        record.rows += n_rows
+
+
+def record_bytes_read(n_bytes: int) -> None:
+    """
+    Add input bytes read to the running stage (no-op outside a stage).
+    """
+    record = _current.get()
+    if record is not None and n_bytes > 0:
+        record.bytes_read += n_bytes
+
+
+def write_metrics(path: Path) -> None:
+    """
+    Write every ETL metric in the Prometheus text format (atomic rename, safe to scrape).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_to_textfile(str(path), REGISTRY)
+
+
+def serve_metrics(port: int) -> None:
+    """
+    Expose the ETL metrics on http://127.0.0.1:<port>/metrics from a daemon thread
+    (once per process).
+    """
+    global _http_port
+    with _exporter_lock:
+        if _http_port is None:
+            start_http_server(port, addr="127.0.0.1", registry=REGISTRY)
+            _http_port = port
@@ -0,0 +1,124 @@
+from __future__ import annotations
+import threading
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+
+#--------------------------
+# Key maps
+#--------------------------
+
+@dataclass(frozen=True)
+class KeyMap:
+    """
+    Lookup table assigning an INTEGER surrogate key to every distinct hex id.
+
+    - table: key table (schema.sql, "Surrogate Keys")
+    - sk_column / id_column: surrogate and natural key columns
+    - source: raw table the ids are collected from
+    """
+    table: str
+    sk_column: str
+    id_column: str
+    source: str
+
+
+KEY_MAPS = {
+    "order_sk": KeyMap("key_orders", "order_sk", "order_id", "orders"),
+    "customer_sk": KeyMap("key_customers", "customer_sk", "customer_id", "customers"),
+    "product_sk": KeyMap("key_products", "product_sk", "product_id", "products"),
+    "seller_sk": KeyMap("key_sellers", "seller_sk", "seller_id", "sellers"),
+    "review_sk": KeyMap("key_reviews", "review_sk", "review_id", "reviews"),
+}
+
+
+def refresh_key_maps(engine: Engine) -> dict[str, int]:
+    """
+    Assign surrogate keys to the ids that appeared in the raw tables since the last refresh.
+
+    Existing keys never change, so staging and marts can be rebuilt or refreshed
+    incrementally against them. Returns {key table: new keys}.
+    """
+    added: dict[str, int] = {}
+    with engine.begin() as conn:
+        for key_map in KEY_MAPS.values():
+            added[key_map.table] = conn.execute(text(
+                f"""
+                INSERT INTO {key_map.table} ({key_map.id_column})
+                SELECT DISTINCT s.{key_map.id_column}
+                FROM {key_map.source} AS s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {key_map.table} AS k WHERE k.{key_map.id_column} = s.{key_map.id_column}
+                )
+                ORDER BY s.{key_map.id_column}
+                ON CONFLICT ({key_map.id_column}) DO NOTHING
+                """
+            )).rowcount
+
+    print(f"[STAGING] key maps: {', '.join(f'{table} +{n}' for table, n in added.items())}")
+    return added
+
+
+#--------------------------
+# Decoding
+#--------------------------
+
+class KeyDecoder:
+    """
+    Turns surrogate key codes back into the original hex ids.
+
+    The decode table (one id per key, indexed by the key itself) is loaded from the key table
+    on first use only, so frames can travel with int32 codes and be decoded when needed.
+    """
+
+    def __init__(self, engine: Engine, sk_column: str) -> None:
+        self.engine = engine
+        self.key_map = KEY_MAPS[sk_column]
+        self._ids: np.ndarray | None = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> np.ndarray:
+        with self._lock:
+            if self._ids is None:
+                with self.engine.connect() as conn:
+                    rows = conn.execute(text(
+                        f"SELECT {self.key_map.sk_column}, {self.key_map.id_column} FROM {self.key_map.table}"
+                    )).all()
+                # Identity values can have gaps (rolled back inserts): those slots stay None
+                ids = np.full(max((sk for sk, _ in rows), default=0) + 1, None, dtype=object)
+                for sk, id_value in rows:
+                    ids[sk] = id_value
+                self._ids = ids
+        return self._ids
+
+    def decode(self, codes) -> np.ndarray:
+        """
+        Map an array of keys to an object array of ids.
+        """
+        return self._load()[np.asarray(codes, dtype=np.int64)]
+
+    def reset(self) -> None:
+        """
+        Forget the decode table (new keys were assigned since it was loaded).
+        """
+        with self._lock:
+            self._ids = None
+
+
+def read_with_keys(engine: Engine, sql: str, params: dict | None = None) -> tuple[pd.DataFrame, dict[str, KeyDecoder]]:
+    """
+    Run a query and return its frame with every *_sk column as int32 codes, plus a lazy
+    KeyDecoder per key column for turning codes back into ids.
+    """
+    with engine.connect() as conn:
+        df = pd.read_sql(text(sql), conn, params=params)
+
+    decoders = {}
+    for column in df.columns:
+        if column in KEY_MAPS:
+            df[column] = df[column].astype("Int32" if df[column].isna().any() else "int32")
+            decoders[column] = KeyDecoder(engine, column)
+    return df, decoders
@@ -0,0 +1,270 @@
+from __future__ import annotations
+import hashlib
+from dataclasses import dataclass
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from src.etl.instrument import record_rows
+from src.etl.plans import execute_build_statement
+
+
+#--------------------------
+# Settings
+#--------------------------
+
+# - view: plain view, nothing stored (trivial mirrors)
+# - unlogged: UNLOGGED table, no WAL (rebuildable intermediates; emptied after a crash)
+# - table: regular logged table
+# - matview: materialized view, refreshed with REFRESH ... CONCURRENTLY when its SQL is unchanged
+MATERIALIZATIONS = ("view", "unlogged", "table", "matview")
+
+# Per-model overrides, e.g. {"stg_items": "table"}
+MATERIALIZATION_OVERRIDES: dict[str, str] = {}
+
+# Longest wait for readers to release a relation before a swap gives up
+SWAP_LOCK_TIMEOUT = "10s"
+
+# pg_class.relkind -> object type used in DROP / ALTER / COMMENT statements
+_RELKIND_TYPES = {"r": "TABLE", "p": "TABLE", "v": "VIEW", "m": "MATERIALIZED VIEW"}
+
+
+#--------------------------
+# Model definition
+#--------------------------
+
+@dataclass(frozen=True)
+class Model:
+    """
+    A staging or mart relation built from one SELECT.
+
+    - unique_key: PK for tables, unique index for materialized views (required by
+      REFRESH CONCURRENTLY); ignored for views
+    - indexes: secondary indexes, one tuple of columns each; ignored for views
+    """
+    name: str
+    sql: str
+    materialization: str = "table"
+    unique_key: tuple[str, ...] = ()
+    indexes: tuple[tuple[str, ...], ...] = ()
+
+    @property
+    def sql_hash(self) -> str:
+        return hashlib.sha256(" ".join(self.sql.split()).encode("utf-8")).hexdigest()
+
+
+#--------------------------
+# Helpers
+#--------------------------
+
+def _relkind(conn: Connection, name: str) -> str | None:
+    return conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"),
+        {"name": name},
+    ).scalar_one_or_none()
+
+
+def _drop(conn: Connection, name: str) -> None:
+    """
+    Drop a relation whatever its kind (no-op if it does not exist).
+    """
+    kind = _relkind(conn, name)
+    if kind is not None:
+        conn.execute(text(f"DROP {_RELKIND_TYPES[kind]} {name}"))
+
+
+def _index_name(table_name: str, columns: tuple[str, ...]) -> str:
+    return f"{table_name}_{'_'.join(columns)}_idx"
+
+
+def _stored_sql_hash(conn: Connection, name: str) -> str | None:
+    comment = conn.execute(
+        text("SELECT obj_description(to_regclass(:name), 'pg_class')"),
+        {"name": name},
+    ).scalar_one_or_none()
+    if comment and comment.startswith("sql_sha256="):
+        return comment.removeprefix("sql_sha256=")
+    return None
+
+
+def _comment(conn: Connection, model: Model, kind: str) -> None:
+    conn.execute(text(f"COMMENT ON {_RELKIND_TYPES[kind]} {model.name} IS 'sql_sha256={model.sql_hash}'"))
+
+
+def _create_view(engine: Engine, model: Model) -> None:
+    """
+    Replace whatever relation has the model's name by a view, in one transaction.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+        _drop(conn, model.name)
+        conn.execute(text(f"CREATE VIEW {model.name} AS {model.sql}"))
+        _comment(conn, model, "v")
+
+
+def _build_and_swap(engine: Engine, model: Model, materialization: str) -> None:
+    """
+    Build the model as <name>__new, index and ANALYZE it, then swap it in.
+
+    1. The shadow relation is built on its own connection; the live relation stays readable
+    2. In one short transaction the live relation is renamed away and dropped, the shadow is
+       renamed into place and its indexes get their final names. Readers block only for that.
+
+    Views depending on the live relation would block the drop, so only raw tables should
+    sit underneath view-materialized models.
+    """
+    name = model.name
+    shadow, old = f"{name}__new", f"{name}__old"
+    kind = "m" if materialization == "matview" else "r"
+
+    # 1. Shadow build (leftovers of an interrupted run are dropped first)
+    with engine.begin() as conn:
+        _drop(conn, shadow)
+        if materialization == "matview":
+            create = f"CREATE MATERIALIZED VIEW {shadow} AS {model.sql}"
+        else:
+            unlogged = "UNLOGGED " if materialization == "unlogged" else ""
+            create = f"CREATE {unlogged}TABLE {shadow} AS {model.sql}"
+        record_rows(execute_build_statement(conn, name, "build", create))
+
+        if model.unique_key and materialization != "matview":
+            conn.execute(text(
+                f"ALTER TABLE {shadow} ADD CONSTRAINT {shadow}_pkey PRIMARY KEY ({', '.join(model.unique_key)})"
+            ))
+        elif model.unique_key:
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX {_index_name(shadow, model.unique_key)} ON {shadow} ({', '.join(model.unique_key)})"
+            ))
+        for columns in model.indexes:
+            conn.execute(text(f"CREATE INDEX {_index_name(shadow, columns)} ON {shadow} ({', '.join(columns)})"))
+
+    # ANALYZE outside the build transaction so the planner sees fresh stats right after the swap
+    with engine.begin() as conn:
+        conn.execute(text(f"ANALYZE {shadow}"))
+
+    # 2. Atomic swap
+    with engine.begin() as conn:
+        conn.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+        _drop(conn, old)
+        live_kind = _relkind(conn, name)
+        if live_kind is not None:
+            conn.execute(text(f"ALTER {_RELKIND_TYPES[live_kind]} {name} RENAME TO {old}"))
+        conn.execute(text(f"ALTER {_RELKIND_TYPES[kind]} {shadow} RENAME TO {name}"))
+        _drop(conn, old)
+
+        if model.unique_key and materialization != "matview":
+            conn.execute(text(f"ALTER INDEX {shadow}_pkey RENAME TO {name}_pkey"))
+        elif model.unique_key:
+            conn.execute(text(
+                f"ALTER INDEX {_index_name(shadow, model.unique_key)} RENAME TO {_index_name(name, model.unique_key)}"
+            ))
+        for columns in model.indexes:
+            conn.execute(text(f"ALTER INDEX {_index_name(shadow, columns)} RENAME TO {_index_name(name, columns)}"))
+        _comment(conn, model, kind)
+
+
+def _columns(conn: Connection, name: str) -> list[str]:
+    return list(conn.execute(
+        text(
+            """
+            SELECT attname FROM pg_attribute
+            WHERE attrelid = to_regclass(:name) AND attnum > 0 AND NOT attisdropped
+            ORDER BY attnum
+            """
+        ),
+        {"name": name},
+    ).scalars())
+
+
+def _refresh_matview(engine: Engine, model: Model) -> None:
+    """
+    Refresh an existing materialized view in place; CONCURRENTLY keeps it readable
+    (needs the unique index declared through unique_key).
+    """
+    concurrently = "CONCURRENTLY " if model.unique_key else ""
+    # REFRESH ... CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"REFRESH MATERIALIZED VIEW {concurrently}{model.name}"))
+        conn.execute(text(f"ANALYZE {model.name}"))
+
+
+#--------------------------
+# Public API
+#--------------------------
+
+def relation_exists(engine: Engine, name: str) -> bool:
+    with engine.connect() as conn:
+        return _relkind(conn, name) is not None
+
+
+def record_build(conn: Connection, model_name: str, mode: str) -> None:
+    """
+    Bump the model's build_version in etl_build_state ('full' or 'incremental' build).
+    """
+    conn.execute(
+        text(
+            """
+            INSERT INTO etl_build_state (model_name, build_version, build_mode, built_at)
+            VALUES (:model_name, 1, :mode, NOW())
+            ON CONFLICT (model_name) DO UPDATE SET
+                build_version = etl_build_state.build_version + 1,
+                build_mode = EXCLUDED.build_mode,
+                built_at = EXCLUDED.built_at
+            """
+        ),
+        {"model_name": model_name, "mode": mode},
+    )
+
+
+def upsert(conn: Connection, table_name: str, select_sql: str, key: tuple[str, ...]) -> int:
+    """
+    INSERT the rows of select_sql (same column order as the table) into an existing table,
+    updating rows whose key already exists. Returns the number of rows written.
+    """
+    columns = _columns(conn, table_name)
+    assignments = ", ".join(f"{col} = EXCLUDED.{col}" for col in columns if col not in key)
+    n_rows = execute_build_statement(
+        conn,
+        table_name,
+        "upsert",
+        f"INSERT INTO {table_name} ({', '.join(columns)}) {select_sql} "
+        f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {assignments}",
+    )
+    record_rows(n_rows)
+    return n_rows
+
+
+def resolve_materialization(model: Model, materialization: str | None = None) -> str:
+    """
+    Pick the materialization: explicit argument > MATERIALIZATION_OVERRIDES > model default.
+    """
+    resolved = materialization or MATERIALIZATION_OVERRIDES.get(model.name, model.materialization)
+    if resolved not in MATERIALIZATIONS:
+        raise ValueError(f"Unknown materialization {resolved!r} for {model.name}; expected one of {MATERIALIZATIONS}")
+    return resolved
+
+
+def materialize(engine: Engine, model: Model, materialization: str | None = None) -> None:
+    """
+    Build or refresh a model with its materialization.
+
+    - view: (re)created in one transaction, nothing stored
+    - unlogged / table: shadow build + PK/indexes + ANALYZE, then atomic swap
+    - matview: REFRESH CONCURRENTLY if it exists with the same SQL, otherwise built like a table
+
+    Every build bumps the model's build_version in etl_build_state.
+    """
+    materialization = resolve_materialization(model, materialization)
+
+    is_current = False
+    if materialization == "matview":
+        with engine.connect() as conn:
+            is_current = _relkind(conn, model.name) == "m" and _stored_sql_hash(conn, model.name) == model.sql_hash
+
+    if materialization == "view":
+        _create_view(engine, model)
+    elif is_current:
+        _refresh_matview(engine, model)
+    else:
+        _build_and_swap(engine, model, materialization)
+
+    with engine.begin() as conn:
+        record_build(conn, model.name, "full")
@@ -0,0 +1,314 @@
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import re
+import time
+import traceback
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from src.db.engine import get_bulk_engine, get_engine
+from src.db.schema import table_dependencies
+from src.etl.build_marts import (
+    DATE_CONSUMERS, DIM_DATE, FACT_DAILY_DEMAND, FACT_DAILY_ORDERS, FACT_ORDERS,
+    build_dim_date, build_fact_daily_demand, build_fact_daily_orders, build_fact_orders,
+)
+from src.etl.build_staging import (
+    CITY_MODELS, KEYED_MODELS, STAGING_BUILDERS,
+    STG_CATEGORIES, STG_CUSTOMERS, STG_GEOLOCATION, STG_ITEMS, STG_ORDERS, STG_PAYMENTS, STG_PRODUCTS,
+    STG_REVIEWS, STG_SELLERS,
+)
+from src.etl.keys import KEY_MAPS, refresh_key_maps
+from src.etl.materialize import relation_exists
+from src.etl.raw_to_db import DEFAULT_MAX_WORKERS, RAW_CSV_FILES, RAW_DATA_DIRECTORY, RAW_LOADERS
+from src.etl.scheduler import run_dag, topological_order
+from src.etl.text_norm import CITY_SOURCES, refresh_city_dictionary
+
+
+#--------------------------
+# Settings
+#--------------------------
+
+HASH_BLOCK_BYTES = 1 << 20
+
+STAGING_MODELS = {
+    model.name: model
+    for model in (
+        STG_CUSTOMERS, STG_GEOLOCATION, STG_SELLERS, STG_ORDERS, STG_ITEMS, STG_PRODUCTS, STG_PAYMENTS,
+        STG_REVIEWS, STG_CATEGORIES,
+    )
+}
+
+MART_BUILDERS = {
+    FACT_ORDERS: build_fact_orders,
+    FACT_DAILY_ORDERS: build_fact_daily_orders,
+    FACT_DAILY_DEMAND: build_fact_daily_demand,
+    DIM_DATE: build_dim_date,
+}
+
+
+#--------------------------
+# Stages
+#--------------------------
+
+@dataclass(frozen=True)
+class PipelineStage:
+    """
+    One checkpointed step of the pipeline.
+
+    - upstream: stages whose output this stage reads
+    - sources: raw files it reads (content-hashed)
+    - sql_hash: Model.sql_hash of the model it builds, None for non-model steps
+    - options: arguments that change its output (e.g. incremental mode), part of the fingerprint
+    - output: relation that must exist for the stage to be skipped
+    """
+    name: str
+    run: Callable[[], object]
+    upstream: tuple[str, ...] = ()
+    sources: tuple[Path, ...] = ()
+    sql_hash: str | None = None
+    options: tuple[tuple[str, object], ...] = ()
+    output: str | None = None
+
+
+def _log_pipeline(message: str) -> None:
+    print(f"[PIPELINE] {message}")
+
+
+def _sql_relations(sql: str, producers: dict[str, str]) -> set[str]:
+    """
+    Stages producing a relation named in the SQL (a superset is harmless: it only
+    causes extra rebuilds).
+    """
+    return {producers[token] for token in re.findall(r"\b\w+\b", sql) if token in producers}
+
+
+def pipeline_stages(bulk_engine: Engine, engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY,
+                    incremental: bool = True) -> dict[str, PipelineStage]:
+    """
+    Raw loads -> city dictionary / key maps -> staging models -> marts.
+
+    Raw loads always run incrementally (etl_file_state); incremental also applies to the
+    mart builders. Dependencies between models come from the relations their SQL reads,
+    plus build_fact_orders for the models consuming its dirty dates (DATE_CONSUMERS).
+    """
+    stages: dict[str, PipelineStage] = {}
+    producers: dict[str, str] = {}
+
+    for table, parents in table_dependencies(RAW_LOADERS).items():
+        name = f"load_{table}"
+        stages[name] = PipelineStage(
+            name,
+            partial(RAW_LOADERS[table], bulk_engine, data_dir, incremental=True),
+            upstream=tuple(f"load_{parent}" for parent in sorted(parents)),
+            sources=(data_dir / RAW_CSV_FILES[table],),
+            options=(("incremental", True),),
+            output=table,
+        )
+        producers[table] = name
+    producers["geolocation_agg"] = "load_geolocation"
+
+    stages["refresh_city_dictionary"] = PipelineStage(
+        "refresh_city_dictionary",
+        partial(refresh_city_dictionary, engine),
+        upstream=tuple(sorted({producers[table] for table, _ in CITY_SOURCES})),
+        output="city_norm_dict",
+    )
+    stages["refresh_key_maps"] = PipelineStage(
+        "refresh_key_maps",
+        partial(refresh_key_maps, engine),
+        upstream=tuple(sorted({producers[key_map.source] for key_map in KEY_MAPS.values()})),
+    )
+    producers["city_norm_dict"] = "refresh_city_dictionary"
+    producers.update({key_map.table: "refresh_key_maps" for key_map in KEY_MAPS.values()})
+
+    for model_name, builder in STAGING_BUILDERS.items():
+        name, model = f"build_{model_name}", STAGING_MODELS[model_name]
+        upstream = _sql_relations(model.sql, producers)
+        if model_name in CITY_MODELS:
+            upstream.add("refresh_city_dictionary")
+        if model_name in KEYED_MODELS:
+            upstream.add("refresh_key_maps")
+        stages[name] = PipelineStage(
+            name, partial(builder, engine), tuple(sorted(upstream)), sql_hash=model.sql_hash, output=model_name,
+        )
+    producers.update({model_name: f"build_{model_name}" for model_name in STAGING_BUILDERS})
+
+    for model, builder in MART_BUILDERS.items():
+        name = f"build_{model.name}"
+        upstream = _sql_relations(model.sql, {k: v for k, v in producers.items() if k != model.name})
+        if model.name in DATE_CONSUMERS:
+            # Not read by their SQL, but fact_orders builds queue the dirty dates they refresh
+            upstream.add(producers[FACT_ORDERS.name])
+        stages[name] = PipelineStage(
+            name, partial(builder, engine, incremental=incremental), tuple(sorted(upstream)),
+            sql_hash=model.sql_hash, options=(("incremental", incremental),), output=model.name,
+        )
+        producers[model.name] = name
+    return stages
+
+
+#--------------------------
+# Fingerprints
+#--------------------------
+
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        while block := handle.read(HASH_BLOCK_BYTES):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stage_fingerprints(stages: dict[str, PipelineStage],
+                       file_hash: Callable[[Path], str] = _file_hash) -> dict[str, str]:
+    """
+    Fingerprint of every stage: sha256 over its source file hashes, SQL hash, options and
+    the fingerprints of its upstream stages. Any change upstream changes every stage
+    downstream of it, like make's timestamps but content based.
+    """
+    dependencies = {name: set(stage.upstream) for name, stage in stages.items()}
+    fingerprints: dict[str, str] = {}
+    for name in topological_order(dependencies):
+        stage = stages[name]
+        payload = {
+            "stage": name,
+            "sources": {path.name: file_hash(path) for path in stage.sources},
+            "sql": stage.sql_hash,
+            "options": dict(stage.options),
+            "upstream": {parent: fingerprints[parent] for parent in sorted(stage.upstream)},
+        }
+        fingerprints[name] = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+    return fingerprints
+
+
+#--------------------------
+# Checkpoints
+#--------------------------
+
+def _checkpoints(engine: Engine) -> dict[str, tuple[str, str]]:
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT stage_name, fingerprint, status FROM etl_stage_checkpoints"))
+        return {row.stage_name: (row.fingerprint, row.status) for row in rows}
+
+
+def _save_checkpoint(engine: Engine, stage_name: str, fingerprint: str, status: str, run_id: str,
+                     duration_s: float | None = None, error: str | None = None) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                """
+                INSERT INTO etl_stage_checkpoints (stage_name, fingerprint, status, run_id, started_at,
+                                                   finished_at, duration_s, error)
+                VALUES (:stage_name, :fingerprint, :status, :run_id, NOW(),
+                        CASE WHEN :status = 'running' THEN NULL ELSE NOW() END, :duration_s, :error)
+                ON CONFLICT (stage_name) DO UPDATE SET
+                    fingerprint = EXCLUDED.fingerprint,
+                    status = EXCLUDED.status,
+                    run_id = EXCLUDED.run_id,
+                    started_at = CASE WHEN EXCLUDED.status = 'running'
+                                      THEN EXCLUDED.started_at ELSE etl_stage_checkpoints.started_at END,
+                    finished_at = EXCLUDED.finished_at,
+                    duration_s = EXCLUDED.duration_s,
+                    error = EXCLUDED.error
+                """
+            ),
+            {
+                "stage_name": stage_name,
+                "fingerprint": fingerprint,
+                "status": status,
+                "run_id": run_id,
+                "duration_s": duration_s,
+                "error": error,
+            },
+        )
+
+
+def _run_stage(engine: Engine, stage: PipelineStage, fingerprint: str, run_id: str,
+               done: dict[str, tuple[str, str]], force: bool) -> str:
+    """
+    Run a stage unless its checkpoint says it already succeeded with the same fingerprint
+    (and its output still exists). Returns "skipped" or "ran".
+    """
+    if not force and done.get(stage.name) == (fingerprint, "done") and (
+        stage.output is None or relation_exists(engine, stage.output)
+    ):
+        _log_pipeline(f"{stage.name}: unchanged, skipped")
+        return "skipped"
+
+    _save_checkpoint(engine, stage.name, fingerprint, "running", run_id)
+    start = time.perf_counter()
+    try:
+        stage.run()
+    except Exception as exc:
+        _save_checkpoint(
+            engine, stage.name, fingerprint, "failed", run_id, time.perf_counter() - start,
+            "".join(traceback.format_exception_only(type(exc), exc)).strip(),
+        )
+        raise
+    _save_checkpoint(engine, stage.name, fingerprint, "done", run_id, time.perf_counter() - start)
+    return "ran"
+
+
+#--------------------------
+# Public API
+#--------------------------
+
+def run_pipeline(engine: Engine, bulk_engine: Engine | None = None, data_dir: Path = RAW_DATA_DIRECTORY,
+                 incremental: bool = True, force: bool = False,
+                 max_workers: int = DEFAULT_MAX_WORKERS) -> dict[str, str]:
+    """
+    Run raw load -> staging -> marts, skipping every stage whose inputs did not change.
+
+    - Each stage has a fingerprint (stage_fingerprints) and a row in etl_stage_checkpoints
+      ('running', 'done' or 'failed' with the error)
+    - A stage is skipped when its last run is 'done' with the same fingerprint and its
+      output relation exists; anything downstream of a changed stage runs again
+    - After a failure, re-running resumes at the failed stage: finished stages are skipped
+    - Independent stages run concurrently (run_dag, fail fast)
+    - force=True runs every stage regardless of its checkpoint
+    Returns {stage: "ran" | "skipped"}.
+    """
+    bulk_engine = bulk_engine or engine
+    stages = pipeline_stages(bulk_engine, engine, data_dir, incremental)
+    fingerprints = stage_fingerprints(stages)
+    done = _checkpoints(engine)
+    run_id = uuid.uuid4().hex[:12]
+    outcomes: dict[str, str] = {}
+
+    def task(name: str) -> None:
+        outcomes[name] = _run_stage(engine, stages[name], fingerprints[name], run_id, done, force)
+
+    tasks = {name: partial(task, name) for name in stages}
+    dependencies = {name: set(stage.upstream) for name, stage in stages.items()}
+    run_dag(tasks, dependencies, max_workers=max_workers, label="PIPELINE")
+
+    n_ran = sum(outcome == "ran" for outcome in outcomes.values())
+    _log_pipeline(f"run {run_id}: {n_ran} stage(s) ran, {len(outcomes) - n_ran} skipped")
+    return outcomes
+
+
+#--------------------------
+# Main
+#--------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the checkpointed raw -> staging -> marts pipeline.")
+    parser.add_argument("--data-dir", type=Path, default=RAW_DATA_DIRECTORY)
+    parser.add_argument("--full-marts", action="store_true", help="Rebuild the marts fully instead of incrementally")
+    parser.add_argument("--force", action="store_true", help="Run every stage, ignoring checkpoints")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS)
+    args = parser.parse_args()
+
+    run_pipeline(
+        get_engine(), get_bulk_engine(), args.data_dir,
+        incremental=not args.full_marts, force=args.force, max_workers=args.workers,
+    )
+
+if __name__ == "__main__":
+    main()
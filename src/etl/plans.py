@@ -0,0 +1,271 @@
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+from collections import Counter
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from src.db.engine import get_engine
+
+
+#--------------------------
+# Settings
+#--------------------------
+
+# Opt-in: with ETL_CAPTURE_PLANS=1 every build statement runs under
+# EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON); the statement still executes exactly once
+CAPTURE_PLANS_ENV = "ETL_CAPTURE_PLANS"
+
+# Row estimate error (q-error: max(estimate/actual, actual/estimate)) worth a warning
+Q_ERROR_WARN = 100.0
+# Relative growth, against the previous plan of the same statement, worth a warning
+SLOWDOWN_WARN = 1.5
+BUFFER_GROWTH_WARN = 2.0
+
+# Node types whose appearance in a changed plan usually means a worse one
+RISKY_NODE_TYPES = frozenset({"Nested Loop", "Materialize", "Seq Scan"})
+
+
+#--------------------------
+# Plan summaries
+#--------------------------
+
+@dataclass(frozen=True)
+class PlanSummary:
+    """
+    What is compared between two runs of one statement.
+
+    - node_types: plan nodes in pre-order ("Hash Join", "Seq Scan", ...), i.e. the plan shape
+    - max_q_error / worst_node: largest row estimate error over the executed nodes
+    - shared_hit / shared_read / temp_written: blocks of the whole statement (root node)
+    """
+    execution_ms: float
+    planning_ms: float
+    total_cost: float
+    rows: int
+    node_types: tuple[str, ...]
+    max_q_error: float
+    worst_node: str | None
+    shared_hit: int
+    shared_read: int
+    temp_written: int
+
+
+def _log_plan(message: str) -> None:
+    print(f"[PLAN] {message}")
+
+
+def _walk(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _walk(child)
+
+
+def _node_label(node: dict) -> str:
+    relation = node.get("Relation Name")
+    return f"{node['Node Type']} on {relation}" if relation else node["Node Type"]
+
+
+def _q_error(node: dict) -> float:
+    # Both counts are per loop; +1 keeps empty results finite
+    estimate, actual = node["Plan Rows"] + 1, node["Actual Rows"] + 1
+    return max(estimate / actual, actual / estimate)
+
+
+def summarize_plan(explain: list[dict]) -> PlanSummary:
+    """
+    Summary of one EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) result.
+    """
+    root = explain[0]["Plan"]
+    # Rows written by INSERT/UPDATE are the rows fed into ModifyTable
+    output = root["Plans"][0] if root["Node Type"] == "ModifyTable" and root.get("Plans") else root
+    executed = [node for node in _walk(root) if node.get("Actual Loops", 0) > 0]
+    worst = max(executed, key=_q_error, default=None)
+    return PlanSummary(
+        execution_ms=float(explain[0].get("Execution Time", 0.0)),
+        planning_ms=float(explain[0].get("Planning Time", 0.0)),
+        total_cost=float(root["Total Cost"]),
+        rows=int(output.get("Actual Rows", 0) * output.get("Actual Loops", 1)),
+        node_types=tuple(node["Node Type"] for node in _walk(root)),
+        max_q_error=round(_q_error(worst), 2) if worst is not None else 1.0,
+        worst_node=_node_label(worst) if worst is not None else None,
+        shared_hit=int(root.get("Shared Hit Blocks", 0)),
+        shared_read=int(root.get("Shared Read Blocks", 0)),
+        temp_written=int(root.get("Temp Written Blocks", 0)),
+    )
+
+
+def compare_plans(previous: PlanSummary | None, current: PlanSummary, sql_changed: bool = False) -> list[str]:
+    """
+    Warnings for a statement whose plan got worse than on its previous run.
+
+    - Estimates: a q-error above Q_ERROR_WARN (always), or more than doubled since last run
+    - Shape: plan nodes changed (SQL unchanged) and either execution got SLOWDOWN_WARN
+      times slower or RISKY_NODE_TYPES nodes appeared
+    - Buffers: blocks touched grew BUFFER_GROWTH_WARN times faster than the rows produced
+    - Spills: temp blocks written where the previous run wrote none
+    """
+    warnings = []
+    if current.max_q_error > Q_ERROR_WARN and (previous is None or current.max_q_error > 2 * previous.max_q_error):
+        warnings.append(f"row estimates off by {current.max_q_error:,.0f}x at {current.worst_node}")
+    if previous is None:
+        return warnings
+
+    slowdown = current.execution_ms / max(previous.execution_ms, 1.0)
+    if current.node_types != previous.node_types and not sql_changed:
+        added = Counter(current.node_types) - Counter(previous.node_types)
+        risky = sorted(set(added) & RISKY_NODE_TYPES)
+        if slowdown > SLOWDOWN_WARN or risky:
+            removed = Counter(previous.node_types) - Counter(current.node_types)
+            warnings.append(
+                f"plan changed (+{', +'.join(sorted(added)) or 'none'}; -{', -'.join(sorted(removed)) or 'none'}), "
+                f"execution {previous.execution_ms:,.0f} -> {current.execution_ms:,.0f} ms"
+            )
+
+    blocks_before = previous.shared_hit + previous.shared_read
+    blocks_now = current.shared_hit + current.shared_read
+    row_growth = (current.rows + 1) / (previous.rows + 1)
+    if blocks_before and blocks_now / blocks_before > BUFFER_GROWTH_WARN * max(row_growth, 1.0):
+        warnings.append(f"buffers {blocks_before:,} -> {blocks_now:,} blocks for {previous.rows:,} -> {current.rows:,} rows")
+
+    if current.temp_written and not previous.temp_written:
+        warnings.append(f"spilled {current.temp_written:,} temp blocks to disk")
+    return warnings
+
+
+#--------------------------
+# History
+#--------------------------
+
+def _sql_hash(sql: str) -> str:
+    return hashlib.sha256(" ".join(sql.split()).encode("utf-8")).hexdigest()
+
+
+def _previous_plan(conn: Connection, model_name: str, statement: str) -> tuple[PlanSummary, str] | None:
+    row = conn.execute(
+        text(
+            """
+            SELECT summary, sql_hash FROM etl_plan_history
+            WHERE model_name = :model_name AND statement = :statement
+            ORDER BY plan_id DESC
+            LIMIT 1
+            """
+        ),
+        {"model_name": model_name, "statement": statement},
+    ).first()
+    if row is None:
+        return None
+    summary = dict(row.summary)
+    summary["node_types"] = tuple(summary["node_types"])
+    return PlanSummary(**summary), row.sql_hash
+
+
+def _record_plan(conn: Connection, model_name: str, statement: str, sql_hash: str, explain: list[dict],
+                 summary: PlanSummary, warnings: list[str]) -> None:
+    conn.execute(
+        text(
+            """
+            INSERT INTO etl_plan_history (model_name, statement, sql_hash, execution_ms, rows, max_q_error,
+                                          summary, plan, warnings)
+            VALUES (:model_name, :statement, :sql_hash, :execution_ms, :rows, :max_q_error,
+                    CAST(:summary AS JSONB), CAST(:plan AS JSONB), :warnings)
+            """
+        ),
+        {
+            "model_name": model_name,
+            "statement": statement,
+            "sql_hash": sql_hash,
+            "execution_ms": summary.execution_ms,
+            "rows": summary.rows,
+            "max_q_error": summary.max_q_error,
+            "summary": json.dumps(asdict(summary)),
+            "plan": json.dumps(explain),
+            "warnings": warnings,
+        },
+    )
+
+
+#--------------------------
+# Public API
+#--------------------------
+
+def capture_enabled() -> bool:
+    return os.getenv(CAPTURE_PLANS_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def execute_build_statement(conn: Connection, model_name: str, statement: str, sql: str) -> int:
+    """
+    Run one build statement (CREATE TABLE ... AS, INSERT ... ON CONFLICT, the DELETE / INSERT of
+    an incremental refresh) and return its rows.
+
+    With plan capture enabled the statement runs as EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)
+    <sql>, which executes it once and returns its plan. The plan is stored in
+    etl_plan_history, within the build's transaction, and compared with the previous run of
+    the same (model_name, statement). Warnings are printed and stored with it.
+    """
+    if not capture_enabled():
+        return conn.execute(text(sql)).rowcount
+
+    explain = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")).scalar_one()
+    if isinstance(explain, str):
+        explain = json.loads(explain)
+    summary = summarize_plan(explain)
+    sql_hash = _sql_hash(sql)
+
+    previous = _previous_plan(conn, model_name, statement)
+    warnings = compare_plans(
+        previous[0] if previous else None, summary, sql_changed=previous is not None and previous[1] != sql_hash,
+    )
+    _record_plan(conn, model_name, statement, sql_hash, explain, summary, warnings)
+
+    _log_plan(
+        f"{model_name} ({statement}): {summary.execution_ms:,.0f} ms, {summary.rows:,} rows, "
+        f"max q-error {summary.max_q_error:,.1f}, {summary.shared_hit + summary.shared_read:,} blocks"
+    )
+    for warning in warnings:
+        _log_plan(f"[WARN] {model_name} ({statement}): {warning}")
+    return summary.rows
+
+
+def plan_history(conn: Connection, model_name: str, limit: int = 10) -> list[dict]:
+    """
+    Latest captured runs of a model, newest first (without the full plans).
+    """
+    rows = conn.execute(
+        text(
+            """
+            SELECT plan_id, statement, captured_at, execution_ms, rows, max_q_error, warnings
+            FROM etl_plan_history
+            WHERE model_name = :model_name
+            ORDER BY plan_id DESC
+            LIMIT :limit
+            """
+        ),
+        {"model_name": model_name, "limit": limit},
+    )
+    return [dict(row._mapping) for row in rows]
+
+
+#--------------------------
+# Main
+#--------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the captured build plans of a model.")
+    parser.add_argument("model_name", help="e.g. fact_orders, stg_geolocation")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    with get_engine().connect() as conn:
+        for row in plan_history(conn, args.model_name, args.limit):
+            warnings = "; ".join(row["warnings"] or []) or "no warnings"
+            print(
+                f"{row['captured_at']:%Y-%m-%d %H:%M} {row['statement']:<14} {row['execution_ms']:>10,.0f} ms "
+                f"{row['rows']:>12,} rows  q-error {row['max_q_error']:>8,.1f}  {warnings}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,21 @@
 from __future__ import annotations
+import gzip
+import hashlib
+import io
+import shutil
+import time
 import pandas as pd
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
 from sqlalchemy.engine import Engine
 from sqlalchemy import text
-from src.db.engine import get_engine
+from src.db.engine import get_bulk_engine
+from src.db.schema import load_schema, pandas_read_options, table_dependencies
+from src.etl.instrument import instrumented, record_bytes_read, record_rows
+from src.etl.scheduler import run_dag
+from src.etl.text_norm import normalize_cities
 
 
 #--------------------------
@@ -13,157 +25,683 @@ from src.db.engine import get_engine
 # parents[0]=etl, [1]=db, [2]=project root
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 RAW_DATA_DIRECTORY = PROJECT_ROOT / "data" / "raw"
+# gzip copies of raw files that are not kept in the DB (aggregated geolocation)
+ARCHIVE_DIRECTORY = PROJECT_ROOT / "data" / "archive"
+
+# Source CSV of each raw table, relative to the data directory
+RAW_CSV_FILES = {
+    "customers": "olist_customers_dataset.csv",
+    "geolocation": "olist_geolocation_dataset.csv",
+    "categories": "product_category_name_translation.csv",
+    "sellers": "olist_sellers_dataset.csv",
+    "products": "olist_products_dataset.csv",
+    "orders": "olist_orders_dataset.csv",
+    "items": "olist_order_items_dataset.csv",
+    "payments": "olist_order_payments_dataset.csv",
+    "reviews": "olist_order_reviews_dataset.csv",
+}
+
+
+#--------------------------
+# Write backends
+#--------------------------
+
+# "copy" streams rows with COPY ... FROM STDIN, "to_sql" keeps the pandas multi-row INSERT path
+LOAD_BACKENDS = ("copy", "to_sql")
+DEFAULT_BACKEND = "copy"
+
+# Per-table backend overrides, e.g. {"products": "to_sql"}
+TABLE_BACKENDS: dict[str, str] = {}
+
+# Rows serialized into one in-memory CSV buffer per COPY call
+COPY_CHUNK_ROWS = 100_000
+
+# Transaction-local setting checked by the log_order_changes() triggers (schema.sql): plain
+# (non-incremental) loads do not log every loaded order into etl_order_changes, a full
+# fact_orders build covers them
+SKIP_CHANGE_LOG_SQL = "SET LOCAL etl.skip_change_log = 'on'"
+
+
+#--------------------------
+# CSV reading
+#--------------------------
+
+# Rows per CSV chunk; None reads each file in one go. With a chunk size peak memory is
+# bounded by one chunk regardless of the file size.
+DEFAULT_CHUNKSIZE: int | None = None
+
+# Low cardinality TEXT columns read as pandas category (CHAR(n) columns are categorical already)
+CATEGORICAL_COLUMNS = ("order_status", "payment_type")
+
+# Block size used to hash source files
+HASH_BLOCK_BYTES = 1 << 20
+
+
+#--------------------------
+# Incremental state
+#--------------------------
+
+@dataclass(frozen=True)
+class LoadPlan:
+    """
+    What an incremental load of one file has to do.
+
+    - mode "skip": file unchanged since last load
+    - mode "append": previous file is a prefix of the new one; only bytes after start_byte are read
+    - mode "full": file is new or was rewritten; every row is upserted
+    """
+    mode: str
+    content_hash: str
+    byte_size: int
+    start_byte: int = 0
+    start_row: int = 0
 
 
 #--------------------------
 # Helpers
 #--------------------------
 
-def _log_loaded(table: str, df: pd.DataFrame) -> None:
-    print(f"Load {table}: inserted {len(df):,} rows")
+def _log_loaded(table: str, n_rows: int, elapsed: float, backend: str, n_applied: int | None = None) -> None:
+    rows_per_sec = n_rows / elapsed if elapsed > 0 else float("inf")
+    applied = "" if n_applied is None else f", {n_applied:,} new/changed"
+    record_rows(n_rows if n_applied is None else n_applied)
+    print(f"Load {table}: inserted {n_rows:,} rows{applied} in {elapsed:.2f}s ({rows_per_sec:,.0f} rows/s, {backend})")
+
+
+def _resolve_backend(table: str, backend: str | None) -> str:
+    """
+    Pick the write backend for a table: explicit argument > TABLE_BACKENDS > DEFAULT_BACKEND.
+    """
+    resolved = backend or TABLE_BACKENDS.get(table, DEFAULT_BACKEND)
+    if resolved not in LOAD_BACKENDS:
+        raise ValueError(f"Unknown load backend {resolved!r} for {table}; expected one of {LOAD_BACKENDS}")
+    return resolved
+
+
+def _conflict_key(table: str) -> tuple[str, ...]:
+    """
+    Natural key used for upserts: the table's PK, unless it is a DB-generated serial.
+    """
+    table_def = load_schema()[table]
+    if any(table_def.columns[col].endswith("SERIAL") for col in table_def.primary_key):
+        return ()
+    return table_def.primary_key
+
+
+def _copy_ready(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Make a frame safe to serialize as COPY csv input.
+
+    Integer columns with missing values come out of read_csv as float64 and would be written
+    as '40.0', which Postgres rejects for INTEGER columns. Those are cast to nullable Int64.
+    """
+    df = df.copy()
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_float_dtype(values):
+            non_null = values.dropna()
+            if len(non_null) > 0 and (non_null % 1 == 0).all():
+                df[col] = values.astype("Int64")
+    return df
+
+
+def _copy_into(cur, table: str, df: pd.DataFrame) -> None:
+    """
+    COPY one frame into a table, serialized in COPY_CHUNK_ROWS slices.
+    """
+    df = _copy_ready(df)
+    columns = ", ".join(df.columns)
+    copy_sql = f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    for start in range(0, len(df), COPY_CHUNK_ROWS):
+        buffer = io.StringIO()
+        # NaN/NaT/None -> unquoted empty field -> NULL
+        df.iloc[start:start + COPY_CHUNK_ROWS].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cur.copy_expert(copy_sql, buffer)
+
+
+def _upsert_sql(table: str, delta_table: str, columns: list[str], key: tuple[str, ...]) -> str:
+    """
+    INSERT ... ON CONFLICT on the natural key; rows identical to the stored ones are not touched.
+    """
+    column_list = ", ".join(columns)
+    updates = [col for col in columns if col not in key]
+    if not updates:
+        conflict_action = "DO NOTHING"
+    else:
+        assignments = ", ".join(f"{col} = EXCLUDED.{col}" for col in updates)
+        current = ", ".join(f"{table}.{col}" for col in updates)
+        incoming = ", ".join(f"EXCLUDED.{col}" for col in updates)
+        conflict_action = f"DO UPDATE SET {assignments} WHERE ({current}) IS DISTINCT FROM ({incoming})"
+    return (
+        f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {delta_table} "
+        f"ON CONFLICT ({', '.join(key)}) {conflict_action}"
+    )
+
+
+def _copy_frames(engine: Engine, table: str, frames: Iterable[pd.DataFrame], upsert: bool = False,
+                 finalize: Callable[[object, int], None] | None = None,
+                 log_changes: bool = True) -> tuple[int, int]:
+    """
+    Stream DataFrames into a table with COPY ... FROM STDIN (psycopg2 copy_expert).
+
+    - Plain mode copies straight into the table
+    - Upsert mode copies into a temp table and merges it with INSERT ... ON CONFLICT on the
+      natural key; tables keyed by a serial (geolocation) have no natural key and are replaced
+    - finalize(cursor, n_rows) runs before the commit, so bookkeeping lands in the same transaction
+    - log_changes=False keeps the rows out of etl_order_changes (SKIP_CHANGE_LOG_SQL)
+
+    Returns (rows read, rows inserted or changed).
+    """
+    n_rows = n_applied = 0
+    key = _conflict_key(table) if upsert else ()
+    delta_table = f"_delta_{table}"
+    columns: list[str] = []
+
+    raw_conn = engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cur:
+            if not log_changes:
+                cur.execute(SKIP_CHANGE_LOG_SQL)
+            if upsert and key:
+                cur.execute(f"CREATE TEMP TABLE {delta_table} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+            elif upsert:
+                cur.execute(f"TRUNCATE TABLE {table} RESTART IDENTITY")
+
+            for df in frames:
+                columns = list(df.columns)
+                _copy_into(cur, delta_table if key else table, df)
+                n_rows += len(df)
+
+            if key and columns:
+                cur.execute(_upsert_sql(table, delta_table, columns, key))
+                n_applied = cur.rowcount
+            else:
+                n_applied = n_rows
+
+            if finalize is not None:
+                finalize(cur, n_rows)
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+    return n_rows, n_applied
+
+
+def _to_sql_frames(engine: Engine, table: str, frames: Iterable[pd.DataFrame],
+                   chunksize: int | None = None, log_changes: bool = True) -> int:
+    """
+    Append DataFrames with pandas multi-row INSERTs, all frames in one transaction.
+    """
+    n_rows = 0
+    with engine.begin() as conn:
+        if not log_changes:
+            conn.execute(text(SKIP_CHANGE_LOG_SQL))
+        for df in frames:
+            df.to_sql(table, conn, if_exists="append", index=False, method="multi", chunksize=chunksize)
+            n_rows += len(df)
+    return n_rows
+
+
+def _write_table(engine: Engine, table: str, frames: pd.DataFrame | Iterable[pd.DataFrame],
+                 backend: str | None = None, to_sql_chunksize: int | None = None) -> None:
+    """
+    Append one DataFrame, or a stream of chunks, to a table with the selected backend and
+    report throughput. Chunks are consumed one at a time, so a chunked reader keeps memory flat.
+    Used by full (non-incremental) loads, which are not logged in etl_order_changes.
+    """
+    backend = _resolve_backend(table, backend)
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    start = time.perf_counter()
+
+    if backend == "copy":
+        n_rows, _ = _copy_frames(engine, table, frames, log_changes=False)
+    else:
+        n_rows = _to_sql_frames(engine, table, frames, to_sql_chunksize, log_changes=False)
+
+    _log_loaded(table, n_rows, time.perf_counter() - start, backend)
+
+
+def _read_csv(table: str, csv_path: Path, chunksize: int | None = None,
+              start_byte: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    Read a raw CSV with compact dtypes derived from schema.sql.
+
+    Yields the whole file as one frame when chunksize is None, otherwise frames of
+    chunksize rows, so only one chunk is in memory at a time. start_byte > 0 resumes
+    reading after an already loaded prefix (header names are taken from the first line).
+    """
+    dtype, parse_dates = pandas_read_options(table, categorical=CATEGORICAL_COLUMNS)
+    options = {}
+    if start_byte > 0:
+        options = {"header": None, "names": list(pd.read_csv(csv_path, nrows=0).columns)}
+
+    with open(csv_path, "rb") as handle:
+        handle.seek(start_byte)
+        record_bytes_read(csv_path.stat().st_size - start_byte)
+        reader = pd.read_csv(handle, dtype=dtype, parse_dates=parse_dates, chunksize=chunksize, **options)
+        if chunksize is None:
+            yield reader
+        else:
+            with reader:
+                yield from reader
+
+
+def _fingerprint(csv_path: Path, prefix_size: int = 0) -> tuple[str, int, str | None]:
+    """
+    Hash a file in one pass.
+
+    Returns (sha256 of the whole file, size in bytes, sha256 of its first prefix_size bytes).
+    The prefix hash is None unless the file is longer than prefix_size and the prefix ends
+    on a line break (otherwise appended rows could not be read on their own).
+    """
+    full, prefix = hashlib.sha256(), hashlib.sha256()
+    prefix_digest, prefix_ends_line, position = None, False, 0
+    with open(csv_path, "rb") as handle:
+        while block := handle.read(HASH_BLOCK_BYTES):
+            end = position + len(block)
+            if position < prefix_size <= end:
+                cut = prefix_size - position
+                prefix.update(block[:cut])
+                prefix_digest = prefix.hexdigest()
+                prefix_ends_line = block[cut - 1:cut] == b"\n"
+            elif end < prefix_size:
+                prefix.update(block)
+            full.update(block)
+            position = end
+
+    prefix_hash = prefix_digest if prefix_ends_line and position > prefix_size else None
+    return full.hexdigest(), position, prefix_hash
+
+
+def _plan_load(engine: Engine, table: str, csv_path: Path) -> LoadPlan:
+    """
+    Compare a source file with the state recorded at its last load.
+    """
+    with engine.connect() as conn:
+        state = conn.execute(
+            text("SELECT content_hash, byte_size, row_count FROM etl_file_state WHERE table_name = :table"),
+            {"table": table},
+        ).one_or_none()
+
+    if state is None:
+        content_hash, byte_size, _ = _fingerprint(csv_path)
+        return LoadPlan("full", content_hash, byte_size)
+
+    content_hash, byte_size, prefix_hash = _fingerprint(csv_path, prefix_size=state.byte_size)
+    if content_hash == state.content_hash:
+        return LoadPlan("skip", content_hash, byte_size, state.byte_size, state.row_count)
+    if prefix_hash == state.content_hash:
+        return LoadPlan("append", content_hash, byte_size, state.byte_size, state.row_count)
+    return LoadPlan("full", content_hash, byte_size)
+
+
+def _record_file_state(table: str, csv_path: Path, plan: LoadPlan) -> Callable[[object, int], None]:
+    """
+    Build the finalize hook that stores the new hash and watermarks of a loaded file.
+    """
+    def finalize(cur, n_rows: int) -> None:
+        cur.execute(
+            """
+            INSERT INTO etl_file_state (table_name, file_name, content_hash, byte_size, row_count, loaded_at)
+            VALUES (%s, %s, %s, %s, %s, NOW())
+            ON CONFLICT (table_name) DO UPDATE SET
+                file_name = EXCLUDED.file_name,
+                content_hash = EXCLUDED.content_hash,
+                byte_size = EXCLUDED.byte_size,
+                row_count = EXCLUDED.row_count,
+                loaded_at = EXCLUDED.loaded_at
+            """,
+            (table, csv_path.name, plan.content_hash, plan.byte_size, plan.start_row + n_rows),
+        )
+    return finalize
+
+
+def _load_csv(engine: Engine, table: str, csv_path: Path, backend: str | None = None,
+              chunksize: int | None = None, incremental: bool = False,
+              prepare: Callable[[pd.DataFrame], pd.DataFrame] | None = None,
+              to_sql_chunksize: int | None = None) -> None:
+    """
+    Read a raw CSV, apply the loader specific conversions and write it to its table.
+
+    With incremental=True the file is compared with etl_file_state first:
+    - unchanged files are skipped without being parsed
+    - appended files only have their new tail read and upserted
+    - new or rewritten files are fully upserted (INSERT ... ON CONFLICT on the PK)
+    Incremental loads always use the COPY backend (upserts go through a temp table).
+    """
+    plan = _plan_load(engine, table, csv_path) if incremental else None
+    if plan is not None and plan.mode == "skip":
+        print(f"Load {table}: {csv_path.name} unchanged, skipped")
+        return
+
+    frames = _read_csv(table, csv_path, chunksize, start_byte=plan.start_byte if plan else 0)
+    if prepare is not None:
+        frames = (prepare(df) for df in frames)
+
+    if plan is None:
+        _write_table(engine, table, frames, backend, to_sql_chunksize)
+        return
+
+    start = time.perf_counter()
+    n_rows, n_applied = _copy_frames(
+        engine, table, frames,
+        # Appended rows of a serial keyed table can simply be inserted
+        upsert=plan.mode == "full" or bool(_conflict_key(table)),
+        finalize=_record_file_state(table, csv_path, plan),
+    )
+    _log_loaded(table, n_rows, time.perf_counter() - start, f"copy, incremental {plan.mode}", n_applied)
+
+
+#--------------------------
+# Aggregated geolocation
+#--------------------------
+
+GEOLOCATION_AGG_KEY = ("zip_prefix", "geolocation_state", "geolocation_city_norm")
+
+# Rows per chunk when aggregating geolocation (~1M rows): memory stays bounded by one chunk
+GEOLOCATION_AGG_CHUNKSIZE = 200_000
+
+
+def _aggregate_geolocation(engine: Engine, frames: Iterable[pd.DataFrame]) -> tuple[pd.DataFrame, int]:
+    """
+    Collapse raw geolocation chunks to one row per zip prefix / state / normalized city.
+
+    Cities are normalized by the DB (normalize_cities), once per distinct string; each chunk
+    is mapped through its factorized city codes and grouped with vectorized sums.
+    Returns (aggregated frame, raw rows read).
+    """
+    lookup: dict[str, str] = {}
+    partials = []
+    n_rows = 0
+    for df in frames:
+        codes, cities = pd.factorize(df["geolocation_city"])
+        missing = [city for city in cities if city not in lookup]
+        if missing:
+            lookup.update(normalize_cities(engine, missing))
+        city_norm = pd.Index(cities).map(lookup).to_numpy(dtype=object)[codes]
+
+        keys = pd.DataFrame({
+            "zip_prefix": df["geolocation_zip_code_prefix"].to_numpy(),
+            "geolocation_state": df["geolocation_state"].astype(str).to_numpy(),
+            "geolocation_city_norm": city_norm,
+        })
+        partials.append(
+            pd.concat([keys, df[["geolocation_lat", "geolocation_lng"]].reset_index(drop=True)], axis=1)
+            .groupby(list(GEOLOCATION_AGG_KEY), sort=False)
+            .agg(lat_sum=("geolocation_lat", "sum"), lng_sum=("geolocation_lng", "sum"),
+                 n_points=("geolocation_lat", "size"))
+        )
+        n_rows += len(df)
+
+    if not partials:
+        return pd.DataFrame(columns=[*GEOLOCATION_AGG_KEY, "lat_sum", "lng_sum", "n_points"]), 0
+    # Partials are small (one row per key and chunk); sums merge exactly across chunks
+    aggregated = pd.concat(partials).groupby(level=list(range(len(GEOLOCATION_AGG_KEY))), sort=False).sum()
+    return aggregated.reset_index(), n_rows
+
+
+def _archive_raw(csv_path: Path, archive_dir: Path) -> Path:
+    """
+    Keep a gzip copy of a raw file whose rows are not stored in the DB.
+    """
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    archive_path = archive_dir / f"{csv_path.name}.gz"
+    with open(csv_path, "rb") as source, gzip.open(archive_path, "wb", compresslevel=6) as target:
+        shutil.copyfileobj(source, target, HASH_BLOCK_BYTES)
+    return archive_path
+
+
+def _load_geolocation_agg(engine: Engine, csv_path: Path, chunksize: int | None = None,
+                          incremental: bool = False, archive_dir: Path | None = None) -> None:
+    """
+    Stream the geolocation CSV, aggregate it in pandas and write only geolocation_agg.
+
+    - The raw geolocation table is emptied (the two modes would double count in staging)
+    - Full loads replace geolocation_agg; incremental appends add their sums to the stored rows
+    - archive_dir keeps a gzip copy of the raw file
+    File state is tracked under "geolocation_agg" so switching modes forces a full load.
+    """
+    table = "geolocation_agg"
+    plan = _plan_load(engine, table, csv_path) if incremental else LoadPlan("full", "", 0)
+    if plan.mode == "skip":
+        print(f"Load {table}: {csv_path.name} unchanged, skipped")
+        return
+
+    start = time.perf_counter()
+    frames = _read_csv("geolocation", csv_path, chunksize or GEOLOCATION_AGG_CHUNKSIZE, start_byte=plan.start_byte)
+    aggregated, n_rows = _aggregate_geolocation(engine, frames)
+
+    raw_conn = engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cur:
+            cur.execute("TRUNCATE TABLE geolocation RESTART IDENTITY")
+            cur.execute("DELETE FROM etl_file_state WHERE table_name = 'geolocation'")
+            if plan.mode == "append":
+                cur.execute(f"CREATE TEMP TABLE _delta_{table} (LIKE {table}) ON COMMIT DROP")
+                _copy_into(cur, f"_delta_{table}", aggregated)
+                columns = ", ".join(aggregated.columns)
+                cur.execute(
+                    f"""
+                    INSERT INTO {table} ({columns}) SELECT {columns} FROM _delta_{table}
+                    ON CONFLICT ({', '.join(GEOLOCATION_AGG_KEY)}) DO UPDATE SET
+                        lat_sum = {table}.lat_sum + EXCLUDED.lat_sum,
+                        lng_sum = {table}.lng_sum + EXCLUDED.lng_sum,
+                        n_points = {table}.n_points + EXCLUDED.n_points
+                    """
+                )
+            else:
+                cur.execute(f"TRUNCATE TABLE {table}")
+                _copy_into(cur, table, aggregated)
+            if incremental:
+                _record_file_state(table, csv_path, plan)(cur, n_rows)
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+
+    elapsed = time.perf_counter() - start
+    record_rows(len(aggregated))
+    print(f"Load {table}: aggregated {n_rows:,} raw rows into {len(aggregated):,} rows in {elapsed:.2f}s "
+          f"({n_rows / elapsed if elapsed > 0 else float('inf'):,.0f} rows/s)")
+
+    if archive_dir is not None:
+        print(f"Load {table}: raw file archived to {_archive_raw(csv_path, archive_dir)}")
 
 
 #--------------------------
 # Loaders for base tables
 #--------------------------
 
-def load_customers(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY) -> None:
+@instrumented("load")
+def load_customers(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY, backend: str | None = None,
+                   chunksize: int | None = DEFAULT_CHUNKSIZE, incremental: bool = False) -> None:
     """
     Loads olist_customers_dataset.csv -> customers table.
     """
-    csv_path = data_dir / "olist_customers_dataset.csv"
-    df = pd.read_csv(csv_path)
-    df.to_sql("customers", engine, if_exists="append", index=False, method="multi")
-    _log_loaded("customers", df)
+    csv_path = data_dir / RAW_CSV_FILES["customers"]
+    _load_csv(engine, "customers", csv_path, backend, chunksize, incremental)
 
 
-def load_geolocation(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY) -> None:
+@instrumented("load")
+def load_geolocation(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY, backend: str | None = None,
+                     chunksize: int | None = DEFAULT_CHUNKSIZE, incremental: bool = False,
+                     aggregate: bool = False, archive_dir: Path | None = None) -> None:
     """
     Loads olist_geolocation_dataset.csv -> geolocation table.
+
+    aggregate=True writes only geolocation_agg (one row per zip/state/normalized city,
+    see _load_geolocation_agg) instead of the ~1M duplicated raw rows; archive_dir then
+    optionally keeps a gzip copy of the raw file.
     """
-    csv_path = data_dir / "olist_geolocation_dataset.csv"
-    df = pd.read_csv(csv_path)
-    df.to_sql("geolocation", engine, if_exists="append", index=False, method="multi", chunksize=10_000)
-    _log_loaded("geolocation", df)
+    csv_path = data_dir / RAW_CSV_FILES["geolocation"]
+    if aggregate:
+        _load_geolocation_agg(engine, csv_path, chunksize, incremental, archive_dir)
+        return
+
+    # Raw mode replaces the aggregated mode's output
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE TABLE geolocation_agg"))
+        conn.execute(text("DELETE FROM etl_file_state WHERE table_name = 'geolocation_agg'"))
+    _load_csv(engine, "geolocation", csv_path, backend, chunksize, incremental, to_sql_chunksize=10_000)
 
 
-def load_items(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY) -> None:
+@instrumented("load")
+def load_items(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY, backend: str | None = None,
+               chunksize: int | None = DEFAULT_CHUNKSIZE, incremental: bool = False) -> None:
     """
     Loads olist_order_items_dataset.csv -> items table.
     """
-    csv_path = data_dir / "olist_order_items_dataset.csv"
-    df = pd.read_csv(csv_path, parse_dates=["shipping_limit_date"])
-    df.to_sql("items", engine, if_exists="append", index=False, method="multi")
-    _log_loaded("items", df)
+    csv_path = data_dir / RAW_CSV_FILES["items"]
+    _load_csv(engine, "items", csv_path, backend, chunksize, incremental)
 
 
-def load_payments(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY) -> None:
+@instrumented("load")
+def load_payments(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY, backend: str | None = None,
+                  chunksize: int | None = DEFAULT_CHUNKSIZE, incremental: bool = False) -> None:
     """
     Loads olist_order_payments_dataset.csv -> payments table.
     """
-    csv_path = data_dir / "olist_order_payments_dataset.csv"
-    df = pd.read_csv(csv_path)
-    df.to_sql("payments", engine, if_exists="append", index=False, method="multi")
-    _log_loaded("payments", df)
+    csv_path = data_dir / RAW_CSV_FILES["payments"]
+    _load_csv(engine, "payments", csv_path, backend, chunksize, incremental)
 
 
-def load_reviews(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY) -> None:
+@instrumented("load")
+def load_reviews(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY, backend: str | None = None,
+                 chunksize: int | None = DEFAULT_CHUNKSIZE, incremental: bool = False) -> None:
     """
     Loads olist_order_reviews_dataset.csv -> reviews table.
     """
-    csv_path = data_dir / "olist_order_reviews_dataset.csv"
-    df = pd.read_csv(csv_path, parse_dates=["review_creation_date", "review_answer_timestamp"])
+    csv_path = data_dir / RAW_CSV_FILES["reviews"]
 
-    # review_creation_date is DATE in SQL schema
-    df["review_creation_date"] = df["review_creation_date"].dt.date
+    def prepare(df: pd.DataFrame) -> pd.DataFrame:
+        # review_creation_date is DATE in SQL schema
+        df["review_creation_date"] = df["review_creation_date"].dt.date
+        return df
 
-    df.to_sql("reviews", engine, if_exists="append", index=False, method="multi")
-    _log_loaded("reviews", df)
+    _load_csv(engine, "reviews", csv_path, backend, chunksize, incremental, prepare)
 
 
-def load_orders(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY) -> None:
+@instrumented("load")
+def load_orders(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY, backend: str | None = None,
+                chunksize: int | None = DEFAULT_CHUNKSIZE, incremental: bool = False) -> None:
     """
     Loads olist_orders_dataset.csv -> orders table.
     """
-    csv_path = data_dir / "olist_orders_dataset.csv"
-    df = pd.read_csv(csv_path, parse_dates=["order_purchase_timestamp", 
-                                            "order_approved_at", 
-                                            "order_delivered_carrier_date", 
-                                            "order_delivered_customer_date", 
-                                            "order_estimated_delivery_date"])
+    csv_path = data_dir / RAW_CSV_FILES["orders"]
 
-    # order_estimated_delivery_date is DATE in SQL schema
-    df["order_estimated_delivery_date"] = df["order_estimated_delivery_date"].dt.date
+    def prepare(df: pd.DataFrame) -> pd.DataFrame:
+        # order_estimated_delivery_date is DATE in SQL schema
+        df["order_estimated_delivery_date"] = df["order_estimated_delivery_date"].dt.date
+        return df
 
-    df.to_sql("orders", engine, if_exists="append", index=False, method="multi")
-    _log_loaded("orders", df)
+    _load_csv(engine, "orders", csv_path, backend, chunksize, incremental, prepare)
 
 
-def load_products(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY) -> None:
+@instrumented("load")
+def load_products(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY, backend: str | None = None,
+                  chunksize: int | None = DEFAULT_CHUNKSIZE, incremental: bool = False) -> None:
     """
     Loads olits_products_dataset.csv -> products table.
     Ensures that product_category_name values respect the FK to categories (2 missing category names in products table).
     """
-    csv_path = data_dir / "olist_products_dataset.csv"
-    df = pd.read_csv(csv_path)
+    csv_path = data_dir / RAW_CSV_FILES["products"]
 
     # Get list of valid product category names
     with engine.connect() as conn:
         result = conn.execute(text("SELECT product_category_name FROM categories"))
         valid_categories = {row[0] for row in result}  # Set of category names
-    
-    # For products with category names not present in categories set product_category_name to NULL
-    mask_invalid = ~df["product_category_name"].isin(valid_categories) & df["product_category_name"].notna()
-    n_invalid = int(mask_invalid.sum())
-    if n_invalid > 0:
-        print(f"[WARN] {n_invalid} products with unmapped category; setting product_category_name to NULL")
-        df.loc[mask_invalid, "product_category_name"] = None
 
+    def prepare(df: pd.DataFrame) -> pd.DataFrame:
+        # For products with category names not present in categories set product_category_name to NULL
+        mask_invalid = ~df["product_category_name"].isin(valid_categories) & df["product_category_name"].notna()
+        n_invalid = int(mask_invalid.sum())
+        if n_invalid > 0:
+            print(f"[WARN] {n_invalid} products with unmapped category; setting product_category_name to NULL")
+            df.loc[mask_invalid, "product_category_name"] = None
+        return df
 
-    df.to_sql("products", engine, if_exists="append", index=False, method="multi")
-    _log_loaded("products", df)
+    _load_csv(engine, "products", csv_path, backend, chunksize, incremental, prepare)
 
 
-def load_sellers(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY) -> None:
+@instrumented("load")
+def load_sellers(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY, backend: str | None = None,
+                 chunksize: int | None = DEFAULT_CHUNKSIZE, incremental: bool = False) -> None:
     """
     Loads olist_sellers_dataset.csv -> sellers table.
     """
-    csv_path = data_dir / "olist_sellers_dataset.csv"
-    df = pd.read_csv(csv_path)
-    df.to_sql("sellers", engine, if_exists="append", index=False, method="multi")
-    _log_loaded("sellers", df)
+    csv_path = data_dir / RAW_CSV_FILES["sellers"]
+    _load_csv(engine, "sellers", csv_path, backend, chunksize, incremental)
 
 
-def load_categories(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY) -> None:
+@instrumented("load")
+def load_categories(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY, backend: str | None = None,
+                    chunksize: int | None = DEFAULT_CHUNKSIZE, incremental: bool = False) -> None:
     """
     Load product_category_name_translation.csv -> categories table.
     """
-    csv_path = data_dir / "product_category_name_translation.csv"
-    df = pd.read_csv(csv_path)
-    df.to_sql("categories", engine, if_exists="append", index=False, method="multi")
-    _log_loaded("categories", df)
+    csv_path = data_dir / RAW_CSV_FILES["categories"]
+    _load_csv(engine, "categories", csv_path, backend, chunksize, incremental)
 
 
 #--------------------------
 # Orchestrator
 #--------------------------
 
-def load_all_raw(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY) -> None:
+# Loader per raw table; load order is derived from the FKs declared in schema.sql
+RAW_LOADERS = {
+    "customers": load_customers,
+    "geolocation": load_geolocation,
+    "categories": load_categories,
+    "sellers": load_sellers,
+    "products": load_products,
+    "orders": load_orders,
+    "items": load_items,
+    "payments": load_payments,
+    "reviews": load_reviews,
+}
+
+# Loaders running at the same time; each one checks out its own pooled connection
+DEFAULT_MAX_WORKERS = 4
+
+
+@instrumented("pipeline")
+def load_all_raw(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY, backend: str | None = None,
+                 max_workers: int = DEFAULT_MAX_WORKERS, chunksize: int | None = DEFAULT_CHUNKSIZE,
+                 incremental: bool = False, aggregate_geolocation: bool = False,
+                 archive_dir: Path | None = None) -> None:
     """
-    Run the whole raw csv -> DB load in a sensible dependency order.
+    Run the whole raw csv -> DB load, respecting FK dependencies.
+
+    - Loaders whose parent tables are loaded run concurrently on a pool of max_workers threads,
+      so wall time follows the critical path (geolocation, customers -> orders -> items)
+    - max_workers=1 runs the loaders one after another in dependency order
+    - The first failing loader stops the run: nothing new is started and its error is re-raised
+    - backend forces one write backend for every table; when None each table uses
+      TABLE_BACKENDS / DEFAULT_BACKEND
+    - chunksize streams every CSV in chunks of that many rows (bounded memory per loader)
+    - incremental=True applies only what changed since the last incremental load
+      (see _load_csv) instead of appending every row; only incremental loads log the orders
+      they touch into etl_order_changes, full loads need a full fact_orders build
+    - aggregate_geolocation=True loads geolocation pre-aggregated into geolocation_agg
+      (raw copy archived to archive_dir when given)
     """
-    # Tables without foreign keys
-    load_customers(engine, data_dir)
-    load_geolocation(engine, data_dir)
-    load_categories(engine, data_dir)
-    load_sellers(engine, data_dir)
-
-    # Tables with references
-    load_products(engine, data_dir)
-    load_orders(engine, data_dir)
-    load_items(engine, data_dir)
-    load_payments(engine, data_dir)
-    load_reviews(engine, data_dir)
+    dependencies = table_dependencies(RAW_LOADERS)
+    tasks = {
+        table: partial(loader, engine, data_dir, backend, chunksize, incremental)
+        for table, loader in RAW_LOADERS.items()
+    }
+    if aggregate_geolocation:
+        tasks["geolocation"] = partial(
+            load_geolocation, engine, data_dir, backend, chunksize, incremental,
+            aggregate=True, archive_dir=archive_dir,
+        )
+    run_dag(tasks, dependencies, max_workers=max_workers, label="LOAD")
 
     print("[LOAD] All raw tables loaded")
 
@@ -173,8 +711,8 @@ def load_all_raw(engine: Engine, data_dir: Path = RAW_DATA_DIRECTORY) -> None:
 #--------------------------
 
 def main():
-    engine = get_engine()
+    engine = get_bulk_engine()
     load_all_raw(engine)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,103 @@
+from __future__ import annotations
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+
+#--------------------------
+# Helpers
+#--------------------------
+
+def _log_dag(label: str, message: str) -> None:
+    print(f"[{label}] {message}")
+
+
+def topological_order(dependencies: dict[str, set[str]]) -> list[str]:
+    """
+    Return the tasks in a dependency-respecting order (stable w.r.t. dict order).
+
+    Raises ValueError on unknown dependencies or cycles.
+    """
+    for task, parents in dependencies.items():
+        unknown = set(parents) - set(dependencies)
+        if unknown:
+            raise ValueError(f"Task {task!r} depends on unknown tasks: {sorted(unknown)}")
+
+    order: list[str] = []
+    done: set[str] = set()
+    remaining = dict(dependencies)
+    while remaining:
+        ready = [task for task, parents in remaining.items() if set(parents) <= done]
+        if not ready:
+            raise ValueError(f"Dependency cycle between tasks: {sorted(remaining)}")
+        for task in ready:
+            order.append(task)
+            done.add(task)
+            del remaining[task]
+    return order
+
+
+#--------------------------
+# Scheduler
+#--------------------------
+
+def run_dag(
+    tasks: dict[str, Callable[[], object]],
+    dependencies: dict[str, set[str]],
+    max_workers: int = 4,
+    label: str = "DAG",
+) -> dict[str, float]:
+    """
+    Run callables on a bounded thread pool as soon as all their dependencies have finished.
+
+    - At most max_workers tasks run at the same time; max_workers=1 runs them sequentially
+      in topological order
+    - Fail fast: after the first error no new task is started, the tasks already running
+      are waited for (a DB statement cannot be interrupted from Python), then the first
+      error is re-raised
+    - Returns {task: elapsed seconds}
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers must be >= 1")
+
+    dependencies = {task: set(dependencies.get(task, set())) for task in tasks}
+    order = topological_order(dependencies)
+
+    elapsed: dict[str, float] = {}
+    finished: set[str] = set()
+    pending = list(order)
+    running: dict[Future, tuple[str, float]] = {}
+    error: BaseException | None = None
+    dag_start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=label.lower()) as pool:
+        while pending or running:
+            # Submit ready tasks, never more than max_workers in flight so nothing sits queued
+            if error is None:
+                for task in list(pending):
+                    if len(running) >= max_workers:
+                        break
+                    if dependencies[task] <= finished:
+                        pending.remove(task)
+                        running[pool.submit(tasks[task])] = (task, time.perf_counter())
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task, started = running.pop(future)
+                elapsed[task] = time.perf_counter() - started
+                exc = future.exception()
+                if exc is not None:
+                    if error is None:
+                        error = exc
+                        _log_dag(label, f"{task} failed after {elapsed[task]:.2f}s: {exc!r}; cancelling {len(pending)} pending task(s)")
+                else:
+                    finished.add(task)
+
+    if error is not None:
+        raise error
+
+    _log_dag(label, f"{len(tasks)} task(s) finished in {time.perf_counter() - dag_start:.2f}s with {max_workers} worker(s)")
+    return elapsed
@@ -0,0 +1,611 @@
+from __future__ import annotations
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from src.etl.raw_to_db import RAW_CSV_FILES
+from src.etl.text_norm import normalize_text
+
+
+#--------------------------
+# Paths
+#--------------------------
+
+# parents[0]=etl, [1]=src, [2]=project root
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+SYNTHETIC_DATA_DIRECTORY = PROJECT_ROOT / "data" / "synthetic"
+
+
+#--------------------------
+# File layouts
+#--------------------------
+
+# Same columns as the Olist CSVs in data/raw, written under RAW_CSV_FILES names, so raw_to_db
+# loads them as is
+CSV_COLUMNS = {
+    "customers": ["customer_id", "customer_unique_id", "customer_zip_code_prefix", "customer_city", "customer_state"],
+    "geolocation": ["geolocation_zip_code_prefix", "geolocation_lat", "geolocation_lng", "geolocation_city", "geolocation_state"],
+    "categories": ["product_category_name", "product_category_name_english"],
+    "sellers": ["seller_id", "seller_zip_code_prefix", "seller_city", "seller_state"],
+    "products": [
+        "product_id", "product_category_name", "product_name_lenght", "product_description_lenght",
+        "product_photos_qty", "product_weight_g", "product_length_cm", "product_height_cm", "product_width_cm",
+    ],
+    "orders": [
+        "order_id", "customer_id", "order_status", "order_purchase_timestamp", "order_approved_at",
+        "order_delivered_carrier_date", "order_delivered_customer_date", "order_estimated_delivery_date",
+    ],
+    "items": ["order_id", "order_item_id", "product_id", "seller_id", "shipping_limit_date", "price", "freight_value"],
+    "payments": ["order_id", "payment_sequential", "payment_type", "payment_installments", "payment_value"],
+    "reviews": [
+        "review_id", "order_id", "review_score", "review_comment_title", "review_comment_message",
+        "review_creation_date", "review_answer_timestamp",
+    ],
+}
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+#--------------------------
+# Distributions (data/data_info.md, scale factor 1)
+#--------------------------
+
+# Rows at scale factor 1; customers/items/payments/reviews follow from the orders
+BASE_ROWS = {"orders": 99_441, "products": 32_951, "sellers": 3_095, "geolocation": 1_000_163}
+
+# Orders (rows) per generated chunk: memory is bounded by one chunk whatever the scale
+DEFAULT_CHUNK_ROWS = 100_000
+GEOLOCATION_CHUNK_ROWS = 1_000_000
+
+# state, capital, capital lat/lng, zip prefix range, customers, sellers
+STATES = (
+    ("SP", "São Paulo", -23.55, -46.63, 1000, 19999, 41746, 1849),
+    ("RJ", "Rio de Janeiro", -22.91, -43.17, 20000, 28999, 12852, 171),
+    ("MG", "Belo Horizonte", -19.92, -43.94, 30000, 39999, 11635, 244),
+    ("RS", "Porto Alegre", -30.03, -51.23, 90000, 99999, 5466, 129),
+    ("PR", "Curitiba", -25.43, -49.27, 80000, 87999, 5045, 349),
+    ("SC", "Florianópolis", -27.59, -48.55, 88000, 89999, 3637, 190),
+    ("BA", "Salvador", -12.97, -38.50, 40000, 48999, 3380, 19),
+    ("DF", "Brasília", -15.79, -47.88, 70000, 72799, 2140, 30),
+    ("ES", "Vitória", -20.32, -40.34, 29000, 29999, 2033, 23),
+    ("GO", "Goiânia", -16.69, -49.25, 72800, 76799, 2020, 40),
+    ("PE", "Recife", -8.05, -34.88, 50000, 56999, 1652, 9),
+    ("CE", "Fortaleza", -3.73, -38.52, 60000, 63999, 1336, 13),
+    ("PA", "Belém", -1.46, -48.49, 66000, 68899, 975, 1),
+    ("MT", "Cuiabá", -15.60, -56.10, 78000, 78899, 907, 4),
+    ("MA", "São Luís", -2.53, -44.30, 65000, 65999, 747, 1),
+    ("MS", "Campo Grande", -20.47, -54.62, 79000, 79999, 715, 5),
+    ("PB", "João Pessoa", -7.12, -34.86, 58000, 58999, 536, 6),
+    ("PI", "Teresina", -5.09, -42.80, 64000, 64999, 495, 1),
+    ("RN", "Natal", -5.79, -35.21, 59000, 59999, 485, 5),
+    ("AL", "Maceió", -9.67, -35.74, 57000, 57999, 413, 0),
+    ("SE", "Aracaju", -10.91, -37.07, 49000, 49999, 350, 2),
+    ("TO", "Palmas", -10.18, -48.33, 77000, 77999, 280, 0),
+    ("RO", "Porto Velho", -8.76, -63.90, 76800, 76999, 253, 2),
+    ("AM", "Manaus", -3.12, -60.02, 69000, 69299, 148, 1),
+    ("AC", "Rio Branco", -9.97, -67.81, 69900, 69999, 81, 1),
+    ("AP", "Macapá", 0.03, -51.07, 68900, 68999, 68, 0),
+    ("RR", "Boa Vista", 2.82, -60.67, 69300, 69399, 46, 0),
+)
+
+# Cities per state: the capital (index 0, most frequent) and smaller municipalities
+CITIES_PER_STATE = 120
+
+# Share of geolocation rows spelling the capital with accents ("são paulo" next to "sao paulo")
+ACCENTED_CITY_SHARE = 0.15
+
+# Share of geolocation points repeating their zip's exact coordinates (fully duplicated rows)
+DUPLICATE_POINT_SHARE = 0.3
+
+ORDER_STATUSES = {
+    "delivered": 96478, "shipped": 1107, "canceled": 625, "unavailable": 609,
+    "invoiced": 314, "processing": 301, "created": 5, "approved": 2,
+}
+
+# Items per order among orders with items (unavailable/created orders have none)
+ITEMS_PER_ORDER = {
+    1: 88863, 2: 7516, 3: 1322, 4: 505, 5: 204, 6: 198, 7: 22, 8: 8, 9: 3, 10: 8,
+    11: 4, 12: 5, 13: 1, 14: 2, 15: 2, 20: 2, 21: 1,
+}
+
+PAYMENT_TYPES = {"credit_card": 76795, "boleto": 19784, "voucher": 5775, "debit_card": 1529, "not_defined": 3}
+PAYMENTS_PER_ORDER = {1: 0.969, 2: 0.025, 3: 0.003, 4: 0.003}
+CREDIT_CARD_INSTALLMENTS = {1: 0.34, 2: 0.16, 3: 0.13, 4: 0.09, 5: 0.07, 6: 0.05, 7: 0.02, 8: 0.06, 10: 0.07, 12: 0.01}
+
+REVIEW_SCORES = {5: 57328, 4: 19142, 1: 11424, 3: 8179, 2: 3151}
+# Orders without review, and reviews repeated on the next order (same review_id and fields)
+MISSING_REVIEW_SHARE = 0.008
+DUPLICATE_REVIEW_SHARE = 0.006
+REVIEW_TITLE_SHARE = 0.117
+# Probability of a comment per score (~41% overall, low scores comment more)
+REVIEW_MESSAGE_SHARE = {5: 0.35, 4: 0.35, 3: 0.5, 2: 0.7, 1: 0.8}
+REVIEW_TITLES = {
+    5: ("Excelente", "Recomendo", "Super recomendo"),
+    4: ("Bom", "Gostei"),
+    3: ("Ok", "Razoável"),
+    2: ("Ruim", "Demorou"),
+    1: ("Péssimo", "Não recebi"),
+}
+REVIEW_MESSAGES = {
+    5: ("Produto excelente, chegou antes do prazo.", "Recomendo, ótimo vendedor!",
+        "Muito bom, tudo certinho.", "Adorei o produto, qualidade ótima."),
+    4: ("Bom produto.", "Chegou no prazo, gostei.", "Produto bom, mas a embalagem veio amassada."),
+    3: ("Produto ok, nada demais.", "Demorou um pouco mas chegou.", "Razoável pelo preço."),
+    2: ("Produto diferente do anunciado.", "Demorou muito para chegar.", "Não gostei da qualidade."),
+    1: ("Não recebi o produto.", "Produto com defeito, quero devolver.", "Péssimo, chegou quebrado.",
+        "Comprei dois e recebi apenas um."),
+}
+
+# (Portuguese, English); the first five carry the product counts of data_info.md
+CATEGORIES = (
+    ("cama_mesa_banho", "bed_bath_table"), ("esporte_lazer", "sports_leisure"),
+    ("moveis_decoracao", "furniture_decor"), ("beleza_saude", "health_beauty"),
+    ("utilidades_domesticas", "housewares"), ("automotivo", "auto"),
+    ("informatica_acessorios", "computers_accessories"), ("brinquedos", "toys"),
+    ("relogios_presentes", "watches_gifts"), ("telefonia", "telephony"), ("bebes", "baby"),
+    ("perfumaria", "perfumery"), ("fashion_bolsas_e_acessorios", "fashion_bags_accessories"),
+    ("papelaria", "stationery"), ("cool_stuff", "cool_stuff"), ("ferramentas_jardim", "garden_tools"),
+    ("pet_shop", "pet_shop"), ("eletronicos", "electronics"),
+    ("construcao_ferramentas_construcao", "construction_tools_construction"),
+    ("eletrodomesticos", "home_appliances"), ("malas_acessorios", "luggage_accessories"),
+    ("consoles_games", "consoles_games"), ("moveis_escritorio", "office_furniture"),
+    ("instrumentos_musicais", "musical_instruments"), ("eletroportateis", "small_appliances"),
+    ("casa_construcao", "home_construction"), ("livros_interesse_geral", "books_general_interest"),
+    ("alimentos", "food"), ("moveis_sala", "furniture_living_room"), ("casa_conforto", "home_confort"),
+    ("bebidas", "drinks"), ("audio", "audio"), ("market_place", "market_place"),
+    ("construcao_ferramentas_iluminacao", "construction_tools_lights"), ("climatizacao", "air_conditioning"),
+    ("moveis_cozinha_area_de_servico_jantar_e_jardim", "kitchen_dining_laundry_garden_furniture"),
+    ("alimentos_bebidas", "food_drink"), ("industria_comercio_e_negocios", "industry_commerce_and_business"),
+    ("livros_tecnicos", "books_technical"), ("telefonia_fixa", "fixed_telephony"),
+    ("fashion_calcados", "fashion_shoes"), ("eletrodomesticos_2", "home_appliances_2"),
+    ("construcao_ferramentas_jardim", "costruction_tools_garden"),
+    ("agro_industria_e_comercio", "agro_industry_and_commerce"), ("artes", "art"),
+    ("pcs", "computers"), ("sinalizacao_e_seguranca", "signaling_and_security"),
+    ("construcao_ferramentas_seguranca", "construction_tools_safety"),
+    ("artigos_de_natal", "christmas_supplies"), ("fashion_roupa_masculina", "fashion_male_clothing"),
+    ("moveis_quarto", "furniture_bedroom"), ("fashion_underwear_e_moda_praia", "fashion_underwear_beach"),
+    ("moveis_colchao_e_estofado", "furniture_mattress_and_upholstery"),
+    ("construcao_ferramentas_ferramentas", "costruction_tools_tools"),
+    ("tablets_impressao_imagem", "tablets_printing_image"), ("livros_importados", "books_imported"),
+    ("portateis_casa_forno_e_cafe", "small_appliances_home_oven_and_coffee"),
+    ("fashion_roupa_feminina", "fashio_female_clothing"), ("artigos_de_festas", "party_supplies"),
+    ("fashion_esporte", "fashion_sport"), ("musica", "music"), ("cine_foto", "cine_photo"),
+    ("la_cuisine", "la_cuisine"), ("casa_conforto_2", "home_comfort_2"),
+    ("dvds_blu_ray", "dvds_blu_ray"), ("cds_dvds_musicais", "cds_dvds_musicals"),
+    ("artes_e_artesanato", "arts_and_craftmanship"), ("fraldas_higiene", "diapers_and_hygiene"),
+    ("flores", "flowers"), ("fashion_roupa_infanto_juvenil", "fashion_childrens_clothes"),
+    ("seguros_e_servicos", "security_and_services"),
+)
+TOP_CATEGORY_PRODUCTS = (3029, 2867, 2657, 2444, 2335)
+# Products without category (and without name/description/photos)
+MISSING_CATEGORY_SHARE = 0.018
+
+# Purchases between these days, growing linearly over the period, with a weekly pattern
+FIRST_PURCHASE_DAY = np.datetime64("2016-09-04")
+LAST_PURCHASE_DAY = np.datetime64("2018-10-17")
+WEEKDAY_WEIGHTS = (1.12, 1.1, 1.06, 1.02, 0.96, 0.82, 0.92)  # Monday first
+
+# Customers placing more than one order: their customer_unique_id repeats an earlier one
+REPEAT_CUSTOMER_SHARE = 0.034
+
+# Salts keeping the id sequences of each entity apart
+SALT_CUSTOMER, SALT_UNIQUE, SALT_ORDER, SALT_PRODUCT, SALT_SELLER, SALT_REVIEW = 1, 2, 3, 4, 5, 6
+SALT_PRODUCT_SELLER, SALT_PRODUCT_PRICE, SALT_ZIP, SALT_CITY = 7, 8, 9, 10
+
+
+#--------------------------
+# Vectorized hashing
+#--------------------------
+
+_HEX_PAIRS = np.array([f"{value:02x}".encode("ascii") for value in range(256)], dtype="S2")
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_SECOND_STREAM = np.uint64(0xD1B54A32D192ED03)
+
+
+def splitmix64(values: np.ndarray) -> np.ndarray:
+    """
+    SplitMix64 finalizer over a uint64 array (a bijection: distinct inputs, distinct outputs).
+    """
+    with np.errstate(over="ignore"):
+        z = np.asarray(values, dtype=np.uint64) + _GOLDEN
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def _keys(salt: int, index: np.ndarray) -> np.ndarray:
+    return (np.uint64(salt) << np.uint64(40)) ^ np.asarray(index, dtype=np.uint64)
+
+
+def hex_ids(salt: int, index: np.ndarray) -> np.ndarray:
+    """
+    32-char hex ids (like Olist's) for entity indexes: deterministic, and unique per salt
+    because the first 64 bits are a bijection of (salt, index). Any chunk can compute the id
+    of any row (e.g. the product of an item) without a lookup table.
+    """
+    keys = _keys(salt, index)
+    words = np.stack([splitmix64(keys), splitmix64(keys ^ _SECOND_STREAM)], axis=1)
+    octets = words.astype(">u8").view(np.uint8).reshape(len(keys), 16)
+    return np.ascontiguousarray(_HEX_PAIRS[octets]).view("S32").ravel().astype(str)
+
+
+def hashed_uniform(salt: int, index: np.ndarray) -> np.ndarray:
+    """
+    Deterministic uniform [0, 1) value per index (a fixed attribute of an entity).
+    """
+    return (splitmix64(_keys(salt, index)) >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+#--------------------------
+# Helpers
+#--------------------------
+
+def _log_synthetic(message: str) -> None:
+    print(f"[SYNTH] {message}")
+
+
+def _probabilities(weights) -> np.ndarray:
+    weights = np.asarray(weights, dtype=np.float64)
+    return weights / weights.sum()
+
+
+_STATE_CODES = np.array([state[0] for state in STATES], dtype=object)
+_STATE_CENTERS = np.array([(state[2], state[3]) for state in STATES])
+_ZIP_RANGES = np.array([(state[4], state[5]) for state in STATES], dtype=np.int64)
+_CUSTOMER_STATE_P = _probabilities([state[6] for state in STATES])
+_SELLER_STATE_P = _probabilities([state[7] for state in STATES])
+
+# City names per (state, city index); index 0 is the capital, unaccented as in most raw rows
+_CITY_NAMES = np.array(
+    [
+        [normalize_text(state[1])] + [f"{normalize_text(state[1])} regiao {k:03d}" for k in range(1, CITIES_PER_STATE)]
+        for state in STATES
+    ],
+    dtype=object,
+)
+_ACCENTED_CAPITALS = np.array([state[1].lower() for state in STATES], dtype=object)
+
+_CATEGORY_NAMES = np.array([name for name, _ in CATEGORIES], dtype=object)
+_CATEGORY_P = _probabilities(
+    list(TOP_CATEGORY_PRODUCTS)
+    + [2000 * 0.93 ** k for k in range(len(CATEGORIES) - len(TOP_CATEGORY_PRODUCTS))]
+)
+
+_N_DAYS = int((LAST_PURCHASE_DAY - FIRST_PURCHASE_DAY).astype(int)) + 1
+_DAY_P = _probabilities(
+    np.linspace(0.2, 1.0, _N_DAYS)
+    * np.array(WEEKDAY_WEIGHTS)[(np.arange(_N_DAYS) + (FIRST_PURCHASE_DAY.astype(int) + 3)) % 7]
+)
+# Purchases by hour of day: quiet at night, peaking in the afternoon/evening
+_HOUR_P = _probabilities([2, 1, 0.5, 0.3, 0.3, 0.5, 1, 2, 4, 6, 7, 7, 6.5, 6.5, 7, 7, 7, 6.5, 6, 6, 6.5, 6.5, 6, 4])
+
+_STATUS_NAMES = np.array(list(ORDER_STATUSES), dtype=object)
+_STATUS_P = _probabilities(list(ORDER_STATUSES.values()))
+_N_ITEMS_VALUES = np.array(list(ITEMS_PER_ORDER), dtype=np.int64)
+_N_ITEMS_P = _probabilities(list(ITEMS_PER_ORDER.values()))
+_PAYMENT_TYPE_NAMES = np.array(list(PAYMENT_TYPES), dtype=object)
+_PAYMENT_TYPE_P = _probabilities(list(PAYMENT_TYPES.values()))
+_N_PAYMENTS_VALUES = np.array(list(PAYMENTS_PER_ORDER), dtype=np.int64)
+_N_PAYMENTS_P = _probabilities(list(PAYMENTS_PER_ORDER.values()))
+_INSTALLMENT_VALUES = np.array(list(CREDIT_CARD_INSTALLMENTS), dtype=np.int64)
+_INSTALLMENT_P = _probabilities(list(CREDIT_CARD_INSTALLMENTS.values()))
+_SCORE_VALUES = np.array(list(REVIEW_SCORES), dtype=np.int64)
+_SCORE_P = _probabilities(list(REVIEW_SCORES.values()))
+
+
+def _zip_prefixes(rng: np.random.Generator, state: np.ndarray) -> np.ndarray:
+    """
+    Zip prefixes inside each state's range, skewed towards the start of the range so
+    customers, sellers and geolocation points share the busy prefixes.
+    """
+    low, high = _ZIP_RANGES[state, 0], _ZIP_RANGES[state, 1]
+    return low + ((high - low + 1) * rng.random(len(state)) ** 3).astype(np.int64)
+
+
+def _cities(state: np.ndarray, zip_prefix: np.ndarray) -> np.ndarray:
+    """
+    City of each zip prefix: a fixed function of the prefix, so every table agrees.
+    """
+    city = (CITIES_PER_STATE * hashed_uniform(SALT_CITY, zip_prefix) ** 4).astype(np.int64)
+    return _CITY_NAMES[state, city]
+
+
+def _expand(counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Parent index of every child row and the child's 1-based position within its parent.
+    """
+    parent = np.repeat(np.arange(len(counts)), counts)
+    starts = np.cumsum(counts) - counts
+    return parent, np.arange(len(parent)) - starts[parent] + 1
+
+
+class _CsvWriter:
+    """
+    Appends chunks to one CSV file, header written with the first chunk.
+    """
+
+    def __init__(self, path: Path, columns: list[str]) -> None:
+        self.columns = columns
+        self.n_rows = 0
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._file.write(",".join(columns) + "\n")
+
+    def write(self, df: pd.DataFrame) -> None:
+        df[self.columns].to_csv(self._file, header=False, index=False, date_format=TIMESTAMP_FORMAT)
+        self.n_rows += len(df)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+#--------------------------
+# Table generators
+#--------------------------
+# Each generator builds one chunk with vectorized sampling. Rows that reference other
+# tables compute the referenced ids with hex_ids(), so no id list is ever kept in memory.
+
+def _categories() -> pd.DataFrame:
+    return pd.DataFrame(CATEGORIES, columns=CSV_COLUMNS["categories"])
+
+
+def _sellers(rng: np.random.Generator, start: int, stop: int) -> pd.DataFrame:
+    state = rng.choice(len(STATES), stop - start, p=_SELLER_STATE_P)
+    zip_prefix = _zip_prefixes(rng, state)
+    return pd.DataFrame({
+        "seller_id": hex_ids(SALT_SELLER, np.arange(start, stop)),
+        "seller_zip_code_prefix": zip_prefix,
+        "seller_city": _cities(state, zip_prefix),
+        "seller_state": _STATE_CODES[state],
+    })
+
+
+def _products(rng: np.random.Generator, start: int, stop: int) -> pd.DataFrame:
+    n = stop - start
+    category = _CATEGORY_NAMES[rng.choice(len(CATEGORIES), n, p=_CATEGORY_P)]
+    missing = rng.random(n) < MISSING_CATEGORY_SHARE
+    category[missing] = None
+
+    def described(values: np.ndarray) -> np.ndarray:
+        # Name, description and photos are missing together with the category
+        return np.where(missing, np.nan, values)
+
+    return pd.DataFrame({
+        "product_id": hex_ids(SALT_PRODUCT, np.arange(start, stop)),
+        "product_category_name": category,
+        "product_name_lenght": described(rng.integers(20, 77, n)),
+        "product_description_lenght": described(np.round(rng.lognormal(np.log(600), 0.7, n)).clip(4, 3992)),
+        "product_photos_qty": described(rng.geometric(0.55, n).clip(max=20)),
+        "product_weight_g": np.round(rng.lognormal(np.log(700), 1.1, n)).clip(0, 40425),
+        "product_length_cm": rng.integers(7, 106, n).astype(np.float64),
+        "product_height_cm": rng.integers(2, 106, n).astype(np.float64),
+        "product_width_cm": rng.integers(6, 119, n).astype(np.float64),
+    })
+
+
+def _geolocation(rng: np.random.Generator, n: int) -> pd.DataFrame:
+    """
+    Points scattered around a fixed location per zip prefix; DUPLICATE_POINT_SHARE of them
+    repeat the zip's location exactly, and capitals are sometimes spelled with accents.
+    """
+    state = rng.choice(len(STATES), n, p=_CUSTOMER_STATE_P)
+    zip_prefix = _zip_prefixes(rng, state)
+    center_lat = _STATE_CENTERS[state, 0] + 3.0 * (hashed_uniform(SALT_ZIP, zip_prefix) - 0.5)
+    center_lng = _STATE_CENTERS[state, 1] + 3.0 * (hashed_uniform(SALT_ZIP + 100, zip_prefix) - 0.5)
+    jitter = (rng.random(n) >= DUPLICATE_POINT_SHARE)[:, None] * rng.normal(0.0, 0.01, (n, 2))
+
+    city = _cities(state, zip_prefix)
+    accented = (city == _CITY_NAMES[state, 0]) & (rng.random(n) < ACCENTED_CITY_SHARE)
+    city[accented] = _ACCENTED_CAPITALS[state[accented]]
+    return pd.DataFrame({
+        "geolocation_zip_code_prefix": zip_prefix,
+        "geolocation_lat": np.round(center_lat + jitter[:, 0], 8),
+        "geolocation_lng": np.round(center_lng + jitter[:, 1], 8),
+        "geolocation_city": city,
+        "geolocation_state": _STATE_CODES[state],
+    })
+
+
+def _seconds(days: np.ndarray) -> np.ndarray:
+    return (days * 86400).astype("timedelta64[s]")
+
+
+def _orders(rng: np.random.Generator, start: int, stop: int, n_products: int,
+            n_sellers: int) -> dict[str, pd.DataFrame]:
+    """
+    Orders [start, stop) with their customer (one per order, as in Olist), items, payments
+    and reviews.
+    """
+    n = stop - start
+    index = np.arange(start, stop, dtype=np.int64)
+    order_id = hex_ids(SALT_ORDER, index)
+    customer_id = hex_ids(SALT_CUSTOMER, index)
+
+    # Customers: a few are repeat buyers sharing an earlier customer_unique_id
+    repeat = rng.random(n) < REPEAT_CUSTOMER_SHARE
+    unique_index = np.where(repeat, np.maximum(index - rng.integers(1, 50_000, n), 0), index)
+    state = rng.choice(len(STATES), n, p=_CUSTOMER_STATE_P)
+    zip_prefix = _zip_prefixes(rng, state)
+    customers = pd.DataFrame({
+        "customer_id": customer_id,
+        "customer_unique_id": hex_ids(SALT_UNIQUE, unique_index),
+        "customer_zip_code_prefix": zip_prefix,
+        "customer_city": _cities(state, zip_prefix),
+        "customer_state": _STATE_CODES[state],
+    })
+
+    # Orders: purchase time, status and the status-dependent milestones
+    day = rng.choice(_N_DAYS, n, p=_DAY_P)
+    second_of_day = rng.choice(24, n, p=_HOUR_P) * 3600 + rng.integers(0, 3600, n)
+    purchase = FIRST_PURCHASE_DAY.astype("datetime64[s]") + _seconds(day) + second_of_day.astype("timedelta64[s]")
+    status = _STATUS_NAMES[rng.choice(len(_STATUS_NAMES), n, p=_STATUS_P)]
+
+    nat = np.datetime64("NaT", "s")
+    approved = purchase + _seconds(rng.exponential(0.4, n))
+    approved[(status == "created") | (rng.random(n) < 0.0015)] = nat
+    shipped = np.isin(status, ("delivered", "shipped"))
+    carrier = np.where(shipped, purchase + _seconds(1 + rng.gamma(2.0, 1.2, n)), nat)
+    delivered = np.where(status == "delivered", carrier + _seconds(1 + rng.gamma(2.0, 4.0, n)), nat)
+    estimated = (purchase.astype("datetime64[D]") + rng.integers(15, 40, n)).astype("datetime64[s]")
+    orders = pd.DataFrame({
+        "order_id": order_id,
+        "customer_id": customer_id,
+        "order_status": status,
+        "order_purchase_timestamp": purchase,
+        "order_approved_at": approved,
+        "order_delivered_carrier_date": carrier,
+        "order_delivered_customer_date": delivered,
+        "order_estimated_delivery_date": estimated,
+    })
+
+    # Items: products skewed towards the popular ones, each product sold by one seller
+    n_items = np.where(
+        np.isin(status, ("unavailable", "created")), 0, _N_ITEMS_VALUES[rng.choice(len(_N_ITEMS_VALUES), n, p=_N_ITEMS_P)]
+    )
+    item_order, item_number = _expand(n_items)
+    n_item_rows = len(item_order)
+    popular = (n_products * rng.random(n_item_rows) ** 1.8).astype(np.int64)
+    product = np.where(rng.random(n_item_rows) < 0.5, popular, rng.integers(0, n_products, n_item_rows))
+    seller = (n_sellers * hashed_uniform(SALT_PRODUCT_SELLER, product) ** 2).astype(np.int64)
+    # Fixed price per product (log-normal around R$ 75), from two hashed uniforms (Box-Muller)
+    u1 = np.maximum(hashed_uniform(SALT_PRODUCT_PRICE, product), 1e-12)
+    u2 = hashed_uniform(SALT_PRODUCT_PRICE + 100, product)
+    price = np.round(np.exp(np.log(75) + 0.9 * np.sqrt(-2 * np.log(u1)) * np.cos(2 * np.pi * u2)), 2).clip(0.85, 6735)
+    freight = np.round(rng.lognormal(np.log(16), 0.5, n_item_rows), 2).clip(0, 409.68)
+    items = pd.DataFrame({
+        "order_id": order_id[item_order],
+        "order_item_id": item_number,
+        "product_id": hex_ids(SALT_PRODUCT, product),
+        "seller_id": hex_ids(SALT_SELLER, seller),
+        "shipping_limit_date": purchase[item_order] + _seconds(6 + rng.random(n_item_rows)),
+        "price": price,
+        "freight_value": freight,
+    })
+
+    # Payments: the order total, split when an order has several payments (vouchers)
+    total = np.bincount(item_order, weights=price + freight, minlength=n)
+    total = np.where(n_items > 0, total, np.round(rng.lognormal(np.log(100), 0.8, n), 2))
+    n_payments = _N_PAYMENTS_VALUES[rng.choice(len(_N_PAYMENTS_VALUES), n, p=_N_PAYMENTS_P)]
+    payment_order, sequential = _expand(n_payments)
+    n_payment_rows = len(payment_order)
+    payment_type = _PAYMENT_TYPE_NAMES[rng.choice(len(_PAYMENT_TYPE_NAMES), n_payment_rows, p=_PAYMENT_TYPE_P)]
+    payment_type[sequential > 1] = "voucher"
+    installments = np.where(
+        payment_type == "credit_card",
+        _INSTALLMENT_VALUES[rng.choice(len(_INSTALLMENT_VALUES), n_payment_rows, p=_INSTALLMENT_P)],
+        1,
+    )
+    share = np.round(total[payment_order] / n_payments[payment_order], 2)
+    last = sequential == n_payments[payment_order]
+    value = np.where(last, np.round(total[payment_order] - share * (n_payments[payment_order] - 1), 2), share)
+    payments = pd.DataFrame({
+        "order_id": order_id[payment_order],
+        "payment_sequential": sequential,
+        "payment_type": payment_type,
+        "payment_installments": installments,
+        "payment_value": value,
+    })
+
+    # Reviews: most orders have one; some reviews are repeated on the next order
+    reviewed = np.flatnonzero(rng.random(n) >= MISSING_REVIEW_SHARE)
+    m = len(reviewed)
+    duplicate = rng.random(m) < DUPLICATE_REVIEW_SHARE
+    duplicate[:1] = False
+    source = np.maximum.accumulate(np.where(duplicate, 0, np.arange(m)))
+
+    score = _SCORE_VALUES[rng.choice(len(_SCORE_VALUES), m, p=_SCORE_P)]
+    title = np.full(m, None, dtype=object)
+    message = np.full(m, None, dtype=object)
+    for value_score, share_message in REVIEW_MESSAGE_SHARE.items():
+        scored = score == value_score
+        has_title = scored & (rng.random(m) < REVIEW_TITLE_SHARE)
+        has_message = scored & (rng.random(m) < share_message)
+        titles, messages = np.array(REVIEW_TITLES[value_score], dtype=object), np.array(REVIEW_MESSAGES[value_score], dtype=object)
+        title[has_title] = titles[rng.integers(0, len(titles), int(has_title.sum()))]
+        message[has_message] = messages[rng.integers(0, len(messages), int(has_message.sum()))]
+
+    arrival = np.where(np.isnat(delivered[reviewed]), estimated[reviewed], delivered[reviewed])
+    created = (arrival.astype("datetime64[D]") + 1).astype("datetime64[s]")
+    answered = created + _seconds(rng.exponential(2.0, m))
+    reviews = pd.DataFrame({
+        "review_id": hex_ids(SALT_REVIEW, index[reviewed])[source],
+        "order_id": order_id[reviewed],
+        "review_score": score[source],
+        "review_comment_title": title[source],
+        "review_comment_message": message[source],
+        "review_creation_date": created[source],
+        "review_answer_timestamp": answered[source],
+    })
+
+    return {"customers": customers, "orders": orders, "items": items, "payments": payments, "reviews": reviews}
+
+
+#--------------------------
+# Public API
+#--------------------------
+
+def generate(output_dir: Path | None = None, scale: float = 1.0, seed: int = 42,
+             chunk_rows: int = DEFAULT_CHUNK_ROWS) -> dict[str, int]:
+    """
+    Write the nine Olist CSVs at a scale factor (1 = the public dataset's size).
+
+    - Orders, customers, products, sellers and geolocation rows scale linearly; categories do not
+    - Every table is streamed in chunks (chunk_rows orders, GEOLOCATION_CHUNK_ROWS points),
+      so memory stays flat from 1x to 100x
+    - Chunk k of a table always uses the seed sequence (seed, table, k): the output only
+      depends on seed, scale and chunk_rows
+    - Foreign keys always resolve: referenced ids are recomputed from the entity index
+    Load the result with raw_to_db.load_all_raw(engine, data_dir=<output_dir>).
+    Returns {table: rows written}.
+    """
+    output_dir = output_dir or SYNTHETIC_DATA_DIRECTORY / f"sf{scale:g}"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    n_rows = {table: max(1, round(rows * scale)) for table, rows in BASE_ROWS.items()}
+    writers = {table: _CsvWriter(output_dir / RAW_CSV_FILES[table], CSV_COLUMNS[table]) for table in RAW_CSV_FILES}
+    started = time.perf_counter()
+
+    def chunks(total: int, size: int):
+        for chunk, chunk_start in enumerate(range(0, total, size)):
+            yield chunk, chunk_start, min(chunk_start + size, total)
+
+    try:
+        writers["categories"].write(_categories())
+        for chunk, start, stop in chunks(n_rows["sellers"], chunk_rows):
+            writers["sellers"].write(_sellers(np.random.default_rng([seed, 1, chunk]), start, stop))
+        for chunk, start, stop in chunks(n_rows["products"], chunk_rows):
+            writers["products"].write(_products(np.random.default_rng([seed, 2, chunk]), start, stop))
+        for chunk, start, stop in chunks(n_rows["geolocation"], GEOLOCATION_CHUNK_ROWS):
+            writers["geolocation"].write(_geolocation(np.random.default_rng([seed, 3, chunk]), stop - start))
+        for chunk, start, stop in chunks(n_rows["orders"], chunk_rows):
+            frames = _orders(np.random.default_rng([seed, 4, chunk]), start, stop, n_rows["products"], n_rows["sellers"])
+            for table, df in frames.items():
+                writers[table].write(df)
+            _log_synthetic(f"orders {stop:,}/{n_rows['orders']:,} ({time.perf_counter() - started:.0f}s)")
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    written = {table: writer.n_rows for table, writer in writers.items()}
+    _log_synthetic(
+        f"scale {scale:g} -> {output_dir} in {time.perf_counter() - started:.1f}s: "
+        + ", ".join(f"{table} {rows:,}" for table, rows in written.items())
+    )
+    return written
+
+
+#--------------------------
+# Main
+#--------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate Olist-shaped CSVs at a scale factor.")
+    parser.add_argument("--scale", type=float, default=1.0, help="1 = public dataset size (~100k orders)")
+    parser.add_argument("--output", type=Path, default=None, help="Default: data/synthetic/sf<scale>")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    generate(args.output, args.scale, args.seed, args.chunk_rows)
+
+if __name__ == "__main__":
+    main()
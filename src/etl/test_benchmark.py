@@ -0,0 +1,36 @@
+from __future__ import annotations
+from src.db.schema import load_schema
+from src.etl.benchmark import RESET_TABLES, compare_results
+
+
+def _report(*rows: tuple[str, float, float]) -> dict:
+    return {"results": [{"scale": 1.0, "stage": stage, "wall_s": wall_s, "peak_rss_mb": rss} for stage, wall_s, rss in rows]}
+
+
+def test_compare_results_flags_slowdowns_above_threshold_and_noise_floor() -> None:
+    baseline = _report(("load_items", 10.0, 500.0), ("build_stg_items", 0.2, 300.0), ("build_dim_date", 4.0, 300.0))
+    current = _report(
+        ("load_items", 12.0, 520.0),        # +20% time: regression; +20 MB RSS: under the floor
+        ("build_stg_items", 0.5, 300.0),    # +150% but only 0.3s: noise
+        ("build_dim_date", 4.3, 600.0),     # +7.5% time: fine; +300 MB RSS: regression
+        ("build_fact_orders", 99.0, 900.0), # not in the baseline
+    )
+
+    regressions = compare_results(current, baseline, threshold=0.15)
+
+    assert [(row["stage"], row["metric"]) for row in regressions] == [
+        ("load_items", "wall_s"),
+        ("build_dim_date", "peak_rss_mb"),
+    ]
+    assert regressions[0]["change"] == 0.2
+
+
+def test_reset_tables_include_every_table_referencing_them() -> None:
+    # TRUNCATE without CASCADE fails on an unlisted referencing table; catch it before a run
+    referencing = {
+        table.name
+        for table in load_schema().values()
+        for fk in table.foreign_keys
+        if fk.ref_table in RESET_TABLES
+    }
+    assert referencing <= set(RESET_TABLES)
@@ -0,0 +1,221 @@
+from __future__ import annotations
+from decimal import Decimal
+from sqlalchemy import text
+from src.db.engine import get_engine
+from src.etl.build_marts import (
+    ALL_LABEL, DATE_CONSUMERS, FACT_DAILY_DEMAND, build_fact_daily_demand, build_fact_orders,
+)
+from src.etl.build_staging import build_all_staging
+from src.etl.raw_to_db import RAW_DATA_DIRECTORY, load_all_raw
+from src.etl.test_raw_to_db import _skip_without_db, _truncate_raw_tables
+
+
+def _build_from_raw() -> None:
+    """
+    Fresh raw load, staging and fact_orders, with an empty change log and no dirty dates.
+    """
+    engine = get_engine()
+    _truncate_raw_tables()
+    load_all_raw(engine, RAW_DATA_DIRECTORY)
+    build_all_staging(engine)
+    build_fact_orders(engine)
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE TABLE etl_order_changes, etl_dirty_dates"))
+
+
+def _bump_item_price(exclude_order_id: str | None = None) -> tuple[str, int]:
+    """
+    Add 100 to the price of one item of a dated order (other than exclude_order_id) in raw items.
+    Returns (order_id, order_item_id).
+    """
+    engine = get_engine()
+    with engine.begin() as conn:
+        row = conn.execute(
+            text(
+                """
+                SELECT i.order_id, i.order_item_id
+                FROM items AS i
+                JOIN stg_orders AS o ON o.order_id = i.order_id
+                WHERE o.order_date IS NOT NULL
+                  AND (CAST(:exclude AS TEXT) IS NULL OR i.order_id <> :exclude)
+                ORDER BY i.order_id, i.order_item_id
+                LIMIT 1
+                """
+            ),
+            {"exclude": exclude_order_id},
+        ).one()
+        conn.execute(
+            text("UPDATE items SET price = price + 100 WHERE order_id = :order_id AND order_item_id = :item_id"),
+            {"order_id": row.order_id, "item_id": row.order_item_id},
+        )
+    return row.order_id, row.order_item_id
+
+
+def _fact_price_sum(order_id: str) -> Decimal:
+    engine = get_engine()
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT items_price_sum FROM fact_orders WHERE order_id = :order_id"), {"order_id": order_id},
+        ).scalar_one()
+
+
+def _demand_rows() -> list[tuple]:
+    engine = get_engine()
+    key = ", ".join(FACT_DAILY_DEMAND.unique_key)
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(text(f"SELECT * FROM fact_daily_demand ORDER BY {key}"))]
+
+
+def test_incremental_fact_orders_applies_a_raw_item_change() -> None:
+    """
+    raw change -> staging rebuild -> incremental refresh updates the fact row and queues
+    the order's date for the daily models.
+    """
+    engine = get_engine()
+    _skip_without_db()
+
+    _build_from_raw()
+    order_id, _ = _bump_item_price()
+    price_before = _fact_price_sum(order_id)
+
+    build_all_staging(engine)
+    build_fact_orders(engine, incremental=True)
+
+    assert _fact_price_sum(order_id) == price_before + 100
+    with engine.connect() as conn:
+        dirty = conn.execute(
+            text(
+                """
+                SELECT d.model_name
+                FROM etl_dirty_dates AS d
+                JOIN fact_orders AS f ON f.order_date = d.order_date
+                WHERE f.order_id = :order_id
+                """
+            ),
+            {"order_id": order_id},
+        ).scalars().all()
+        assert sorted(dirty) == sorted(DATE_CONSUMERS)
+        assert conn.execute(text("SELECT COUNT(*) FROM etl_order_changes")).scalar_one() == 0
+
+
+def test_incremental_fact_orders_keeps_changes_logged_after_staging() -> None:
+    """
+    A change made after the staging build is not in stg_items yet: it stays in the change
+    log and is applied by the refresh following the next staging build.
+    """
+    engine = get_engine()
+    _skip_without_db()
+
+    _build_from_raw()
+    first_order, _ = _bump_item_price()
+    build_all_staging(engine)
+    late_order, _ = _bump_item_price(exclude_order_id=first_order)
+    late_price = _fact_price_sum(late_order)
+
+    build_fact_orders(engine, incremental=True)
+
+    assert _fact_price_sum(late_order) == late_price
+    with engine.connect() as conn:
+        queued = conn.execute(text("SELECT DISTINCT order_id FROM etl_order_changes")).scalars().all()
+    assert queued == [late_order]
+
+    build_all_staging(engine)
+    build_fact_orders(engine, incremental=True)
+    assert _fact_price_sum(late_order) == late_price + 100
+
+
+def test_demand_rollups_equal_the_sum_of_their_leaves() -> None:
+    """
+    Every '__all__' row of the cube equals the sum of the leaf rows it rolls up
+    (n_orders is a distinct count: at most the sum, an order can span several leaves).
+    """
+    engine = get_engine()
+    _skip_without_db()
+
+    _build_from_raw()
+    build_fact_daily_demand(engine)
+
+    with engine.connect() as conn:
+        n_rollups, n_mismatches = conn.execute(
+            text(
+                """
+                WITH leaves AS (
+                    SELECT * FROM fact_daily_demand
+                    WHERE product_category_name <> :all_label AND customer_state <> :all_label
+                ),
+                expected AS (
+                    SELECT order_date, product_category_name, CAST(:all_label AS TEXT) AS customer_state,
+                           SUM(n_orders) AS n_orders_max, SUM(n_items) AS n_items, SUM(items_revenue) AS items_revenue,
+                           SUM(freight_revenue) AS freight_revenue, SUM(gross_revenue) AS gross_revenue
+                    FROM leaves GROUP BY order_date, product_category_name
+                    UNION ALL
+                    SELECT order_date, CAST(:all_label AS TEXT), customer_state,
+                           SUM(n_orders), SUM(n_items), SUM(items_revenue), SUM(freight_revenue), SUM(gross_revenue)
+                    FROM leaves GROUP BY order_date, customer_state
+                    UNION ALL
+                    SELECT order_date, CAST(:all_label AS TEXT), CAST(:all_label AS TEXT),
+                           SUM(n_orders), SUM(n_items), SUM(items_revenue), SUM(freight_revenue), SUM(gross_revenue)
+                    FROM leaves GROUP BY order_date
+                ),
+                rollups AS (
+                    SELECT * FROM fact_daily_demand
+                    WHERE product_category_name = :all_label OR customer_state = :all_label
+                )
+                SELECT
+                    COUNT(r.order_date),
+                    COUNT(*) FILTER (
+                        WHERE r.order_date IS NULL OR e.order_date IS NULL
+                           OR r.n_items <> e.n_items
+                           OR r.items_revenue <> e.items_revenue
+                           OR r.freight_revenue <> e.freight_revenue
+                           OR r.gross_revenue <> e.gross_revenue
+                           OR r.n_orders > e.n_orders_max
+                    )
+                FROM rollups AS r
+                FULL JOIN expected AS e
+                  USING (order_date, product_category_name, customer_state)
+                """
+            ),
+            {"all_label": ALL_LABEL},
+        ).one()
+
+    assert n_rollups > 0
+    assert n_mismatches == 0
+
+
+def test_incremental_demand_matches_a_full_build() -> None:
+    """
+    Refreshing the cube over the dirty dates of a raw change (a price change and an order
+    moved to the next day) gives exactly the rows of a full build.
+    """
+    engine = get_engine()
+    _skip_without_db()
+
+    _build_from_raw()
+    build_fact_daily_demand(engine)
+    rows_before = _demand_rows()
+
+    order_id, _ = _bump_item_price()
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                """
+                UPDATE orders SET order_purchase_timestamp = order_purchase_timestamp + INTERVAL '1 day'
+                WHERE order_id = (
+                    SELECT order_id FROM orders
+                    WHERE order_id <> :order_id AND order_status <> 'canceled'
+                    ORDER BY order_id LIMIT 1
+                )
+                """
+            ),
+            {"order_id": order_id},
+        )
+    build_all_staging(engine)
+    build_fact_orders(engine, incremental=True)
+    build_fact_daily_demand(engine, incremental=True)
+    incremental_rows = _demand_rows()
+
+    build_fact_daily_demand(engine)
+
+    assert incremental_rows != rows_before
+    assert incremental_rows == _demand_rows()
@@ -0,0 +1,65 @@
+from __future__ import annotations
+import pytest
+from sqlalchemy import text
+from src.db.engine import get_engine
+from src.etl import fast_load
+from src.etl.fast_load import fast_load_all_raw
+from src.etl.raw_to_db import RAW_DATA_DIRECTORY, RAW_LOADERS
+from src.etl.test_raw_to_db import _skip_without_db, _truncate_raw_tables
+
+
+def _schema_objects() -> set[tuple[str, str, bool]]:
+    """
+    (name, definition, validated) of every index and constraint on the raw tables.
+    """
+    engine = get_engine()
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                """
+                SELECT c.conname, pg_get_constraintdef(c.oid), c.convalidated
+                FROM pg_constraint AS c
+                WHERE c.conrelid IN (SELECT to_regclass(name) FROM unnest(CAST(:tables AS TEXT[])) AS name)
+                UNION ALL
+                SELECT i.relname, pg_get_indexdef(x.indexrelid), TRUE
+                FROM pg_index AS x
+                JOIN pg_class AS i ON i.oid = x.indexrelid
+                WHERE x.indrelid IN (SELECT to_regclass(name) FROM unnest(CAST(:tables AS TEXT[])) AS name)
+                """
+            ),
+            {"tables": list(RAW_LOADERS)},
+        ).all()
+    return {tuple(row) for row in rows}
+
+
+def test_fast_load_restores_the_exact_schema() -> None:
+    """
+    Indexes and FKs dropped for the load come back identical and validated.
+    """
+    engine = get_engine()
+    _skip_without_db()
+
+    before = _schema_objects()
+    _truncate_raw_tables()
+    phases = fast_load_all_raw(engine, RAW_DATA_DIRECTORY)
+
+    assert set(phases) == {"drop", "load", "indexes", "foreign_keys"}
+    assert _schema_objects() == before
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM etl_deferred_ddl")).scalar_one() == 0
+
+
+def test_failed_restore_does_not_hide_the_load_error(monkeypatch, capsys) -> None:
+    def fail_load(*args, **kwargs):
+        raise ValueError("bad row")
+
+    def fail_restore(*args, **kwargs):
+        raise RuntimeError("FK validation failed")
+
+    monkeypatch.setattr(fast_load, "defer_constraints", lambda engine: 0)
+    monkeypatch.setattr(fast_load, "load_all_raw", fail_load)
+    monkeypatch.setattr(fast_load, "restore_deferred_ddl", fail_restore)
+
+    with pytest.raises(ValueError, match="bad row"):
+        fast_load_all_raw(None)
+    assert "RuntimeError: FK validation failed" in capsys.readouterr().out
@@ -0,0 +1,64 @@
+from __future__ import annotations
+import logging
+import pytest
+from src.etl.instrument import (
+    _HANDLER_MARK, LOGGER_NAME, REGISTRY, _stage_logger, instrumented, record_bytes_read, record_rows, stage,
+)
+
+
+def _sample(name: str, **labels: str) -> float | None:
+    return REGISTRY.get_sample_value(name, labels)
+
+
+def test_stage_reports_rows_and_bytes_to_the_innermost_stage() -> None:
+    with stage("pipeline", "test_outer") as outer:
+        with stage("load", "test_inner") as inner:
+            record_rows(120)
+            record_bytes_read(4096)
+        record_rows(5)
+
+    assert (inner.rows, inner.bytes_read, inner.status) == (120, 4096, "ok")
+    assert outer.rows == 5
+    assert _sample("etl_stage_rows_total", group="load", stage="test_inner") == 120
+    assert _sample("etl_stage_read_bytes_total", group="load", stage="test_inner") == 4096
+    assert _sample("etl_stage_runs_total", group="load", stage="test_inner", status="ok") == 1
+    assert _sample("etl_stage_duration_seconds_count", group="load", stage="test_inner") == 1
+
+
+def test_failing_stage_is_counted_and_logged_as_error(tmp_path, monkeypatch) -> None:
+    records: list[logging.LogRecord] = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logging.getLogger(LOGGER_NAME).addHandler(handler)
+    monkeypatch.setenv("ETL_METRICS_TEXTFILE", str(tmp_path / "etl.prom"))
+
+    @instrumented("mart")
+    def build_test_failing() -> None:
+        record_rows(3)
+        raise ValueError("boom")
+
+    try:
+        with pytest.raises(ValueError):
+            build_test_failing()
+    finally:
+        logging.getLogger(LOGGER_NAME).removeHandler(handler)
+
+    assert _sample("etl_stage_runs_total", group="mart", stage="build_test_failing", status="error") == 1
+    assert records[-1].status == "error" and records[-1].rows == 3
+    assert "ValueError: boom" in records[-1].error
+    assert 'stage="build_test_failing"' in (tmp_path / "etl.prom").read_text()
+
+
+def test_stage_logger_installs_its_handler_next_to_foreign_ones() -> None:
+    foreign = logging.Handler()
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.addHandler(foreign)
+    try:
+        _stage_logger()
+        _stage_logger()
+        marked = [handler for handler in logger.handlers if getattr(handler, _HANDLER_MARK, False)]
+        assert len(marked) == 1
+        assert foreign in logger.handlers
+        assert logger.level == logging.INFO and not logger.propagate
+    finally:
+        logger.removeHandler(foreign)
@@ -0,0 +1,41 @@
+from __future__ import annotations
+from contextlib import contextmanager
+import numpy as np
+from src.etl.keys import KeyDecoder
+
+
+class _FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class _FakeEngine:
+    """
+    Minimal engine returning fixed key table rows and counting queries.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.n_queries = 0
+
+    @contextmanager
+    def connect(self):
+        yield self
+
+    def execute(self, statement):
+        self.n_queries += 1
+        return _FakeResult(self.rows)
+
+
+def test_key_decoder_loads_lazily_once_and_keeps_gaps():
+    engine = _FakeEngine([(1, "a" * 32), (2, "b" * 32), (4, "d" * 32)])
+    decoder = KeyDecoder(engine, "order_sk")
+    assert engine.n_queries == 0
+
+    decoded = decoder.decode(np.array([4, 1, 1], dtype=np.int32))
+    assert list(decoded) == ["d" * 32, "a" * 32, "a" * 32]
+    assert decoder.decode([3])[0] is None
+    assert engine.n_queries == 1
@@ -0,0 +1,51 @@
+from __future__ import annotations
+from pathlib import Path
+from src.etl.build_marts import DATE_CONSUMERS
+from src.etl.pipeline import PipelineStage, pipeline_stages, stage_fingerprints
+
+
+def _noop() -> None:
+    return None
+
+
+def _stages(orders_sql_hash: str = "sql-v1") -> dict[str, PipelineStage]:
+    return {
+        "load_customers": PipelineStage("load_customers", _noop, sources=(Path("customers.csv"),)),
+        "load_orders": PipelineStage("load_orders", _noop, ("load_customers",), sources=(Path("orders.csv"),)),
+        "build_stg_customers": PipelineStage("build_stg_customers", _noop, ("load_customers",), sql_hash="sql-c"),
+        "build_stg_orders": PipelineStage("build_stg_orders", _noop, ("load_orders",), sql_hash=orders_sql_hash),
+        "build_fact_orders": PipelineStage(
+            "build_fact_orders", _noop, ("build_stg_customers", "build_stg_orders"), sql_hash="sql-f",
+            options=(("incremental", True),),
+        ),
+    }
+
+
+def test_fingerprints_change_only_downstream_of_a_change() -> None:
+    files = {"customers.csv": "c1", "orders.csv": "o1"}
+    before = stage_fingerprints(_stages(), file_hash=lambda path: files[path.name])
+
+    files["orders.csv"] = "o2"
+    after = stage_fingerprints(_stages(), file_hash=lambda path: files[path.name])
+
+    assert after == stage_fingerprints(_stages(), file_hash=lambda path: files[path.name])
+    changed = {name for name in before if before[name] != after[name]}
+    assert changed == {"load_orders", "build_stg_orders", "build_fact_orders"}
+
+
+def test_sql_change_invalidates_the_model_and_its_consumers() -> None:
+    before = stage_fingerprints(_stages(), file_hash=lambda path: "same")
+    after = stage_fingerprints(_stages(orders_sql_hash="sql-v2"), file_hash=lambda path: "same")
+
+    changed = {name for name in before if before[name] != after[name]}
+    assert changed == {"build_stg_orders", "build_fact_orders"}
+
+
+def test_date_consumers_run_after_fact_orders() -> None:
+    # Engines are only bound into the stage callables, never used to build the graph
+    stages = pipeline_stages(None, None)
+
+    for model_name in DATE_CONSUMERS:
+        assert "build_fact_orders" in stages[f"build_{model_name}"].upstream
+    assert "build_fact_daily_orders" in stages["build_dim_date"].upstream
+    assert "build_stg_items" in stages["build_fact_orders"].upstream
@@ -0,0 +1,52 @@
+from __future__ import annotations
+from dataclasses import replace
+from src.etl.plans import compare_plans, summarize_plan
+
+
+def _node(node_type: str, plan_rows: int, actual_rows: int, children: list[dict] = (), **extra) -> dict:
+    return {
+        "Node Type": node_type, "Plan Rows": plan_rows, "Actual Rows": actual_rows, "Actual Loops": 1,
+        "Total Cost": 100.0, "Plans": list(children), **extra,
+    }
+
+
+EXPLAIN = [{
+    "Plan": _node(
+        "Hash Join", 1000, 1000,
+        [_node("Seq Scan", 1000, 1000, **{"Relation Name": "stg_orders"}),
+         _node("Hash", 10, 5000, [_node("Seq Scan", 10, 5000, **{"Relation Name": "stg_items"})])],
+        **{"Shared Hit Blocks": 400, "Shared Read Blocks": 100},
+    ),
+    "Planning Time": 1.5,
+    "Execution Time": 250.0,
+}]
+
+
+def test_summarize_plan_finds_shape_rows_and_worst_estimate() -> None:
+    summary = summarize_plan(EXPLAIN)
+
+    assert summary.node_types == ("Hash Join", "Seq Scan", "Hash", "Seq Scan")
+    assert summary.rows == 1000
+    assert summary.worst_node == "Hash"
+    assert round(summary.max_q_error) == 455
+    assert (summary.shared_hit, summary.shared_read, summary.temp_written) == (400, 100, 0)
+
+
+def test_compare_plans_flags_worse_plans_and_spills() -> None:
+    previous = summarize_plan(EXPLAIN)
+    assert compare_plans(previous, previous) == []
+
+    slower = replace(
+        previous,
+        node_types=("Nested Loop", "Seq Scan", "Index Scan"),
+        execution_ms=900.0,
+        shared_hit=5000,
+        temp_written=64,
+    )
+    warnings = compare_plans(previous, slower)
+
+    assert any(warning.startswith("plan changed (+Index Scan, +Nested Loop") for warning in warnings)
+    assert any(warning.startswith("buffers 500 -> 5,100 blocks") for warning in warnings)
+    assert any("spilled 64 temp blocks" in warning for warning in warnings)
+    # A new plan after a SQL change is expected, only its costs are checked
+    assert not any(warning.startswith("plan changed") for warning in compare_plans(previous, slower, sql_changed=True))
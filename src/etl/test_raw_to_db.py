@@ -4,21 +4,7 @@ import pytest
 from sqlalchemy import text
 from sqlalchemy.exc import OperationalError
 from src.db.engine import get_engine
-from src.etl.raw_to_db import RAW_DATA_DIRECTORY, load_all_raw
-
-
-# Map DB tables to their sourc CSV filenames
-TABLE_CSV_MAP = {
-    "customers": "olist_customers_dataset.csv",
-    "geolocation": "olist_geolocation_dataset.csv",
-    "categories": "product_category_name_translation.csv",
-    "sellers": "olist_sellers_dataset.csv",
-    "products": "olist_products_dataset.csv",
-    "orders": "olist_orders_dataset.csv",
-    "items": "olist_order_items_dataset.csv",
-    "payments": "olist_order_payments_dataset.csv",
-    "reviews": "olist_order_reviews_dataset.csv"
-}
+from src.etl.raw_to_db import RAW_CSV_FILES, RAW_DATA_DIRECTORY, load_all_raw, load_geolocation
 
 
 def _truncate_raw_tables() -> None:
@@ -30,7 +16,9 @@ def _truncate_raw_tables() -> None:
     engine = get_engine()
     # TRUNCATE with CASCADE handles FK dependencies automatically
     raw_tables = (
-        "reviews, payments, items, orders, products, sellers, categories, geolocation, customers"
+        "reviews, payments, items, orders, products, sellers, categories, geolocation, customers, geolocation_agg, "
+        # incremental load state would otherwise mark the emptied tables as up to date
+        "etl_file_state"
     )
     with engine.begin() as conn:
         conn.execute(
@@ -48,19 +36,27 @@ def _count_rows_in_table(table_name: str) -> int:
         return result.scalar_one()
     
 
-def test_raw_to_db_row_counts_match() -> None:
+def _skip_without_db() -> None:
     """
-    Smoke test for the CSV -> DB ETL.
-    Checks that each table has the same number of rows as its source CSV.
+    Skip the calling test if the DB is not reachable.
     """
     engine = get_engine()
-    # If DB not reachable, skip the test
     try:
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
     except OperationalError:
         pytest.skip("Database not available; make sure Docker container is running.")
 
+
+def test_raw_to_db_row_counts_match() -> None:
+    """
+    Smoke test for the CSV -> DB ETL.
+    Checks that each table has the same number of rows as its source CSV.
+    """
+    engine = get_engine()
+    # If DB not reachable, skip the test
+    _skip_without_db()
+
     # 1. Clean tables
     _truncate_raw_tables()
 
@@ -69,7 +65,7 @@ def test_raw_to_db_row_counts_match() -> None:
 
     # 3. Compare CSV row counts vs DB counts
     data_dir = RAW_DATA_DIRECTORY
-    for table, filename in TABLE_CSV_MAP.items():
+    for table, filename in RAW_CSV_FILES.items():
         csv_path = data_dir / filename
         assert csv_path.exists(), f"CSV not found for {table}: {csv_path}"
 
@@ -78,3 +74,59 @@ def test_raw_to_db_row_counts_match() -> None:
 
         assert (csv_rows == db_rows), f"Row mismatch for {table}: CSV={csv_rows} != DB={db_rows}"
 
+
+def test_incremental_reload_of_unchanged_files_is_noop() -> None:
+    """
+    A first incremental load upserts every file; a second one skips them all
+    and leaves the row counts untouched.
+    """
+    engine = get_engine()
+    _skip_without_db()
+
+    _truncate_raw_tables()
+    load_all_raw(engine, RAW_DATA_DIRECTORY, incremental=True)
+    counts = {table: _count_rows_in_table(table) for table in RAW_CSV_FILES}
+
+    load_all_raw(engine, RAW_DATA_DIRECTORY, incremental=True)
+
+    for table, rows in counts.items():
+        assert _count_rows_in_table(table) == rows, f"Incremental reload changed {table}"
+    assert _count_rows_in_table("etl_file_state") == len(RAW_CSV_FILES)
+
+
+def test_aggregated_geolocation_keeps_every_point() -> None:
+    """
+    Aggregate mode writes no raw geolocation rows, and its n_points add up to the CSV rows.
+    """
+    engine = get_engine()
+    _skip_without_db()
+
+    load_geolocation(engine, RAW_DATA_DIRECTORY, aggregate=True)
+
+    csv_rows = len(pd.read_csv(RAW_DATA_DIRECTORY / RAW_CSV_FILES["geolocation"]))
+    with engine.connect() as conn:
+        n_points = conn.execute(text("SELECT SUM(n_points) FROM geolocation_agg")).scalar_one()
+    assert _count_rows_in_table("geolocation") == 0
+    assert 0 < _count_rows_in_table("geolocation_agg") < csv_rows
+    assert n_points == csv_rows
+
+
+def test_full_load_is_not_logged_as_order_changes() -> None:
+    """
+    A full load leaves etl_order_changes empty; later row changes are still logged.
+    """
+    engine = get_engine()
+    _skip_without_db()
+
+    _truncate_raw_tables()
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE TABLE etl_order_changes"))
+    load_all_raw(engine, RAW_DATA_DIRECTORY)
+
+    assert _count_rows_in_table("etl_order_changes") == 0
+    with engine.begin() as conn:
+        order_id = conn.execute(text("SELECT order_id FROM items ORDER BY order_id LIMIT 1")).scalar_one()
+        conn.execute(text("UPDATE items SET price = price + 1 WHERE order_id = :order_id"), {"order_id": order_id})
+    with engine.connect() as conn:
+        logged = conn.execute(text("SELECT DISTINCT order_id FROM etl_order_changes")).scalars().all()
+    assert logged == [order_id]
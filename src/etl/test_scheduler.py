@@ -0,0 +1,58 @@
+from __future__ import annotations
+import threading
+import time
+import pytest
+from src.etl.scheduler import run_dag, topological_order
+
+
+def test_run_dag_respects_dependencies_and_runs_in_parallel() -> None:
+    """
+    Independent tasks overlap; a child only starts once all its parents are done.
+    """
+    finished: list[str] = []
+    lock = threading.Lock()
+    active = {"now": 0, "peak": 0}
+
+    def task(name: str):
+        def _run() -> None:
+            with lock:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+            time.sleep(0.05)
+            with lock:
+                active["now"] -= 1
+                finished.append(name)
+        return _run
+
+    dependencies = {"a": set(), "b": set(), "c": {"a", "b"}}
+    run_dag({name: task(name) for name in dependencies}, dependencies, max_workers=2)
+
+    assert active["peak"] == 2
+    assert finished[-1] == "c"
+
+
+def test_run_dag_fails_fast() -> None:
+    """
+    After a failure, dependants and not-yet-started tasks are never run.
+    """
+    started: list[str] = []
+
+    def ok(name: str):
+        return lambda: started.append(name)
+
+    def boom() -> None:
+        started.append("fail")
+        raise RuntimeError("loader failed")
+
+    tasks = {"fail": boom, "child": ok("child"), "later": ok("later")}
+    dependencies = {"fail": set(), "child": {"fail"}, "later": set()}
+
+    with pytest.raises(RuntimeError, match="loader failed"):
+        run_dag(tasks, dependencies, max_workers=1)
+
+    assert started == ["fail"]
+
+
+def test_topological_order_rejects_cycles() -> None:
+    with pytest.raises(ValueError):
+        topological_order({"a": {"b"}, "b": {"a"}})
@@ -0,0 +1,30 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+from src.etl.raw_to_db import RAW_CSV_FILES
+from src.etl.synthetic import CSV_COLUMNS, generate, hex_ids
+
+
+def test_hex_ids_are_unique_and_deterministic() -> None:
+    ids = hex_ids(1, np.arange(100_000))
+
+    assert len(set(ids)) == len(ids)
+    assert all(len(value) == 32 and int(value, 16) >= 0 for value in ids[:100])
+    assert (hex_ids(1, np.arange(10, 20)) == ids[10:20]).all()
+    assert not set(hex_ids(2, np.arange(100))) & set(ids[:100])
+
+
+def test_generate_keeps_layouts_and_foreign_keys(tmp_path) -> None:
+    written = generate(tmp_path, scale=0.01, chunk_rows=300)
+    frames = {table: pd.read_csv(tmp_path / name, dtype=str) for table, name in RAW_CSV_FILES.items()}
+
+    for table, df in frames.items():
+        assert list(df.columns) == CSV_COLUMNS[table]
+        assert len(df) == written[table]
+    assert set(frames["items"]["order_id"]) <= set(frames["orders"]["order_id"])
+    assert set(frames["items"]["product_id"]) <= set(frames["products"]["product_id"])
+    assert set(frames["items"]["seller_id"]) <= set(frames["sellers"]["seller_id"])
+    assert set(frames["orders"]["customer_id"]) == set(frames["customers"]["customer_id"])
+    assert set(frames["payments"]["order_id"]) <= set(frames["orders"]["order_id"])
+    assert set(frames["reviews"]["order_id"]) <= set(frames["orders"]["order_id"])
+    assert set(frames["products"]["product_category_name"].dropna()) <= set(frames["categories"]["product_category_name"])
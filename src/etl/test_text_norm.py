@@ -0,0 +1,12 @@
+from src.etl.text_norm import normalize_text
+
+
+def test_normalize_text_matches_sql_normalization():
+    """
+    Lowercase, accents removed, punctuation collapsed into single spaces.
+    """
+    assert normalize_text("São Paulo") == "sao paulo"
+    assert normalize_text("  Santa Bárbara d'Oeste ") == "santa barbara d oeste"
+    assert normalize_text("RIO-DE---JANEIRO") == "rio de janeiro"
+    assert normalize_text("Brasília / DF") == "brasilia df"
+    assert normalize_text(None) is None
@@ -0,0 +1,105 @@
+from __future__ import annotations
+import re
+import unicodedata
+from collections.abc import Iterable
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+
+#--------------------------
+# Settings
+#--------------------------
+
+# Raw (table, city column) pairs feeding city_norm_dict
+CITY_SOURCES = (
+    ("customers", "customer_city"),
+    ("sellers", "seller_city"),
+    ("geolocation", "geolocation_city"),
+)
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_SPACES = re.compile(r"\s+")
+
+
+#--------------------------
+# Python normalization
+#--------------------------
+
+def normalize_text(value: str | None) -> str | None:
+    """
+    Python twin of the SQL normalize_city() function (schema.sql):
+    lowercase, remove accents, keep only letters/digits, single spaces.
+
+    Accents are stripped through Unicode decomposition, which matches unaccent for the
+    Latin accented letters found in the data; None stays None.
+    """
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", value.lower())
+    unaccented = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _SPACES.sub(" ", _NON_ALNUM.sub(" ", unaccented)).strip()
+
+
+#--------------------------
+# City dictionary
+#--------------------------
+
+def refresh_city_dictionary(engine: Engine, sources: tuple[tuple[str, str], ...] = CITY_SOURCES) -> int:
+    """
+    Add the raw city strings not yet in city_norm_dict, normalized once with normalize_city().
+
+    - Only distinct values are normalized (a few thousand instead of ~1M geolocation rows)
+    - Existing entries are kept, so reruns only pay for new cities
+    - Returns the number of new entries
+    """
+    distinct_cities = "\n            UNION\n            ".join(
+        f"SELECT {column} AS city_raw FROM {table}" for table, column in sources
+    )
+    with engine.begin() as conn:
+        n_new = conn.execute(text(
+            f"""
+            INSERT INTO city_norm_dict (city_raw, city_norm)
+            SELECT city_raw, normalize_city(city_raw)
+            FROM (
+            {distinct_cities}
+            ) AS cities
+            WHERE city_raw IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM city_norm_dict AS d WHERE d.city_raw = cities.city_raw)
+            ON CONFLICT (city_raw) DO NOTHING
+            """
+        )).rowcount
+
+    print(f"[STAGING] city_norm_dict: {n_new} new cities")
+    return n_new
+
+
+def normalize_cities(engine: Engine, cities: Iterable[str]) -> dict[str, str]:
+    """
+    Return {raw city: normalized city} for the given strings, normalized by the database
+    (normalize_city) so results are identical to staging's. Cities not yet in
+    city_norm_dict are added to it on the way.
+    """
+    cities = [city for city in dict.fromkeys(cities) if city is not None]
+    if not cities:
+        return {}
+    with engine.begin() as conn:
+        rows = conn.execute(
+            text(
+                """
+                WITH input AS (
+                    SELECT DISTINCT unnest(CAST(:cities AS TEXT[])) AS city_raw
+                ),
+                added AS (
+                    INSERT INTO city_norm_dict (city_raw, city_norm)
+                    SELECT city_raw, normalize_city(city_raw) FROM input
+                    ON CONFLICT (city_raw) DO NOTHING
+                    RETURNING city_raw, city_norm
+                )
+                SELECT city_raw, city_norm FROM added
+                UNION ALL
+                SELECT d.city_raw, d.city_norm FROM city_norm_dict AS d JOIN input USING (city_raw)
+                """
+            ),
+            {"cities": cities},
+        ).all()
+    return dict(rows)
@@ -0,0 +1,200 @@
+from __future__ import annotations
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from sqlalchemy.engine import Engine
+from src.db.snapshot import build_version, read_mart
+from src.features.transforms import FeatureSpec, build_features
+
+
+#--------------------------
+# Paths
+#--------------------------
+
+# parents[0]=features, [1]=src, [2]=project root
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+FEATURE_DIRECTORY = PROJECT_ROOT / "data" / "features"
+
+MANIFEST_NAME = "manifest.json"
+
+
+#--------------------------
+# Data containers
+#--------------------------
+
+@dataclass(frozen=True)
+class Panel:
+    """
+    Dense daily panel: values[i, j] is series i on dates[j] (0 on days without rows).
+    """
+    series: list[tuple]
+    dates: np.ndarray        # datetime64[D], consecutive days
+    values: np.ndarray       # float64 (n_series, n_dates)
+
+
+@dataclass(frozen=True)
+class FeatureMatrix:
+    """
+    Features of every series and date: features[i, j, k] is feature names[k] of series i on dates[j].
+    """
+    spec: FeatureSpec
+    data_version: int | None
+    series: list[tuple]
+    dates: np.ndarray
+    names: list[str]
+    features: np.ndarray     # float32 (n_series, n_dates, n_features)
+    target: np.ndarray       # float64 (n_series, n_dates)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Long format: one row per (series, date) with the series columns, date, target and features.
+        """
+        n_series, n_dates, _ = self.features.shape
+        df = pd.DataFrame(self.features.reshape(n_series * n_dates, -1), columns=self.names)
+        df.insert(0, self.spec.target, self.target.reshape(-1))
+        df.insert(0, self.spec.date_column, np.tile(self.dates, n_series))
+        for position, column in enumerate(self.spec.series_columns):
+            df.insert(position, column, np.repeat([key[position] for key in self.series], n_dates))
+        return df
+
+
+#--------------------------
+# Helpers
+#--------------------------
+
+def _log_features(message: str) -> None:
+    print(f"[FEATURES] {message}")
+
+
+def load_panel(engine: Engine, spec: FeatureSpec) -> Panel:
+    """
+    Read the spec's series from its mart (local snapshot when current) into a dense panel.
+    """
+    columns = [*spec.series_columns, spec.date_column, spec.target]
+    df = read_mart(engine, spec.table, columns)
+    if df.empty:
+        return Panel([], np.array([], dtype="datetime64[D]"), np.zeros((0, 0)))
+
+    days = df[spec.date_column].to_numpy().astype("datetime64[D]")
+    dates = np.arange(days.min(), days.max() + np.timedelta64(1, "D"), dtype="datetime64[D]")
+    if spec.series_columns:
+        keys = pd.MultiIndex.from_frame(df[list(spec.series_columns)].astype(object))
+        codes, uniques = keys.factorize(sort=True)
+        series = [tuple(key) for key in uniques]
+    else:
+        codes, series = np.zeros(len(df), dtype=np.int64), [()]
+
+    values = np.zeros((len(series), len(dates)))
+    target = df[spec.target].to_numpy(dtype=np.float64, na_value=0.0)
+    np.add.at(values, (codes, (days - dates[0]).astype(np.int64)), target)
+    return Panel(series, dates, values)
+
+
+def feature_path(spec: FeatureSpec, directory: Path = FEATURE_DIRECTORY) -> Path:
+    """
+    Directory holding the spec's persisted matrix (features.npy, target.npy, dates.npy, manifest).
+    """
+    return directory / spec.spec_hash
+
+
+def _first_stale_date(stored: FeatureMatrix | None, panel: Panel) -> int:
+    """
+    Index of the first date whose features must be recomputed: everything is kept up to the
+    first date whose target changed (features only use earlier targets), plus new dates.
+    0 when the stored matrix does not line up with the panel.
+    """
+    if (
+        stored is None
+        or stored.series != panel.series
+        or len(stored.dates) == 0
+        or len(stored.dates) > len(panel.dates)
+        or stored.dates[0] != panel.dates[0]
+    ):
+        return 0
+    n_stored = len(stored.dates)
+    changed = np.flatnonzero(~np.all(stored.target == panel.values[:, :n_stored], axis=0))
+    return min(int(changed[0]) + 1, n_stored) if len(changed) else n_stored
+
+
+def _load(path: Path) -> FeatureMatrix | None:
+    manifest_path = path / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    spec = FeatureSpec(**{key: tuple(value) if isinstance(value, list) else value for key, value in manifest["spec"].items()})
+    return FeatureMatrix(
+        spec=spec,
+        data_version=manifest["data_version"],
+        series=[tuple(key) for key in manifest["series"]],
+        dates=np.load(path / "dates.npy"),
+        names=manifest["names"],
+        features=np.load(path / "features.npy", mmap_mode="r"),
+        target=np.load(path / "target.npy", mmap_mode="r"),
+    )
+
+
+def _save(path: Path, matrix: FeatureMatrix) -> None:
+    """
+    Write to a temporary directory, then swap it in place of the previous version.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{path.name}-", dir=path.parent))
+    try:
+        np.save(staging / "features.npy", matrix.features)
+        np.save(staging / "target.npy", matrix.target)
+        np.save(staging / "dates.npy", matrix.dates)
+        manifest = {
+            "spec": asdict(matrix.spec),
+            "data_version": matrix.data_version,
+            "series": [list(key) for key in matrix.series],
+            "names": matrix.names,
+        }
+        (staging / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, default=str), encoding="utf-8")
+
+        previous = path.with_name(f".{path.name}.old")
+        if path.exists():
+            os.replace(path, previous)
+        os.replace(staging, path)
+        shutil.rmtree(previous, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+#--------------------------
+# Public API
+#--------------------------
+
+def get_features(engine: Engine, spec: FeatureSpec = FeatureSpec(),
+                 directory: Path = FEATURE_DIRECTORY) -> FeatureMatrix:
+    """
+    Return the spec's feature matrix, persisted under <directory>/<spec hash>/.
+
+    - Same data version (build_version of the source mart) as stored: memory-mapped as is
+    - Otherwise only the dates from the first changed target on (usually just the newly
+      appended days) are recomputed and appended to the stored features
+    - Different series or start date: full recompute
+    """
+    version = build_version(engine, spec.table)
+    path = feature_path(spec, directory)
+    stored = _load(path)
+    if stored is not None and version is not None and stored.data_version == version:
+        return stored
+
+    panel = load_panel(engine, spec)
+    start = _first_stale_date(stored, panel)
+    fresh, names = build_features(panel.values, panel.dates, spec, start)
+    features = np.concatenate([stored.features[:, :start], fresh], axis=1) if start else fresh
+
+    matrix = FeatureMatrix(spec, version, panel.series, panel.dates, names, features, panel.values)
+    _save(path, matrix)
+    _log_features(
+        f"{spec.table}/{spec.target} [{spec.spec_hash}] v{version}: {len(panel.series)} series x "
+        f"{len(panel.dates)} days, recomputed {len(panel.dates) - start} day(s)"
+    )
+    return _load(path)
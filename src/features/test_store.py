@@ -0,0 +1,90 @@
+from __future__ import annotations
+import numpy as np
+from src.features import store
+from src.features.store import Panel, get_features
+from src.features.transforms import FeatureSpec, build_features
+
+
+SPEC = FeatureSpec(lags=(1, 2), windows=(2,))
+DATES = np.arange("2018-01-01", "2018-01-07", dtype="datetime64[D]")
+VALUES = np.array([
+    [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+    [0.0, 10.0, 0.0, 10.0, 0.0, 10.0],
+])
+
+
+class FakeMart:
+    """
+    Stands in for the mart: build_version / load_panel return the current state, and every
+    build_features call records the start index it recomputed from.
+    """
+    def __init__(self, monkeypatch) -> None:
+        self.version = 1
+        self.panel = Panel([("a",), ("b",)], DATES, VALUES)
+        self.starts: list[int] = []
+        monkeypatch.setattr(store, "build_version", lambda engine, table_name: self.version)
+        monkeypatch.setattr(store, "load_panel", lambda engine, spec: self.panel)
+        monkeypatch.setattr(store, "build_features", self.build_features)
+
+    def build_features(self, values, dates, spec, start=0):
+        self.starts.append(start)
+        return build_features(values, dates, spec, start)
+
+    def update(self, series: list[tuple], dates: np.ndarray, values: np.ndarray) -> None:
+        self.version += 1
+        self.panel = Panel(series, dates, values)
+
+
+def _assert_matches_full_build(matrix, panel: Panel) -> None:
+    full, names = build_features(panel.values, panel.dates, SPEC)
+    assert matrix.names == names and matrix.series == panel.series
+    np.testing.assert_array_equal(matrix.dates, panel.dates)
+    np.testing.assert_array_equal(matrix.target, panel.values)
+    np.testing.assert_array_equal(matrix.features, full)
+
+
+def test_unchanged_version_is_loaded_without_recompute(tmp_path, monkeypatch):
+    mart = FakeMart(monkeypatch)
+    get_features(None, SPEC, tmp_path)
+
+    matrix = get_features(None, SPEC, tmp_path)
+
+    assert mart.starts == [0]
+    assert isinstance(matrix.features, np.memmap)
+    _assert_matches_full_build(matrix, mart.panel)
+
+
+def test_appended_day_recomputes_only_the_tail(tmp_path, monkeypatch):
+    mart = FakeMart(monkeypatch)
+    get_features(None, SPEC, tmp_path)
+
+    dates = np.arange("2018-01-01", "2018-01-08", dtype="datetime64[D]")
+    mart.update(mart.panel.series, dates, np.column_stack([VALUES, [7.0, 0.0]]))
+    matrix = get_features(None, SPEC, tmp_path)
+
+    assert mart.starts == [0, 6]
+    _assert_matches_full_build(matrix, mart.panel)
+
+
+def test_changed_target_recomputes_from_the_next_day(tmp_path, monkeypatch):
+    mart = FakeMart(monkeypatch)
+    get_features(None, SPEC, tmp_path)
+
+    values = VALUES.copy()
+    values[1, 3] = 20.0
+    mart.update(mart.panel.series, DATES, values)
+    matrix = get_features(None, SPEC, tmp_path)
+
+    assert mart.starts == [0, 4]
+    _assert_matches_full_build(matrix, mart.panel)
+
+
+def test_series_change_forces_a_full_rebuild(tmp_path, monkeypatch):
+    mart = FakeMart(monkeypatch)
+    get_features(None, SPEC, tmp_path)
+
+    mart.update([("a",), ("b",), ("c",)], DATES, np.vstack([VALUES, np.ones(len(DATES))]))
+    matrix = get_features(None, SPEC, tmp_path)
+
+    assert mart.starts == [0, 0]
+    _assert_matches_full_build(matrix, mart.panel)
@@ -0,0 +1,41 @@
+from __future__ import annotations
+import numpy as np
+from src.features.transforms import FeatureSpec, build_features, calendar_features, expanding_mean, rolling_mean_std
+
+
+VALUES = np.array([
+    [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+    [0.0, 10.0, 0.0, 10.0, 0.0, 10.0],
+])
+
+
+def test_rolling_features_only_use_previous_days():
+    mean, std = rolling_mean_std(VALUES, 3)
+    assert np.isnan(mean[:, :3]).all()
+    np.testing.assert_allclose(mean[0, 3:], [2.0, 3.0, 4.0])
+    np.testing.assert_allclose(std[0, 3:], [1.0, 1.0, 1.0])
+    np.testing.assert_allclose(mean[1, 3:], [10 / 3, 20 / 3, 10 / 3])
+
+    np.testing.assert_allclose(expanding_mean(VALUES)[0, 1:], [1.0, 1.5, 2.0, 2.5, 3.0])
+
+
+def test_partial_recompute_matches_full_build():
+    """
+    Features computed from a start index equal the tail of a full computation.
+    """
+    dates = np.arange("2018-01-01", "2018-01-07", dtype="datetime64[D]")
+    spec = FeatureSpec(lags=(1, 2), windows=(2,))
+    full, names = build_features(VALUES, dates, spec)
+    tail, tail_names = build_features(VALUES, dates, spec, start=4)
+
+    assert names == tail_names
+    np.testing.assert_array_equal(full[:, 4:], tail)
+    assert full.shape == (2, 6, len(names))
+
+
+def test_calendar_features():
+    calendar = calendar_features(np.array(["2018-01-01", "2018-12-30"], dtype="datetime64[D]"))
+    assert calendar["day_of_week_iso"].tolist() == [1, 7]
+    assert calendar["month"].tolist() == [1, 12]
+    assert calendar["day_of_year"].tolist() == [1, 364]
+    assert calendar["is_weekend"].tolist() == [0, 1]
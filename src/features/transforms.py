@@ -0,0 +1,127 @@
+from __future__ import annotations
+import hashlib
+import json
+import numpy as np
+from dataclasses import asdict, dataclass
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# Bump when the feature definitions below change, so stored matrices are recomputed
+FEATURE_CODE_VERSION = 1
+
+
+#--------------------------
+# Feature set specification
+#--------------------------
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """
+    A feature set over daily series read from a mart.
+
+    - table / date_column / target: source mart and the value being forecast
+    - series_columns: columns identifying a series (empty = one series for the whole table)
+    - lags: target k days before
+    - windows: mean and std of the w days before (full windows only)
+    - expanding: mean of every earlier day
+    - calendar: day of week, day, month, day of year, weekend flag
+
+    Every feature at date t only uses targets strictly before t.
+    """
+    table: str = "fact_daily_orders"
+    date_column: str = "order_date"
+    target: str = "n_orders"
+    series_columns: tuple[str, ...] = ()
+    lags: tuple[int, ...] = (1, 7, 14, 28)
+    windows: tuple[int, ...] = (7, 28)
+    expanding: bool = True
+    calendar: bool = True
+
+    @property
+    def spec_hash(self) -> str:
+        payload = json.dumps({**asdict(self), "code_version": FEATURE_CODE_VERSION}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+#--------------------------
+# Transforms
+#--------------------------
+# All transforms take values shaped (n_series, n_dates) and return the features of the
+# dates from index start on, shaped (n_series, n_dates - start).
+
+def lag(values: np.ndarray, k: int, start: int = 0) -> np.ndarray:
+    out = np.full(values.shape, np.nan)
+    if k < values.shape[1]:
+        out[:, k:] = values[:, :values.shape[1] - k]
+    return out[:, start:]
+
+
+def rolling_mean_std(values: np.ndarray, window: int, start: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Mean and sample std over the window days before each date, NaN until a full window exists.
+
+    sliding_window_view gives every window as a strided view (no copies); a NaN pad of
+    window days in front makes window i cover values[i - window : i].
+    """
+    n_series, n_dates = values.shape
+    padded = np.concatenate([np.full((n_series, window), np.nan), values[:, :-1]], axis=1)
+    windows = sliding_window_view(padded, window, axis=1)[:, start:n_dates]
+    mean = windows.mean(axis=2)
+    std = windows.std(axis=2, ddof=1) if window > 1 else np.zeros_like(mean)
+    return mean, std
+
+
+def expanding_mean(values: np.ndarray, start: int = 0) -> np.ndarray:
+    n_series, n_dates = values.shape
+    previous_sum = np.concatenate([np.zeros((n_series, 1)), np.cumsum(values, axis=1)[:, :-1]], axis=1)
+    counts = np.arange(n_dates, dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = previous_sum / counts
+    mean[:, 0] = np.nan
+    return mean[:, start:]
+
+
+def calendar_features(dates: np.ndarray, start: int = 0) -> dict[str, np.ndarray]:
+    """
+    Calendar columns for datetime64 dates (shape (n_dates - start,), broadcast over series later).
+    """
+    days = dates[start:].astype("datetime64[D]")
+    day_number = days.astype(np.int64)
+    month_start = days.astype("datetime64[M]")
+    year_start = days.astype("datetime64[Y]")
+    # 1970-01-01 was a Thursday (ISO day 4)
+    day_of_week = (day_number + 3) % 7 + 1
+    return {
+        "day_of_week_iso": day_of_week,
+        "day": (days - month_start).astype(np.int64) + 1,
+        "month": month_start.astype(np.int64) % 12 + 1,
+        "day_of_year": (days - year_start).astype(np.int64) + 1,
+        "is_weekend": (day_of_week >= 6).astype(np.int64),
+    }
+
+
+def build_features(values: np.ndarray, dates: np.ndarray, spec: FeatureSpec,
+                   start: int = 0) -> tuple[np.ndarray, list[str]]:
+    """
+    Compute the spec's features of every series at once, for the dates from index start on.
+
+    Returns (float32 array shaped (n_series, n_dates - start, n_features), feature names).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_series = values.shape[0]
+    columns: dict[str, np.ndarray] = {}
+
+    for k in spec.lags:
+        columns[f"lag_{k}"] = lag(values, k, start)
+    for window in spec.windows:
+        columns[f"roll_mean_{window}"], columns[f"roll_std_{window}"] = rolling_mean_std(values, window, start)
+    if spec.expanding:
+        columns["expanding_mean"] = expanding_mean(values, start)
+    if spec.calendar:
+        for name, column in calendar_features(dates, start).items():
+            columns[name] = np.broadcast_to(column, (n_series, column.shape[0]))
+
+    n_out = values.shape[1] - start
+    if not columns:
+        return np.empty((n_series, n_out, 0), dtype=np.float32), []
+    return np.stack(list(columns.values()), axis=2).astype(np.float32), list(columns)
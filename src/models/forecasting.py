@@ -0,0 +1,457 @@
+from __future__ import annotations
+import argparse
+import csv
+import io
+import json
+import math
+import time
+import numpy as np
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from joblib import Parallel, delayed, effective_n_jobs
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from xgboost import XGBRegressor
+from src.db.engine import get_engine
+from src.etl.build_marts import ALL_LABEL
+from src.etl.materialize import record_build
+from src.features.store import FEATURE_DIRECTORY, feature_path, get_features
+from src.features.transforms import FeatureSpec, build_features
+
+
+#--------------------------
+# Settings
+#--------------------------
+
+# Daily orders of every category x customer_state series of the demand cube
+DEMAND_SPEC = FeatureSpec(
+    table="fact_daily_demand",
+    target="n_orders",
+    series_columns=("product_category_name", "customer_state"),
+)
+
+DEFAULT_XGB_PARAMS = (
+    ("n_estimators", 300),
+    ("max_depth", 6),
+    ("learning_rate", 0.05),
+    ("subsample", 0.8),
+    ("colsample_bytree", 0.8),
+    ("tree_method", "hist"),
+)
+
+# Series per task in per_series mode (one task = one fold x one chunk of series)
+SERIES_PER_TASK = 64
+
+
+@dataclass(frozen=True)
+class ForecastConfig:
+    """
+    How series are modelled and backtested.
+
+    - mode: "global" (one model over every series) or "per_series" (one model per series)
+    - n_folds / horizon / step: rolling origins; fold k trains on every date before its origin
+      and forecasts the next horizon days, origins are step days apart and the last fold
+      ends on the last date
+    - include_rollups: also model the '__all__' rollup series of the cube
+    - log_target: fit log1p(target), forecasts are mapped back with expm1
+    - xgb_params: XGBRegressor parameters, as (name, value) pairs
+    """
+    mode: str = "global"
+    n_folds: int = 4
+    horizon: int = 28
+    step: int = 28
+    include_rollups: bool = False
+    log_target: bool = True
+    xgb_params: tuple[tuple[str, object], ...] = DEFAULT_XGB_PARAMS
+
+    def __post_init__(self) -> None:
+        if self.mode not in ("global", "per_series"):
+            raise ValueError(f"Unknown forecasting mode {self.mode!r}")
+
+    def to_params(self) -> dict:
+        return {**asdict(self), "xgb_params": dict(self.xgb_params)}
+
+
+@dataclass(frozen=True)
+class BacktestResult:
+    config: ForecastConfig
+    spec: FeatureSpec
+    data_version: int | None
+    origins: list[str]
+    fold_metrics: list[dict]
+    metrics: dict
+    wall_time_s: float
+
+
+#--------------------------
+# Helpers
+#--------------------------
+
+def _log_forecast(message: str) -> None:
+    print(f"[FORECAST] {message}")
+
+
+def warmup_days(spec: FeatureSpec) -> int:
+    """
+    First date index with every lag / window feature defined; earlier rows are not trained on.
+    """
+    return max((*spec.lags, *spec.windows), default=1)
+
+
+def rolling_origins(n_dates: int, n_folds: int, horizon: int, step: int, warmup: int) -> list[int]:
+    """
+    Date indexes where the folds' forecasts start, oldest first.
+
+    Origins whose training range would be empty (before warmup) are dropped.
+    """
+    origins = [n_dates - horizon - (n_folds - 1 - fold) * step for fold in range(n_folds)]
+    origins = [origin for origin in origins if origin > warmup]
+    if not origins:
+        raise ValueError(
+            f"Not enough history for {n_folds} fold(s) of {horizon} days: {n_dates} dates, warm-up {warmup}"
+        )
+    return origins
+
+
+def select_series(series: list[tuple], spec: FeatureSpec, include_rollups: bool) -> np.ndarray:
+    """
+    Row indexes of the series to model (rollups of the demand cube excluded by default).
+    """
+    if include_rollups or not spec.series_columns:
+        return np.arange(len(series))
+    return np.array([i for i, key in enumerate(series) if ALL_LABEL not in key], dtype=np.int64)
+
+
+def forecast_metrics(actual: np.ndarray, predicted: np.ndarray) -> dict:
+    """
+    MAE, RMSE, WAPE (sum |error| / sum |actual|) and bias (sum error / sum |actual|).
+    """
+    error = np.asarray(predicted, dtype=np.float64) - np.asarray(actual, dtype=np.float64)
+    total = float(np.abs(actual).sum())
+    return {
+        "mae": float(np.abs(error).mean()) if error.size else None,
+        "rmse": float(np.sqrt((error ** 2).mean())) if error.size else None,
+        "wape": float(np.abs(error).sum() / total) if total else None,
+        "bias": float(error.sum() / total) if total else None,
+        "n_points": int(error.size),
+    }
+
+
+def _extend_dates(dates: np.ndarray, horizon: int) -> np.ndarray:
+    days = np.asarray(dates, dtype="datetime64[D]")
+    return np.concatenate([days, days[-1] + np.arange(1, horizon + 1)])
+
+
+def _fit_models(features: np.ndarray, target: np.ndarray, rows: np.ndarray, warmup: int, end: int,
+                config: ForecastConfig, n_threads: int) -> list[XGBRegressor]:
+    """
+    Fit on the rows' dates [warmup, end): one model over all rows (global) or one per row.
+    Indexing the memory-mapped matrix only reads the slice being trained on.
+    """
+    x = np.asarray(features[rows, warmup:end], dtype=np.float32)
+    y = np.asarray(target[rows, warmup:end], dtype=np.float64)
+    if config.log_target:
+        y = np.log1p(y)
+
+    def fit(x_fit: np.ndarray, y_fit: np.ndarray) -> XGBRegressor:
+        model = XGBRegressor(**dict(config.xgb_params), n_jobs=n_threads)
+        model.fit(x_fit, y_fit)
+        return model
+
+    if config.mode == "global":
+        return [fit(x.reshape(-1, x.shape[2]), y.reshape(-1))]
+    return [fit(x[i], y[i]) for i in range(len(rows))]
+
+
+def _predict(models: list[XGBRegressor], x: np.ndarray, config: ForecastConfig) -> np.ndarray:
+    if config.mode == "global":
+        prediction = models[0].predict(x)
+    else:
+        prediction = np.array([model.predict(x[i:i + 1])[0] for i, model in enumerate(models)])
+    if config.log_target:
+        prediction = np.expm1(prediction)
+    return np.maximum(prediction, 0.0)
+
+
+def recursive_forecast(models: list[XGBRegressor], history: np.ndarray, dates: np.ndarray,
+                       spec: FeatureSpec, config: ForecastConfig, horizon: int) -> np.ndarray:
+    """
+    Forecast horizon days after history (n_rows, n_dates) one day at a time: each day's
+    features are computed from the history plus the forecasts of the days before it,
+    exactly as they would be in production.
+
+    Returns (n_rows, horizon) forecasts.
+    """
+    n_rows, origin = history.shape
+    values = np.concatenate([np.asarray(history, dtype=np.float64), np.zeros((n_rows, horizon))], axis=1)
+    all_dates = _extend_dates(dates[:origin], horizon)
+    for h in range(horizon):
+        day = origin + h
+        x, _ = build_features(values[:, :day + 1], all_dates[:day + 1], spec, start=day)
+        values[:, day] = _predict(models, x[:, 0, :], config)
+    return values[:, origin:]
+
+
+#--------------------------
+# Worker tasks
+#--------------------------
+# Tasks receive the feature directory path and row indexes only; every worker memory-maps
+# the same features.npy / target.npy, so no frame or matrix is pickled per task.
+
+def _open_matrix(path: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    directory = Path(path)
+    return (
+        np.load(directory / "features.npy", mmap_mode="r"),
+        np.load(directory / "target.npy", mmap_mode="r"),
+        np.load(directory / "dates.npy"),
+    )
+
+
+def _backtest_task(path: str, spec: FeatureSpec, config: ForecastConfig, rows: np.ndarray,
+                   origin: int, warmup: int, n_threads: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Train on the dates before origin, forecast the next config.horizon days.
+    Returns (actual, forecast), both shaped (n_rows, horizon).
+    """
+    features, target, dates = _open_matrix(path)
+    models = _fit_models(features, target, rows, warmup, origin, config, n_threads)
+    forecast = recursive_forecast(models, target[rows, :origin], dates, spec, config, config.horizon)
+    return np.asarray(target[rows, origin:origin + config.horizon]), forecast
+
+
+def _fit_task(path: str, config: ForecastConfig, rows: np.ndarray, warmup: int,
+              n_threads: int) -> list[XGBRegressor]:
+    features, target, dates = _open_matrix(path)
+    return _fit_models(features, target, rows, warmup, len(dates), config, n_threads)
+
+
+def _row_chunks(rows: np.ndarray, config: ForecastConfig) -> list[np.ndarray]:
+    if config.mode == "global":
+        return [rows]
+    return np.array_split(rows, max(1, math.ceil(len(rows) / SERIES_PER_TASK)))
+
+
+#--------------------------
+# Public API
+#--------------------------
+
+def backtest(engine: Engine, config: ForecastConfig = ForecastConfig(), spec: FeatureSpec = DEMAND_SPEC,
+             n_jobs: int = -1, directory: Path = FEATURE_DIRECTORY, record: bool = True) -> BacktestResult:
+    """
+    Rolling-origin backtest of config over the spec's series.
+
+    - The feature matrix comes from the feature store (refreshed if the mart changed) and
+      is shared by all workers through its memory-mapped .npy files
+    - Tasks are (fold x chunk of series) in per_series mode, one per fold in global mode;
+      they run on a loky process pool of n_jobs workers, spare cores go to XGBoost threads
+    - Forecasts are recursive over the horizon (no actual value after the origin is used)
+    - With record=True, one model_runs row per fold plus one for the whole backtest
+    """
+    started = time.perf_counter()
+    matrix = get_features(engine, spec, directory)
+    path = str(feature_path(spec, directory))
+    rows = select_series(matrix.series, spec, config.include_rollups)
+    warmup = warmup_days(spec)
+    origins = rolling_origins(len(matrix.dates), config.n_folds, config.horizon, config.step, warmup)
+
+    tasks = [(fold, chunk, origin) for fold, origin in enumerate(origins) for chunk in _row_chunks(rows, config)]
+    n_workers = min(effective_n_jobs(n_jobs), len(tasks))
+    n_threads = max(1, effective_n_jobs(n_jobs) // n_workers)
+    _log_forecast(
+        f"{config.mode} backtest: {len(rows)} series x {len(origins)} fold(s) x {config.horizon} days, "
+        f"{len(tasks)} task(s) on {n_workers} worker(s)"
+    )
+    outputs = Parallel(n_jobs=n_workers, backend="loky")(
+        delayed(_backtest_task)(path, spec, config, chunk, origin, warmup, n_threads)
+        for _, chunk, origin in tasks
+    )
+
+    fold_metrics, actual_all, forecast_all = [], [], []
+    for fold, origin in enumerate(origins):
+        fold_outputs = [output for (task_fold, _, _), output in zip(tasks, outputs) if task_fold == fold]
+        actual = np.concatenate([output[0] for output in fold_outputs])
+        forecast = np.concatenate([output[1] for output in fold_outputs])
+        fold_metrics.append({"fold": fold, "origin": str(matrix.dates[origin]), **forecast_metrics(actual, forecast)})
+        actual_all.append(actual)
+        forecast_all.append(forecast)
+
+    result = BacktestResult(
+        config=config,
+        spec=spec,
+        data_version=matrix.data_version,
+        origins=[str(matrix.dates[origin]) for origin in origins],
+        fold_metrics=fold_metrics,
+        metrics=forecast_metrics(np.concatenate(actual_all), np.concatenate(forecast_all)),
+        wall_time_s=time.perf_counter() - started,
+    )
+    _log_forecast(
+        f"{config.mode} backtest done in {result.wall_time_s:.1f}s: "
+        f"WAPE {result.metrics['wape']}, MAE {result.metrics['mae']}"
+    )
+    if record:
+        record_backtest(engine, result)
+    return result
+
+
+def record_backtest(engine: Engine, result: BacktestResult) -> None:
+    """
+    Insert the backtest into model_runs in one executemany: one row per fold and a summary row
+    (fold NULL) with the overall metrics and the wall time.
+    """
+    model_name = f"xgb_{result.config.mode}_backtest"
+    params = {
+        **result.config.to_params(),
+        "spec": asdict(result.spec),
+        "spec_hash": result.spec.spec_hash,
+        "data_version": result.data_version,
+    }
+    rows = [
+        {"model_name": model_name, "params": json.dumps({**params, "fold": m["fold"], "origin": m["origin"]}),
+         "metrics": json.dumps(m)}
+        for m in result.fold_metrics
+    ]
+    rows.append({
+        "model_name": model_name,
+        "params": json.dumps({**params, "fold": None, "origins": result.origins}),
+        "metrics": json.dumps({**result.metrics, "wall_time_s": result.wall_time_s}),
+    })
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                """
+                INSERT INTO model_runs (model_name, params, metrics)
+                VALUES (:model_name, CAST(:params AS JSONB), CAST(:metrics AS JSONB))
+                """
+            ),
+            rows,
+        )
+
+
+@dataclass(frozen=True)
+class Forecaster:
+    """
+    Models trained on every available date, ready to forecast past the last one.
+    """
+    spec: FeatureSpec
+    config: ForecastConfig
+    data_version: int | None
+    series: list[tuple]
+    dates: np.ndarray
+    history: np.ndarray          # (n_series, n_dates) targets of the modelled series
+    models: list[XGBRegressor]
+
+    def forecast(self, horizon: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (the horizon dates after the last one, forecasts shaped (n_series, horizon)).
+        """
+        forecast = recursive_forecast(self.models, self.history, self.dates, self.spec, self.config, horizon)
+        return _extend_dates(self.dates, horizon)[len(self.dates):], forecast
+
+
+def fit_forecaster(engine: Engine, config: ForecastConfig = ForecastConfig(), spec: FeatureSpec = DEMAND_SPEC,
+                   n_jobs: int = -1, directory: Path = FEATURE_DIRECTORY) -> Forecaster:
+    """
+    Train config's model(s) on every date, per_series chunks in parallel on the process pool.
+    """
+    matrix = get_features(engine, spec, directory)
+    path = str(feature_path(spec, directory))
+    rows = select_series(matrix.series, spec, config.include_rollups)
+    warmup = warmup_days(spec)
+    if len(matrix.dates) <= warmup:
+        raise ValueError(f"Not enough history to train: {len(matrix.dates)} dates, warm-up {warmup}")
+
+    chunks = _row_chunks(rows, config)
+    n_workers = min(effective_n_jobs(n_jobs), len(chunks))
+    n_threads = max(1, effective_n_jobs(n_jobs) // n_workers)
+    fitted = Parallel(n_jobs=n_workers, backend="loky")(
+        delayed(_fit_task)(path, config, chunk, warmup, n_threads) for chunk in chunks
+    )
+    _log_forecast(f"trained {config.mode} model(s) on {len(rows)} series x {len(matrix.dates)} days")
+    return Forecaster(
+        spec=spec,
+        config=config,
+        data_version=matrix.data_version,
+        series=[matrix.series[i] for i in rows],
+        dates=np.asarray(matrix.dates, dtype="datetime64[D]"),
+        history=np.asarray(matrix.target[rows], dtype=np.float64),
+        models=[model for models in fitted for model in models],
+    )
+
+
+def publish_forecasts(engine: Engine, forecaster: Forecaster, horizon: int) -> int:
+    """
+    Replace the forecasts table with the forecaster's next horizon days (one transaction).
+
+    - Rows are written with COPY; DELETE (not TRUNCATE) keeps readers on the previous
+      forecasts until the commit instead of blocking them
+    - Bumps the build_version of "forecasts", which versions the API's cached responses
+    Returns the number of rows written.
+    """
+    if forecaster.spec.series_columns != DEMAND_SPEC.series_columns:
+        raise ValueError(f"forecasts are keyed by {DEMAND_SPEC.series_columns}, got {forecaster.spec.series_columns}")
+
+    dates, forecast = forecaster.forecast(horizon)
+    model_name = f"xgb_{forecaster.config.mode}"
+    origin_date = str(forecaster.dates[-1])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for (category, state), values in zip(forecaster.series, forecast):
+        writer.writerows(
+            (category, state, str(day), f"{value:.6f}", model_name, origin_date, forecaster.data_version)
+            for day, value in zip(dates, values)
+        )
+    buffer.seek(0)
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM forecasts"))
+        with conn.connection.dbapi_connection.cursor() as cur:
+            cur.copy_expert(
+                "COPY forecasts (product_category_name, customer_state, forecast_date, forecast, "
+                "model_name, origin_date, data_version) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        record_build(conn, "forecasts", "full")
+
+    n_rows = forecast.size
+    _log_forecast(f"published {n_rows:,} forecasts ({len(forecaster.series)} series x {horizon} days from {origin_date})")
+    return n_rows
+
+
+#--------------------------
+# Main
+#--------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the demand forecasting models.")
+    parser.add_argument("--mode", choices=("global", "per_series"), default="global")
+    parser.add_argument("--folds", type=int, default=ForecastConfig.n_folds)
+    parser.add_argument("--horizon", type=int, default=ForecastConfig.horizon)
+    parser.add_argument("--step", type=int, default=ForecastConfig.step)
+    parser.add_argument("--rollups", action="store_true", help="Also model the '__all__' rollup series")
+    parser.add_argument("--jobs", type=int, default=-1, help="Worker processes (-1 = all cores)")
+    parser.add_argument("--no-record", action="store_true", help="Do not write the results to model_runs")
+    parser.add_argument("--no-backtest", action="store_true", help="Skip the backtest")
+    parser.add_argument(
+        "--publish",
+        action="store_true",
+        help="Train on every date and publish the next --horizon days to the forecasts table",
+    )
+    args = parser.parse_args()
+
+    config = ForecastConfig(
+        mode=args.mode,
+        n_folds=args.folds,
+        horizon=args.horizon,
+        step=args.step,
+        include_rollups=args.rollups,
+    )
+    engine = get_engine()
+    if not args.no_backtest:
+        result = backtest(engine, config, n_jobs=args.jobs, record=not args.no_record)
+        for fold in result.fold_metrics:
+            _log_forecast(f"fold {fold['fold']} (origin {fold['origin']}): WAPE {fold['wape']}, MAE {fold['mae']}")
+    if args.publish:
+        publish_forecasts(engine, fit_forecaster(engine, config, n_jobs=args.jobs), args.horizon)
+
+if __name__ == "__main__":
+    main()
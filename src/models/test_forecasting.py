@@ -0,0 +1,32 @@
+from __future__ import annotations
+import numpy as np
+import pytest
+from src.features.transforms import FeatureSpec
+from src.models.forecasting import DEMAND_SPEC, forecast_metrics, rolling_origins, select_series, warmup_days
+
+
+def test_rolling_origins_end_on_last_date():
+    origins = rolling_origins(n_dates=200, n_folds=3, horizon=28, step=14, warmup=28)
+    assert origins == [144, 158, 172]
+    assert origins[-1] + 28 == 200
+
+
+def test_rolling_origins_drop_folds_without_history():
+    assert rolling_origins(n_dates=100, n_folds=4, horizon=28, step=28, warmup=28) == [44, 72]
+    with pytest.raises(ValueError):
+        rolling_origins(n_dates=50, n_folds=2, horizon=28, step=28, warmup=28)
+
+
+def test_select_series_skips_rollups():
+    series = [("__all__", "__all__"), ("bebes", "SP"), ("bebes", "__all__"), ("bebes", "RJ")]
+    np.testing.assert_array_equal(select_series(series, DEMAND_SPEC, include_rollups=False), [1, 3])
+    np.testing.assert_array_equal(select_series(series, DEMAND_SPEC, include_rollups=True), [0, 1, 2, 3])
+    assert warmup_days(FeatureSpec(lags=(1, 7), windows=(28,))) == 28
+
+
+def test_forecast_metrics():
+    metrics = forecast_metrics(np.array([[2.0, 0.0], [4.0, 2.0]]), np.array([[1.0, 1.0], [4.0, 4.0]]))
+    assert metrics["mae"] == 1.0
+    assert metrics["wape"] == 0.5
+    assert metrics["bias"] == 0.25
+    assert metrics["n_points"] == 4
@@ -0,0 +1,44 @@
+from __future__ import annotations
+import pytest
+from sqlalchemy import text
+from src.db.engine import get_engine
+from src.etl.materialize import relation_exists
+from src.etl.test_raw_to_db import _skip_without_db
+from src.reviews.text_pipeline import load_review_features, polarity, process_reviews, review_text
+
+
+def test_review_text_joins_normalized_title_and_message():
+    assert review_text("Ótimo!", "Chegou  antes do prazo.") == "otimo chegou antes do prazo"
+    assert review_text(None, "Produto com DEFEITO") == "produto com defeito"
+    assert review_text(None, None) == ""
+
+
+def test_polarity_counts_negated_words_with_opposite_sign():
+    assert polarity("produto otimo recomendo".split()) == 1.0
+    assert polarity("nao recomendo produto ruim".split()) == -1.0
+    assert polarity("bom mas chegou atrasado".split()) == 0.0
+    assert polarity("sem comentarios".split()) == 0.0
+
+
+def test_process_reviews_writes_one_part_per_chunk(tmp_path):
+    engine = get_engine()
+    _skip_without_db()
+    if not relation_exists(engine, "stg_reviews"):
+        pytest.skip("stg_reviews not built; run build_staging first.")
+
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE TABLE review_text_scores"))
+    try:
+        n_processed = process_reviews(engine, tmp_path, chunk_rows=500, n_jobs=2)
+        with engine.connect() as conn:
+            n_parts = conn.execute(text("SELECT COUNT(DISTINCT feature_part) FROM review_text_scores")).scalar_one()
+    finally:
+        # scores pointing at tmp_path would hide the reviews from the next real run
+        with engine.begin() as conn:
+            conn.execute(text("TRUNCATE TABLE review_text_scores"))
+
+    expected_parts = -(-n_processed // 500)
+    assert n_processed > 500
+    assert len(list(tmp_path.glob("part-*.npz"))) == n_parts == expected_parts
+    keys, features = load_review_features(tmp_path)
+    assert len(keys) == features.shape[0] == n_processed
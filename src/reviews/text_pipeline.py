@@ -0,0 +1,242 @@
+from __future__ import annotations
+import argparse
+import numpy as np
+import scipy.sparse as sp
+from collections.abc import Iterator
+from pathlib import Path
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.feature_extraction.text import HashingVectorizer
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from src.db.engine import get_engine
+from src.etl.text_norm import normalize_text
+
+
+#--------------------------
+# Settings
+#--------------------------
+
+# parents[0]=reviews, [1]=src, [2]=project root
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+REVIEW_FEATURE_DIRECTORY = PROJECT_ROOT / "data" / "review_features"
+
+# Reviews per chunk: one chunk = one task = one .npz part
+DEFAULT_CHUNK_ROWS = 10_000
+
+# Hashed feature space (unigrams + bigrams); fixed, so parts written by any run line up
+HASH_FEATURES = 2 ** 18
+
+# Normalized (lowercase, unaccented) Portuguese polarity words
+POSITIVE_WORDS = frozenset({
+    "adorei", "amei", "antes", "bom", "boa", "bem", "certinho", "confiavel", "correto", "excelente",
+    "gostei", "lindo", "linda", "maravilhoso", "maravilhosa", "otimo", "otima", "parabens",
+    "perfeito", "perfeita", "qualidade", "rapido", "rapida", "recomendo", "satisfeito",
+    "satisfeita", "super", "top",
+})
+NEGATIVE_WORDS = frozenset({
+    "absurdo", "atrasado", "atrasada", "atraso", "atrasou", "cancelado", "cancelei", "defeito",
+    "defeituoso", "demora", "demorou", "devolucao", "devolver", "enganosa", "errado", "errada",
+    "faltando", "horrivel", "pessimo", "pessima", "problema", "quebrado", "quebrada",
+    "reclamacao", "ruim", "triste",
+})
+# A polarity word right after one of these counts with the opposite sign ("nao recomendo")
+NEGATIONS = frozenset({"nao", "nunca", "nem", "jamais"})
+
+
+#--------------------------
+# Text scoring
+#--------------------------
+
+def review_text(title: str | None, message: str | None) -> str:
+    """
+    Title and message of a review as one normalized string (normalize_text, as in staging).
+    """
+    return " ".join(part for part in (normalize_text(title), normalize_text(message)) if part)
+
+
+def polarity(tokens: list[str]) -> float:
+    """
+    Lexicon score in [-1, 1]: (positive - negative) / (positive + negative) hits, 0 without hits.
+    """
+    score = hits = 0
+    for position, token in enumerate(tokens):
+        sign = 1 if token in POSITIVE_WORDS else -1 if token in NEGATIVE_WORDS else 0
+        if sign == 0:
+            continue
+        if position > 0 and tokens[position - 1] in NEGATIONS:
+            sign = -sign
+        score += sign
+        hits += 1
+    return score / hits if hits else 0.0
+
+
+def _vectorizer() -> HashingVectorizer:
+    # Stateless: every worker builds its own, nothing is fitted or shared
+    return HashingVectorizer(
+        n_features=HASH_FEATURES,
+        ngram_range=(1, 2),
+        alternate_sign=False,
+        lowercase=False,
+        token_pattern=r"[a-z0-9]+",
+    )
+
+
+def _part_name(review_sk: np.ndarray) -> str:
+    return f"part-{int(review_sk[0]):09d}-{int(review_sk[-1]):09d}"
+
+
+def _process_chunk(directory: str, review_sk: np.ndarray, titles: list, messages: list) -> tuple[str, np.ndarray, np.ndarray]:
+    """
+    Worker task: normalize, score and vectorize one chunk, and write its sparse features.
+
+    The matrix is saved by the worker (<part>.npz plus <part>.keys.npy with the review_sk of
+    every row), so only the per-review scores travel back to the parent.
+    Returns (part file name, n_tokens, polarity).
+    """
+    texts = [review_text(title, message) for title, message in zip(titles, messages)]
+    tokens = [value.split() for value in texts]
+    n_tokens = np.array([len(words) for words in tokens], dtype=np.int32)
+    scores = np.array([polarity(words) for words in tokens], dtype=np.float32)
+
+    features = _vectorizer().transform(texts).astype(np.float32)
+    part = _part_name(review_sk)
+    sp.save_npz(Path(directory) / f"{part}.npz", features.tocsr(), compressed=True)
+    np.save(Path(directory) / f"{part}.keys.npy", review_sk)
+    return f"{part}.npz", n_tokens, scores
+
+
+#--------------------------
+# Helpers
+#--------------------------
+
+def _log_reviews(message: str) -> None:
+    print(f"[REVIEWS] {message}")
+
+
+def _stream_new_reviews(engine: Engine, chunk_rows: int) -> Iterator[tuple[np.ndarray, list, list]]:
+    """
+    Yield (review_sk, titles, messages) chunks of the reviews with text that have no
+    review_text_scores row yet, from a server-side cursor (one chunk in memory at a time).
+
+    A review attached to several orders is processed once (one review_sk).
+    """
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(text(
+            """
+            SELECT DISTINCT ON (r.review_sk)
+                r.review_sk, r.review_comment_title, r.review_comment_message
+            FROM stg_reviews AS r
+            WHERE (r.review_comment_title IS NOT NULL OR r.review_comment_message IS NOT NULL)
+              AND r.review_sk IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM review_text_scores AS s WHERE s.review_sk = r.review_sk)
+            ORDER BY r.review_sk
+            """
+        ))
+        # partitions() without a size returns the whole result at once, yield_per does not reach text() results
+        for rows in result.partitions(chunk_rows):
+            review_sk = np.array([row[0] for row in rows], dtype=np.int32)
+            yield review_sk, [row[1] for row in rows], [row[2] for row in rows]
+
+
+def _remove_orphan_parts(engine: Engine, directory: Path) -> int:
+    """
+    Delete part files no score row points to (written by a run interrupted before recording
+    them); their reviews are processed again, possibly in differently bounded parts.
+    """
+    with engine.connect() as conn:
+        recorded = set(conn.execute(text("SELECT DISTINCT feature_part FROM review_text_scores")).scalars())
+    orphans = [part for part in directory.glob("part-*.npz") if part.name not in recorded]
+    for part in orphans:
+        part.unlink()
+        part.with_name(part.name.replace(".npz", ".keys.npy")).unlink(missing_ok=True)
+    return len(orphans)
+
+
+def _record_scores(engine: Engine, part: str, review_sk: np.ndarray, n_tokens: np.ndarray,
+                   scores: np.ndarray) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                """
+                INSERT INTO review_text_scores (review_sk, n_tokens, polarity, feature_part, feature_row)
+                VALUES (:review_sk, :n_tokens, :polarity, :feature_part, :feature_row)
+                ON CONFLICT (review_sk) DO NOTHING
+                """
+            ),
+            [
+                {
+                    "review_sk": int(sk),
+                    "n_tokens": int(tokens),
+                    "polarity": float(score),
+                    "feature_part": part,
+                    "feature_row": row,
+                }
+                for row, (sk, tokens, score) in enumerate(zip(review_sk, n_tokens, scores))
+            ],
+        )
+
+
+#--------------------------
+# Public API
+#--------------------------
+
+def process_reviews(engine: Engine, directory: Path = REVIEW_FEATURE_DIRECTORY,
+                    chunk_rows: int = DEFAULT_CHUNK_ROWS, n_jobs: int = -1) -> int:
+    """
+    Score and vectorize the review texts not processed yet.
+
+    - Reviews are streamed from stg_reviews in chunks; while the pool works on some chunks
+      the next ones are read, and at most 2 x n_jobs chunks are in flight
+    - Each chunk is handled by a loky worker (normalize_text, lexicon polarity, hashing
+      vectorizer) and written as its own .npz part
+    - Scores are inserted once a part is on disk, so an interrupted run resumes with the
+      reviews that have no score yet (its unrecorded parts are removed first)
+    Returns the number of reviews processed.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    n_orphans = _remove_orphan_parts(engine, directory)
+    if n_orphans:
+        _log_reviews(f"removed {n_orphans} unrecorded part(s) of an interrupted run")
+    chunks: dict[str, np.ndarray] = {}
+
+    def tasks():
+        for review_sk, titles, messages in _stream_new_reviews(engine, chunk_rows):
+            chunks[_part_name(review_sk) + ".npz"] = review_sk
+            yield delayed(_process_chunk)(str(directory), review_sk, titles, messages)
+
+    n_processed = 0
+    parallel = Parallel(n_jobs=effective_n_jobs(n_jobs), backend="loky", return_as="generator_unordered")
+    for part, n_tokens, scores in parallel(tasks()):
+        review_sk = chunks.pop(part)
+        _record_scores(engine, part, review_sk, n_tokens, scores)
+        n_processed += len(review_sk)
+
+    _log_reviews(f"processed {n_processed:,} new review texts -> {directory}")
+    return n_processed
+
+
+def load_review_features(directory: Path = REVIEW_FEATURE_DIRECTORY) -> tuple[np.ndarray, sp.csr_matrix]:
+    """
+    Every part stacked into one CSR matrix, with the review_sk of each row.
+    """
+    parts = sorted(directory.glob("part-*.npz"))
+    if not parts:
+        return np.array([], dtype=np.int32), sp.csr_matrix((0, HASH_FEATURES), dtype=np.float32)
+    keys = np.concatenate([np.load(part.with_name(part.name.replace(".npz", ".keys.npy"))) for part in parts])
+    return keys, sp.vstack([sp.load_npz(part) for part in parts], format="csr")
+
+
+#--------------------------
+# Main
+#--------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Score and vectorize new review texts.")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--jobs", type=int, default=-1, help="Worker processes (-1 = all cores)")
+    args = parser.parse_args()
+
+    process_reviews(get_engine(), chunk_rows=args.chunk_rows, n_jobs=args.jobs)
+
+if __name__ == "__main__":
+    main()